@@ -0,0 +1,260 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from clustering.knn_within_cluster import normalize_rows, top_k
+
+# --- Config ---
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "ann_index.npz")
+DEFAULT_N_PROBE = 8
+TRAIN_SAMPLE = 20000
+TRAIN_ITERS = 15
+
+
+class ExactIndex:
+    """Brute-force cosine search; the reference the approximate indexes are measured against."""
+    kind = "exact"
+
+    def __init__(self):
+        self.usernames = []
+        self.row_index = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def build(self, usernames, vectors):
+        self.usernames = list(usernames)
+        self.row_index = {u: i for i, u in enumerate(self.usernames)}
+        self.vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        return self
+
+    def __len__(self):
+        return len(self.usernames)
+
+    def _upsert(self, username, vector):
+        """Store a normalized vector; returns its row."""
+        vector = normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+        row = self.row_index.get(username)
+        if row is None:
+            row = len(self.usernames)
+            self.usernames.append(username)
+            self.row_index[username] = row
+            if self.vectors.size == 0:
+                self.vectors = vector
+            else:
+                self.vectors = np.vstack([self.vectors, vector])
+        else:
+            self.vectors[row] = vector[0]
+        return row
+
+    def add(self, username, vector):
+        self._upsert(username.strip().lower(), vector)
+
+    def _candidates(self, queries):
+        return [np.arange(len(self.usernames))] * len(queries)
+
+    def search(self, queries, k=3, exclude=None):
+        """
+        Top-k (username, score) lists for each query vector.
+        exclude optionally gives one username per query to leave out (the user itself).
+        """
+        queries = normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        results = []
+        for i, rows in enumerate(self._candidates(queries)):
+            scores = self.vectors[rows] @ queries[i]
+            if exclude is not None and exclude[i] in self.row_index:
+                scores[rows == self.row_index[exclude[i]]] = -np.inf
+            best = top_k(scores.reshape(1, -1), k)[0]
+            results.append([(self.usernames[rows[j]], float(scores[j])) for j in best if np.isfinite(scores[j])])
+        return results
+
+
+class IVFIndex(ExactIndex):
+    """
+    Inverted-file index: a spherical k-means coarse quantizer splits the normalized
+    vectors into n_lists cells, and a query only scores the members of its n_probe
+    closest cells. Probing several cells is what lets border users find neighbours
+    that sit in an adjacent KMeans cluster.
+    """
+    kind = "ivf"
+
+    def __init__(self, n_lists=None, n_probe=DEFAULT_N_PROBE, seed=42):
+        super().__init__()
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.lists = []
+
+    def build(self, usernames, vectors):
+        super().build(usernames, vectors)
+        n = len(self.usernames)
+        if n == 0:
+            return self
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        self.n_lists = min(n_lists, n)
+        self.centroids = self._train(self.vectors)
+        self.assignments = np.argmax(self.vectors @ self.centroids.T, axis=1).astype(np.int32)
+        self._rebuild_lists()
+        return self
+
+    def _train(self, vectors):
+        rng = np.random.default_rng(self.seed)
+        sample = vectors
+        if len(vectors) > TRAIN_SAMPLE:
+            sample = vectors[rng.choice(len(vectors), TRAIN_SAMPLE, replace=False)]
+        centroids = sample[rng.choice(len(sample), self.n_lists, replace=False)].copy()
+        for _ in range(TRAIN_ITERS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=self.n_lists)
+            filled = counts > 0
+            centroids[filled] = normalize_rows(sums[filled])
+        return centroids
+
+    def _rebuild_lists(self):
+        order = np.argsort(self.assignments, kind='stable')
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.n_lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.n_lists)]
+
+    def add(self, username, vector):
+        username = username.strip().lower()
+        if len(self.centroids) == 0:
+            self.build(self.usernames + [username], np.vstack([self.vectors, vector]) if len(self) else [vector])
+            return
+        row = self._upsert(username, vector)
+        cell = int(np.argmax(self.centroids @ self.vectors[row]))
+        if row < len(self.assignments):
+            old = self.assignments[row]
+            self.lists[old] = self.lists[old][self.lists[old] != row]
+            self.assignments[row] = cell
+        else:
+            self.assignments = np.append(self.assignments, np.int32(cell))
+        self.lists[cell] = np.append(self.lists[cell], row)
+
+    def _candidates(self, queries):
+        n_probe = min(self.n_probe, len(self.centroids))
+        probes = top_k(queries @ self.centroids.T, n_probe)
+        return [np.concatenate([self.lists[c] for c in cells]) for cells in probes]
+
+    # --- Persistence ---
+    def save(self, path=INDEX_FILE):
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            kind=np.array(self.kind),
+            usernames=np.array(self.usernames, dtype=str),
+            vectors=self.vectors,
+            centroids=self.centroids,
+            assignments=self.assignments,
+            params=np.array([self.n_lists or 0, self.n_probe, self.seed], dtype=np.int64)
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            n_lists, n_probe, seed = (int(x) for x in data["params"])
+            index = cls(n_lists=n_lists, n_probe=n_probe, seed=seed)
+            index.usernames = data["usernames"].tolist()
+            index.vectors = data["vectors"]
+            index.centroids = data["centroids"]
+            index.assignments = data["assignments"]
+        index.row_index = {u: i for i, u in enumerate(index.usernames)}
+        index._rebuild_lists()
+        return index
+
+
+ANN_INDEXES = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+}
+
+def build_ann_index(store=None, kind="ivf", path=INDEX_FILE, **params):
+    """Build an index over the aggregated vectors of every user and persist it next to clusters.json."""
+    if store is None:
+        from clustering.feature_store import get_feature_store
+        store = get_feature_store()
+    index = ANN_INDEXES[kind](**params).build(store.usernames, store.source_matrix('aggregated'))
+    if hasattr(index, "save"):
+        index.save(path)
+        print(f"✅ ANN index ({kind}) built over {len(index)} users. Saved to: {path}")
+    return index
+
+def load_ann_index(path=INDEX_FILE):
+    if not os.path.exists(path):
+        return None
+    return IVFIndex.load(path)
+
+def add_users_to_ann_index(usernames, store=None, path=INDEX_FILE):
+    """Incrementally insert (or refresh) users in the persisted index, if one has been built."""
+    index = load_ann_index(path)
+    if index is None:
+        return
+    if store is None:
+        from clustering.feature_store import get_feature_store
+        store = get_feature_store()
+    for username in usernames:
+        vector = store.vector(username)
+        if vector is not None:
+            index.add(username, vector)
+    index.save(path)
+
+
+# --- Recall vs latency against exact search ---
+def benchmark_recall(usernames, vectors, k=10, n_queries=200, n_probes=(1, 2, 4, 8, 16, 32), seed=0):
+    rng = np.random.default_rng(seed)
+    queries_idx = rng.choice(len(usernames), min(n_queries, len(usernames)), replace=False)
+    queries = np.asarray(vectors, dtype=np.float32)[queries_idx]
+    exclude = [usernames[i] for i in queries_idx]
+
+    exact = ExactIndex().build(usernames, vectors)
+    start = time.perf_counter()
+    truth = exact.search(queries, k=k, exclude=exclude)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    ivf = IVFIndex().build(usernames, vectors)
+    build_s = time.perf_counter() - start
+
+    report = {"users": len(usernames), "k": k, "n_lists": ivf.n_lists, "build_s": build_s,
+              "exact_ms_per_query": exact_ms, "ivf": []}
+    print(f"📏 {len(usernames)} users, k={k}, {ivf.n_lists} lists (build {build_s:.2f}s), exact: {exact_ms:.3f} ms/query")
+    for n_probe in n_probes:
+        if n_probe > ivf.n_lists:
+            break
+        ivf.n_probe = n_probe
+        start = time.perf_counter()
+        approx = ivf.search(queries, k=k, exclude=exclude)
+        ms = (time.perf_counter() - start) * 1000 / len(queries)
+        hits = sum(len({u for u, _ in a} & {u for u, _ in t}) for a, t in zip(approx, truth))
+        recall = hits / max(1, sum(len(t) for t in truth))
+        report["ivf"].append({"n_probe": n_probe, "recall": recall, "ms_per_query": ms})
+        print(f"   n_probe={n_probe:<3} recall@{k}={recall:.3f}  {ms:.3f} ms/query")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the ANN index or benchmark it against exact search.")
+    parser.add_argument("--benchmark", action="store_true", help="measure recall vs latency instead of building")
+    parser.add_argument("--synthetic", type=int, default=0, help="benchmark on N random vectors instead of the feature store")
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        if args.synthetic:
+            rng = np.random.default_rng(1)
+            centers = rng.gamma(1.0, 5.0, size=(32, 57))
+            vecs = centers[rng.integers(0, 32, args.synthetic)] + rng.gamma(1.0, 2.0, size=(args.synthetic, 57))
+            names = [f"synthetic_{i}" for i in range(args.synthetic)]
+        else:
+            from clustering.feature_store import get_feature_store
+            store = get_feature_store()
+            names, vecs = store.usernames, store.source_matrix('aggregated')
+        benchmark_recall(names, vecs, k=args.k)
+    else:
+        build_ann_index()
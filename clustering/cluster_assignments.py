@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# --- Config ---
+ASSIGNMENTS_FILE = os.path.join(os.path.dirname(__file__), "clusters.npz")
+JSON_EXPORT_FILE = os.path.join(os.path.dirname(__file__), "clusters.json")
+
+def cluster_key(label):
+    return f"cluster_{int(label)}"
+
+def parse_cluster_key(cluster):
+    """Accept either an int label or a "cluster_N" key."""
+    return int(cluster.rsplit("_", 1)[-1]) if isinstance(cluster, str) else int(cluster)
+
+
+class ClusterAssignments:
+    """
+    Cluster labels in one binary artifact (clusters.npz).
+
+    labels[i] is the cluster of usernames[i]; rows follow the feature-store order at
+    clustering time, with users assigned later appended at the end. A username -> row
+    dict makes "which cluster is X in" a dict lookup plus an array read, and member
+    rows per cluster are grouped once (stable argsort) on first use. Centroids, the
+    baseline inertia of the last full fit and the run metadata travel in the same file.
+    """
+
+    def __init__(self, usernames, labels, centroids=None, baseline_inertia=0.0, meta=None):
+        self.usernames = list(usernames)
+        self.labels = np.asarray(labels, dtype=np.int32)
+        self.centroids = None if centroids is None else np.asarray(centroids, dtype=np.float32)
+        self.baseline_inertia = float(baseline_inertia)
+        self.meta = meta or {}
+        self.row_index = {u: i for i, u in enumerate(self.usernames)}
+        self._members = None
+
+    def __len__(self):
+        return len(self.usernames)
+
+    def __contains__(self, username):
+        return username.strip().lower() in self.row_index
+
+    # --- Lookups ---
+    def label_of(self, username):
+        row = self.row_index.get(username.strip().lower())
+        return None if row is None else int(self.labels[row])
+
+    def cluster_of(self, username):
+        label = self.label_of(username)
+        return None if label is None else cluster_key(label)
+
+    def _member_rows(self):
+        if self._members is None:
+            order = np.argsort(self.labels, kind="stable")
+            labels, starts = np.unique(self.labels[order], return_index=True)
+            self._members = dict(zip(labels.tolist(), np.split(order, starts[1:])))
+        return self._members
+
+    def member_rows(self, cluster):
+        return self._member_rows().get(parse_cluster_key(cluster), np.empty(0, dtype=np.int64))
+
+    def members(self, cluster):
+        return [self.usernames[r] for r in self.member_rows(cluster)]
+
+    def cluster_ids(self):
+        return [cluster_key(label) for label in sorted(self._member_rows())]
+
+    def to_dict(self):
+        """{"cluster_N": [usernames]} in row order, the clusters.json layout."""
+        return {cid: self.members(cid) for cid in self.cluster_ids()}
+
+    # --- Updates ---
+    def assign(self, usernames, labels):
+        """Set (or add) the label of each username; new users are appended as new rows."""
+        new_labels = []
+        for username, label in zip(usernames, labels):
+            row = self.row_index.get(username)
+            if row is None:
+                self.row_index[username] = len(self.usernames)
+                self.usernames.append(username)
+                new_labels.append(label)
+            else:
+                self.labels[row] = label
+        if new_labels:
+            self.labels = np.concatenate([self.labels, np.asarray(new_labels, dtype=np.int32)])
+        self._members = None
+
+    # --- Persistence ---
+    def save(self, path=ASSIGNMENTS_FILE):
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            usernames=np.array(self.usernames, dtype=str),
+            labels=self.labels,
+            centroids=self.centroids if self.centroids is not None else np.zeros((0, 0), dtype=np.float32),
+            baseline_inertia=np.float64(self.baseline_inertia),
+            meta=np.array(json.dumps(self.meta)),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=ASSIGNMENTS_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            centroids = data["centroids"]
+            return cls(
+                data["usernames"].tolist(),
+                data["labels"],
+                centroids if centroids.size else None,
+                float(data["baseline_inertia"]),
+                json.loads(str(data["meta"])),
+            )
+
+    @classmethod
+    def from_dict(cls, clusters):
+        """Build from the {"cluster_N": [usernames]} JSON layout (no centroids)."""
+        usernames, labels = [], []
+        for cid, members in clusters.items():
+            for member in members:
+                usernames.append(member.strip().lower())
+                labels.append(parse_cluster_key(cid))
+        return cls(usernames, labels)
+
+    def export_json(self, path=JSON_EXPORT_FILE):
+        """Write the clusters.json export read by the frontend and plot_clusters."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def assignments_version(path=ASSIGNMENTS_FILE, json_path=JSON_EXPORT_FILE):
+    """Cheap version token for whichever file load_cluster_assignments() would read; None if neither exists."""
+    for candidate in (path, json_path):
+        try:
+            st = os.stat(candidate)
+        except OSError:
+            continue
+        return f"{os.path.basename(candidate)}:{st.st_ino}:{st.st_mtime_ns}:{st.st_size}"
+    return None
+
+def load_cluster_assignments(path=ASSIGNMENTS_FILE, json_path=JSON_EXPORT_FILE):
+    """Binary assignments if present, else built from a legacy clusters.json; None if neither exists."""
+    if os.path.exists(path):
+        return ClusterAssignments.load(path)
+    if os.path.exists(json_path):
+        with open(json_path, "r") as f:
+            return ClusterAssignments.from_dict(json.load(f))
+    return None
+
+
+# --- Run directly ---
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the binary cluster assignments or export them to clusters.json.")
+    parser.add_argument("username", nargs="?", help="print this user's cluster and its size")
+    parser.add_argument("--export-json", action="store_true", help="rewrite clusters.json from clusters.npz")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    assignments = load_cluster_assignments()
+    if assignments is None:
+        print("❌ No cluster assignments found. Run clustering/kmeans_clustering.py first.")
+        sys.exit(1)
+    print(f"✅ Loaded {len(assignments)} assignments in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    if args.username:
+        cid = assignments.cluster_of(args.username)
+        if cid is None:
+            print(f"❌ No cluster assignment for '{args.username}'")
+        else:
+            print(f"➡️ {args.username}: {cid} ({len(assignments.member_rows(cid))} members)")
+    if args.export_json:
+        assignments.export_json()
+        print(f"✅ Exported to {JSON_EXPORT_FILE}")
@@ -0,0 +1,377 @@
+import os
+import sys
+import json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from clustering.generate_features import build_user_vectors, FEATURE_DIM, SOURCES
+from utils.storage import get_storage
+from utils.metrics import timed
+
+# --- Config ---
+STORE_DIR = os.path.dirname(__file__)
+MATRIX_FILE = "features.npy"
+INDEX_FILE = "features_index.json"
+ROW_DIM = FEATURE_DIM * len(SOURCES)
+FEATURE_WORKERS = int(os.environ.get("FEATURE_WORKERS", "1"))   # >1 parses changed groups on a process pool
+PARALLEL_MIN_GROUPS = 64   # fewer changed groups than this are parsed serially
+CHUNKS_PER_WORKER = 4      # smaller tasks even out uneven group sizes
+
+
+def user_row(user):
+    """(username, float32 row) for one stored user: the three source vectors side by side."""
+    vectors = build_user_vectors(user)
+    row = np.concatenate([np.asarray(vectors[s], dtype=np.float32) for s in SOURCES])
+    return user.get("username", "").strip().lower(), row
+
+def _parse_chunk(task):
+    """
+    Worker: parse a batch of groups and write their rows straight into a new
+    shared-memory block. Returns (block name, [(group, member count)], usernames,
+    shadowed row indexes); the caller copies the block out, fills the shadowed rows
+    from its own matrix and unlinks the block.
+    """
+    storage, names, shadow = task
+    groups, users = [], []
+    for name in names:
+        members = storage.load_group_users(name)
+        groups.append((name, len(members)))
+        users.extend((name, user) for user in members)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(users) * ROW_DIM * 4))
+    # The parent unlinks the block; stop this worker's tracker from reclaiming it at exit
+    resource_tracker.unregister(shm._name, "shared_memory")
+    try:
+        block = np.ndarray((len(users), ROW_DIM), dtype=np.float32, buffer=shm.buf)
+        usernames, shadowed, seen = [None] * len(users), [], {}
+        # Later groups own shared usernames, so walk backwards and compute each person once
+        for i in range(len(users) - 1, -1, -1):
+            name, user = users[i]
+            username = user.get("username", "").strip().lower()
+            usernames[i] = username
+            if username in seen:
+                block[i] = block[seen[username]]
+            elif shadow.get(username, "") > name:
+                shadowed.append(i)
+            else:
+                block[i] = user_row(user)[1]
+                seen[username] = i
+        del block
+    finally:
+        shm.close()
+    return shm.name, groups, usernames, shadowed
+
+
+class FeatureStore:
+    """
+    All user feature vectors in one contiguous float32 matrix, one row per user.
+
+    Each row holds the aggregated, leetcode and codeforces vectors side by side
+    (the same 180D layout used for clustering). The matrix is memory-mapped from
+    features.npy and features_index.json keeps the username -> row index plus a
+    change stamp and digest per group (mtime/size/sha1 of the JSON file, or the
+    SQLite revision), so refresh() only re-reads groups that actually changed.
+    """
+
+    def __init__(self, storage=None, store_dir=STORE_DIR, workers=None):
+        self.storage = storage or get_storage()
+        self.workers = workers or FEATURE_WORKERS
+        self.matrix_path = os.path.join(store_dir, MATRIX_FILE)
+        self.index_path = os.path.join(store_dir, INDEX_FILE)
+        self.matrix = np.zeros((0, ROW_DIM), dtype=np.float32)
+        self.usernames = []
+        self.row_index = {}
+        self.groups = {}
+        self.version = 0
+        self.owners = {}
+        self.last_reread = []   # groups whose rows the last refresh() re-read (changed + orphan pass)
+        self._load()
+
+    # --- Persistence ---
+    def _load(self):
+        if not (os.path.exists(self.index_path) and os.path.exists(self.matrix_path)):
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            matrix = np.load(self.matrix_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Feature store unreadable, rebuilding: {e}")
+            return
+
+        if index.get("row_dim") != ROW_DIM or "groups" not in index or matrix.shape != (len(index.get("usernames", [])), ROW_DIM):
+            print("⚠️ Feature store layout changed, rebuilding.")
+            return
+
+        self.matrix = matrix
+        self.usernames = index["usernames"]
+        self.row_index = {u: i for i, u in enumerate(self.usernames)}
+        self.groups = index["groups"]
+        self.version = index.get("version", 0)
+        self._index_owners()
+
+    def _index_owners(self):
+        # Later groups (in sorted order) win when the same username appears in several groups
+        self.owners = {}
+        for name in sorted(self.groups):
+            for username in self.groups[name]["users"]:
+                self.owners[username] = name
+
+    def _save(self, write_matrix=True):
+        if write_matrix:
+            tmp_matrix = self.matrix_path + ".tmp.npy"
+            np.save(tmp_matrix, np.ascontiguousarray(self.matrix, dtype=np.float32))
+            os.replace(tmp_matrix, self.matrix_path)
+
+        tmp_index = self.index_path + ".tmp"
+        with open(tmp_index, 'w') as f:
+            json.dump({
+                "version": self.version,
+                "row_dim": ROW_DIM,
+                "usernames": self.usernames,
+                "groups": self.groups
+            }, f)
+        os.replace(tmp_index, self.index_path)
+
+        self.matrix = np.load(self.matrix_path, mmap_mode='r')
+
+    # --- Incremental rebuild ---
+    def _parse(self, name, stamp, digest, shadow=None, seen=None):
+        """
+        Rows for one group. A username whose row a later group will own anyway (seen
+        in a later changed group, or shadow[username] > name for unchanged groups)
+        reuses that row instead of being computed again.
+        """
+        shadow = shadow or {}
+        seen = {} if seen is None else seen
+        rows = {}
+        for user in self.storage.load_group_users(name):
+            username = user.get("username", "").strip().lower()
+            if username in seen:
+                rows[username] = seen[username]
+            elif shadow.get(username, "") > name:
+                rows[username] = self.matrix[self.row_index[username]]
+            else:
+                rows[username] = seen[username] = user_row(user)[1]
+        return {"stamp": stamp, "digest": digest, "rows": rows}
+
+    def _shadow(self, skip):
+        """username -> last indexed group (outside skip) listing it; its stored row wins over earlier groups."""
+        shadow = {}
+        for name in sorted(self.groups):
+            if name not in skip:
+                for username in self.groups[name]["users"]:
+                    shadow[username] = name
+        return shadow
+
+    def _parse_many(self, todo, live=None):
+        """
+        Parse {name: (stamp, digest)}; large batches are split across worker processes.
+        A person listed in several groups gets one computed row: groups are parsed
+        last-first (the last group in sorted order owns the row) and memberships that
+        another group owns reuse its row.
+        """
+        names = sorted(todo)
+        removed = set(self.groups).difference(live) if live is not None else set()
+        shadow = self._shadow(removed | set(todo))
+        workers = self.workers
+        if workers <= 1 or len(names) < PARALLEL_MIN_GROUPS:
+            seen = {}
+            parsed = {name: self._parse(name, *todo[name], shadow=shadow, seen=seen) for name in reversed(names)}
+            return {name: parsed[name] for name in names}
+
+        n_chunks = min(len(names), workers * CHUNKS_PER_WORKER)
+        tasks = [(self.storage, names[i::n_chunks], shadow) for i in range(n_chunks)]
+        parsed = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for shm_name, groups, usernames, shadowed in pool.map(_parse_chunk, tasks):
+                shm = shared_memory.SharedMemory(name=shm_name)
+                try:
+                    block = np.ndarray((len(usernames), ROW_DIM), dtype=np.float32, buffer=shm.buf).copy()
+                finally:
+                    shm.close()
+                    shm.unlink()
+                for i in shadowed:
+                    block[i] = self.matrix[self.row_index[usernames[i]]]
+                offset = 0
+                for name, count in groups:
+                    rows = {}
+                    for i in range(offset, offset + count):
+                        rows[usernames[i]] = block[i]
+                    parsed[name] = {"stamp": todo[name][0], "digest": todo[name][1], "rows": rows}
+                    offset += count
+        return {name: parsed[name] for name in names}
+
+    def plan(self, stamps=None):
+        """
+        What refresh() would do, without changing anything: ({name: (stamp, digest)} to
+        re-parse, {name: new stamp} whose content is unchanged, [removed names]).
+        """
+        stamps = self.storage.group_stamps() if stamps is None else stamps
+        todo, restamped = {}, {}
+        for name in sorted(stamps):
+            stamp = stamps[name]
+            entry = self.groups.get(name)
+            if entry and entry["stamp"] == stamp:
+                continue
+
+            digest = self.storage.group_digest(name)
+            if entry and entry["digest"] == digest:
+                restamped[name] = stamp
+                continue
+
+            todo[name] = (stamp, digest)
+        return todo, restamped, [name for name in self.groups if name not in stamps]
+
+    def _reread_orphans(self, stamps, changed, removed):
+        """
+        A username that also lives in an unchanged group must be re-read from there if
+        the group that owned its row dropped it. Adds those groups to changed (the
+        store itself is not modified); returns their names.
+        """
+        orphaned = {
+            u for u, owner in self.owners.items()
+            if owner in removed or (owner in changed and u not in changed[owner]["rows"])
+        }
+        reread = []
+        if orphaned:
+            for name, entry in self.groups.items():
+                if name in stamps and name not in changed and orphaned.intersection(entry["users"]):
+                    changed[name] = self._parse(name, stamps[name], entry["digest"])
+                    reread.append(name)
+        return reread
+
+    @timed("features.refresh")
+    def refresh(self):
+        """Bring the store in line with group storage. Returns True if any rows changed."""
+        stamps = self.storage.group_stamps()
+        todo, restamped, removed = self.plan(stamps)
+        for name, stamp in restamped.items():
+            self.groups[name]["stamp"] = stamp
+        touched = bool(restamped)
+
+        changed = self._parse_many(todo, live=stamps)
+        self._reread_orphans(stamps, changed, removed)
+        self.last_reread = sorted(changed)
+
+        if not changed and not removed:
+            if touched:
+                self._save(write_matrix=False)
+            return False
+
+        # Same users in the same groups: overwrite their rows, no re-index
+        same_layout = os.path.exists(self.matrix_path) and not removed and all(
+            name in self.groups
+            and sorted(info["rows"]) == self.groups[name]["users"]
+            and all(self.owners.get(u) == name for u in info["rows"])
+            for name, info in changed.items()
+        )
+
+        self.version += 1
+        if same_layout:
+            self._update_rows_in_place(changed)
+            self._save()
+        else:
+            self._rebuild(sorted(stamps), changed)
+            self._save()
+        print(f"✅ Feature store refreshed: {len(changed)} changed / {len(removed)} removed groups, {len(self.usernames)} users.")
+        return True
+
+    def _update_rows_in_place(self, changed):
+        # Copy-on-write: readers still mapping features.npy (e.g. the insight service's live
+        # snapshot) keep their rows; _save() swaps a new file in with os.replace
+        matrix = np.array(self.matrix, dtype=np.float32)
+        for name, info in changed.items():
+            for username, row in info["rows"].items():
+                matrix[self.row_index[username]] = row
+            self.groups[name] = {"stamp": info["stamp"], "digest": info["digest"], "users": sorted(info["rows"])}
+        self.matrix = matrix
+
+    def _rebuild(self, names, changed):
+        new_rows = {}
+        new_groups = {}
+        for name in names:
+            if name in changed:
+                info = changed[name]
+                for username, row in info["rows"].items():
+                    new_rows[username] = row
+                new_groups[name] = {"stamp": info["stamp"], "digest": info["digest"], "users": sorted(info["rows"])}
+            else:
+                entry = self.groups[name]
+                for username in entry["users"]:
+                    new_rows[username] = self.matrix[self.row_index[username]]
+                new_groups[name] = entry
+
+        self.usernames = sorted(new_rows)
+        self.row_index = {u: i for i, u in enumerate(self.usernames)}
+        matrix = np.zeros((len(self.usernames), ROW_DIM), dtype=np.float32)
+        for i, username in enumerate(self.usernames):
+            matrix[i] = new_rows[username]
+        self.matrix = matrix
+        self.groups = new_groups
+        self._index_owners()
+
+    # --- Access ---
+    def __len__(self):
+        return len(self.usernames)
+
+    def __contains__(self, username):
+        return username.strip().lower() in self.row_index
+
+    def source_matrix(self, source='aggregated'):
+        """(n_users, FEATURE_DIM) view of a single source block."""
+        start = SOURCES.index(source) * FEATURE_DIM
+        return self.matrix[:, start:start + FEATURE_DIM]
+
+    def vector(self, username, source='aggregated'):
+        row = self.row_index.get(username.strip().lower())
+        if row is None:
+            return None
+        start = SOURCES.index(source) * FEATURE_DIM
+        return self.matrix[row, start:start + FEATURE_DIM]
+
+    def row_version(self, username):
+        """Version token for one user's row: the digest of the group it was read from."""
+        owner = self.owners.get(username.strip().lower())
+        return None if owner is None else self.groups[owner]["digest"]
+
+    def to_feature_map(self):
+        """Legacy {"<username>::<source>": list} view used by the older call sites."""
+        feature_map = {}
+        matrix = np.asarray(self.matrix, dtype=np.float64)
+        for source_idx, source in enumerate(SOURCES):
+            block = matrix[:, source_idx * FEATURE_DIM:(source_idx + 1) * FEATURE_DIM].tolist()
+            for username, vec in zip(self.usernames, block):
+                feature_map[f"{username}::{source}"] = vec
+        return feature_map
+
+
+_store = None
+
+def get_feature_store(refresh=True):
+    """Process-wide feature store; refresh() is a cheap stat() pass when nothing changed."""
+    global _store
+    if _store is None:
+        _store = FeatureStore()
+    if refresh:
+        _store.refresh()
+    return _store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the persistent feature store from group storage.")
+    parser.add_argument("--workers", type=int, default=None, help=f"parser processes for large refreshes (default: FEATURE_WORKERS={FEATURE_WORKERS})")
+    parser.add_argument("--rebuild", action="store_true", help="discard the stored matrix and re-read every group")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        for path in (os.path.join(STORE_DIR, MATRIX_FILE), os.path.join(STORE_DIR, INDEX_FILE)):
+            if os.path.exists(path):
+                os.remove(path)
+    _store = FeatureStore(workers=args.workers)
+    store = get_feature_store()
+    print(f"📦 {len(store)} users x {ROW_DIM} features (version {store.version}) in {store.matrix_path}")
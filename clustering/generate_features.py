@@ -1,7 +1,6 @@
-import os
-import numpy as np
 import math
-from utils.load_all_users import load_all_users
+
+from utils.metrics import timed
 
 # Fixed tag list used across all platforms
 TAG_LIST = [
@@ -29,55 +28,59 @@ def merge_dicts_sum(dicts):
             result[key] += val
     return dict(result)
 
-def generate_user_feature_vectors():
-    all_users = load_all_users()
-    feature_map = {}
-    print(f"✅ Loaded {len(all_users)} valid users from all group files.")
+FEATURE_DIM = 1 + len(TAG_LIST) + len(DIFFICULTY_ORDER)
+SOURCES = ['aggregated', 'leetcode', 'codeforces']
 
-    for user in all_users:
-        username_raw = user.get("username", "")
-        username = username_raw.strip().lower()
+def build_user_vectors(user):
+    """Build the per-source feature vectors (accuracy score + tags + difficulty) for one user."""
+    data = user.get("data", {})
+    platforms = data.get("platforms", {})
+    agg_data = data.get("aggregated_data", {})
 
-        data = user.get("data", {})
-        platforms = data.get("platforms", {})
-        agg_data = data.get("aggregated_data", {})
+    sources = {
+        'aggregated': {
+            "total_submissions": agg_data.get("total_submissions", 0),
+            "correct_submissions": agg_data.get("correct_submissions", 0),
+            "unique_problems_solved": agg_data.get("unique_problems_solved", 0),
+            "tags_summary": agg_data.get("tags_summary", {}),
+            "difficulty_summary": agg_data.get("difficulty_summary", {})
+        },
+        'leetcode': platforms.get('leetcode', {}),
+        'codeforces': platforms.get('codeforces', {})
+    }
 
-        sources = {
-            'aggregated': {
-                "total_submissions": agg_data.get("total_submissions", 0),
-                "correct_submissions": agg_data.get("correct_submissions", 0),
-                "unique_problems_solved": agg_data.get("unique_problems_solved", 0),
-                "tags_summary": agg_data.get("tags_summary", {}),
-                "difficulty_summary": agg_data.get("difficulty_summary", {})
-            },
-            'leetcode': platforms.get('leetcode', {}),
-            'codeforces': platforms.get('codeforces', {})
-        }
+    # Fallback for aggregated in case fields are missing
+    if not sources['aggregated']["total_submissions"]:
+        sources['aggregated']["total_submissions"] = sum(p.get("total_submissions", 0) for p in platforms.values())
+        sources['aggregated']["correct_submissions"] = sum(p.get("correct_submissions", 0) for p in platforms.values())
+        sources['aggregated']["unique_problems_solved"] = sum(p.get("unique_problems_solved", 0) for p in platforms.values())
+        sources['aggregated']["tags_summary"] = merge_dicts_sum([p.get("tags_summary", {}) for p in platforms.values()])
+        sources['aggregated']["difficulty_summary"] = merge_dicts_sum([p.get("difficulty_summary", {}) for p in platforms.values()])
 
-        # Fallback for aggregated in case fields are missing
-        if not sources['aggregated']["total_submissions"]:
-            sources['aggregated']["total_submissions"] = sum(p.get("total_submissions", 0) for p in platforms.values())
-            sources['aggregated']["correct_submissions"] = sum(p.get("correct_submissions", 0) for p in platforms.values())
-            sources['aggregated']["unique_problems_solved"] = sum(p.get("unique_problems_solved", 0) for p in platforms.values())
-            sources['aggregated']["tags_summary"] = merge_dicts_sum([p.get("tags_summary", {}) for p in platforms.values()])
-            sources['aggregated']["difficulty_summary"] = merge_dicts_sum([p.get("difficulty_summary", {}) for p in platforms.values()])
+    vectors = {}
+    for source_name, source_data in sources.items():
+        total = source_data.get("total_submissions", 0)
+        correct = source_data.get("correct_submissions", 0)
+        unique = source_data.get("unique_problems_solved", 0)
+        tag_dist = source_data.get("tags_summary", {})
+        diff_dist = source_data.get("difficulty_summary", {})
 
-        for source_name, source_data in sources.items():
-            total = source_data.get("total_submissions", 0)
-            correct = source_data.get("correct_submissions", 0)
-            unique = source_data.get("unique_problems_solved", 0)
-            tag_dist = source_data.get("tags_summary", {})
-            diff_dist = source_data.get("difficulty_summary", {})
+        acc = safe_ratio(correct, total)
+        boost = math.log(1 + unique) ** 2
+        accuracy_score = acc * boost
 
-            acc = safe_ratio(correct, total)
-            boost = math.log(1 + unique) ** 2
-            accuracy_score = acc * boost
+        tag_vector = [tag_dist.get(tag, 0) for tag in TAG_LIST]
+        diff_vector = [diff_dist.get(diff, 0) for diff in DIFFICULTY_ORDER]
 
-            tag_vector = [tag_dist.get(tag, 0) for tag in TAG_LIST]
-            diff_vector = [diff_dist.get(diff, 0) for diff in DIFFICULTY_ORDER]
+        vectors[source_name] = [accuracy_score] + tag_vector + diff_vector
+    return vectors
 
-            final_vector = [accuracy_score] + tag_vector + diff_vector
-            feature_map[f"{username}::{source_name}"] = final_vector
+@timed("features.generate")
+def generate_user_feature_vectors():
+    """Return the {"<username>::<source>": vector} map, served from the persistent feature store."""
+    from clustering.feature_store import get_feature_store
 
-    print(f"✅ Feature vectors generated for {len(feature_map)} user-platform combinations.")
+    store = get_feature_store()
+    feature_map = store.to_feature_map()
+    print(f"✅ Feature vectors served for {len(feature_map)} user-platform combinations.")
     return feature_map
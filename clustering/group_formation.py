@@ -0,0 +1,289 @@
+"""
+Cluster-aware group formation.
+
+Builds practice groups of a configurable size from feature rows and cluster labels:
+
+    balanced       snake draft over accuracy_score, so every group gets a similar
+                   spread of strong and weaker members and group means stay even
+    complementary  snake draft over members ordered by cluster and strongest tag, then
+                   swaps that raise the number of tags each group covers
+
+Both are O(n log n) sorts plus a vectorized swap refinement between paired groups.
+Balanced swaps only close the mean gap between the highest- and lowest-mean groups.
+Complementary swaps stay within a cluster (so the mix is kept), never shrink the
+union of tags the two groups cover, and prefer the swap that grows it most as long
+as the pair's mean gap stays within COVERAGE_GAP_TOLERANCE; rounds alternate the
+mean pairing with random pairings so coverage swaps are not limited to one
+partner group. Remainders are never dropped; members are dealt evenly, so group sizes differ by
+at most one. 'spread' makes n // size groups, so no group is smaller than size
+(usually size and size + 1; larger when there are more leftovers than groups),
+'short' makes ceil(n / size) groups, so none is larger than size. Fewer than size
+users form a single short group under either policy.
+
+    python clustering/group_formation.py --size 4 --mode complementary [--out plan.json]
+"""
+import os
+import sys
+import time
+import json
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from clustering.generate_features import TAG_LIST
+from utils.metrics import timed
+
+# --- Config ---
+MODES = ["balanced", "complementary"]
+REMAINDERS = ["spread", "short"]
+DEFAULT_GROUP_SIZE = 4
+REFINE_ROUNDS = 30
+COVERAGE_ROUNDS = 40
+COVERAGE_MIN_SHARE = 0.02   # a tag is covered when some member spends this share of their solves on it
+COVERAGE_GAP_TOLERANCE = 0.1   # coverage swaps may leave a pair's mean gap up to this many score stds
+TAGS = slice(1, 1 + len(TAG_LIST))   # tag columns of a FEATURE_DIM block (column 0 is accuracy_score)
+SEED = 42
+
+
+def group_count(n_users, size, remainder="spread"):
+    if size < 1:
+        raise ValueError(f"size must be at least 1, got {size}")
+    if remainder not in REMAINDERS:
+        raise ValueError(f"remainder must be one of {REMAINDERS}, got '{remainder}'")
+    if n_users == 0:
+        return 0
+    groups = n_users // size if remainder == "spread" else -(-n_users // size)
+    return max(1, groups)
+
+def snake_deal(order, n_groups):
+    """Group of each position in order: 0..G-1, G-1..0, 0..G-1, ... Sizes differ by at most one."""
+    position = np.arange(len(order))
+    rounds, slot = np.divmod(position, n_groups)
+    groups = np.empty(len(order), dtype=np.int64)
+    groups[order] = np.where(rounds % 2 == 0, slot, n_groups - 1 - slot)
+    return groups
+
+def member_table(groups, n_groups):
+    """(G, max size) matrix of user indexes per group, padded with -1."""
+    order = np.argsort(groups, kind="stable")
+    sizes = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    columns = np.arange(len(order)) - np.repeat(starts, sizes)
+    table = np.full((n_groups, sizes.max()), -1, dtype=np.int64)
+    table[groups[order], columns] = order
+    return table, sizes
+
+def strong_tags(tags):
+    """(n, tags) bool: the tags each user spends at least COVERAGE_MIN_SHARE of their solves on."""
+    totals = tags.sum(axis=1, keepdims=True)
+    return (tags / np.where(totals > 0, totals, 1)) >= COVERAGE_MIN_SHARE
+
+def coverage_delta(covered, first, second):
+    """
+    Change in covered tags (both groups together) for every swap of a member of first[i]
+    with a member of second[i]: (pairs, size, size). covered is the (G, size, tags) bool
+    strong-tag table laid out like the member table.
+    """
+    counts = covered.sum(axis=1)
+    a, b = covered[first].astype(np.float32), covered[second].astype(np.float32)
+
+    def side(own, incoming, group):
+        # The group gains tags nobody in it covers yet, and loses tags only the leaving member covers
+        missing = (counts[group] == 0).astype(np.float32)[:, None, :]
+        unique = own * (counts[group] == 1)[:, None, :]
+        gain = (missing * incoming).sum(axis=2)
+        kept = unique @ incoming.transpose(0, 2, 1)
+        return gain[:, None, :] - unique.sum(axis=2)[:, :, None] + kept
+
+    return side(a, b, first) + side(b, a, second).transpose(0, 2, 1)
+
+def refine(table, sizes, scores, keys=None, strong=None, rounds=REFINE_ROUNDS, seed=SEED):
+    """
+    Pair the highest-mean group with the lowest, the second highest with the second
+    lowest, and so on; in every pair apply the single member swap that brings the two
+    means closest (only between members with equal keys when keys is given). All pairs
+    are handled at once per round.
+
+    With strong (the strong_tags of every user) a swap must not shrink the tags the two
+    groups cover; the swap that grows coverage most is taken if the pair's mean gap stays
+    below max(current gap, COVERAGE_GAP_TOLERANCE * score std), otherwise the best gap
+    closer. Every other round then pairs groups at random. Modifies table in place;
+    returns swaps made.
+    """
+    n_groups = len(table)
+    valid = table >= 0
+    padded = np.where(valid, scores[np.maximum(table, 0)], 0.0)
+    key = None if keys is None else np.where(valid, keys[np.maximum(table, 0)], -2)
+    covered = None if strong is None else strong[np.maximum(table, 0)] & valid[:, :, None]
+    tolerance = COVERAGE_GAP_TOLERANCE * scores.std()
+    rng = np.random.default_rng(seed)
+    half = n_groups // 2
+    swaps, idle = 0, 0
+    for step in range(rounds):
+        if not half:
+            break
+        means = padded.sum(axis=1) / sizes
+        if covered is not None and step % 2:
+            shuffled = rng.permutation(n_groups)
+            high, low = shuffled[:half], shuffled[half:2 * half]
+        else:
+            order = np.argsort(means)
+            low, high = order[:half], order[::-1][:half]
+        gap = means[high] - means[low]
+        # Swapping a (high) with b (low) closes the gap by (a - b) * (1/nA + 1/nB)
+        delta = (padded[high][:, :, None] - padded[low][:, None, :]) * (1 / sizes[high] + 1 / sizes[low])[:, None, None]
+        new_gap = np.abs(gap[:, None, None] - delta)
+        allowed = valid[high][:, :, None] & valid[low][:, None, :]
+        if key is not None:
+            allowed &= key[high][:, :, None] == key[low][:, None, :]
+
+        if covered is None:
+            new_gap = np.where(allowed, new_gap, np.inf).reshape(half, -1)
+            best = new_gap.argmin(axis=1)
+            improved = new_gap[np.arange(half), best] < np.abs(gap) - 1e-9
+        else:
+            gain = coverage_delta(covered, high, low)
+            limit = np.maximum(np.abs(gap), tolerance)[:, None, None]
+            closer = new_gap < np.abs(gap)[:, None, None] - 1e-9
+            useful = allowed & (gain >= 0) & (((gain > 0) & (new_gap <= limit)) | closer)
+            # Most coverage first, then the smallest resulting gap
+            rank = np.where(useful, gain - new_gap / (new_gap.max() + 1.0), -np.inf).reshape(half, -1)
+            best = rank.argmax(axis=1)
+            improved = np.isfinite(rank[np.arange(half), best])
+
+        if not improved.any():
+            idle += 1
+            if covered is None or idle >= 2:
+                break
+            continue
+        idle = 0
+        hi_g, lo_g = high[improved], low[improved]
+        hi_c, lo_c = np.divmod(best[improved], table.shape[1])
+        for grid in (table, padded) + tuple(g for g in (key, covered) if g is not None):
+            grid[hi_g, hi_c], grid[lo_g, lo_c] = grid[lo_g, lo_c], grid[hi_g, hi_c].copy()
+        swaps += int(improved.sum())
+    return swaps
+
+def evaluate(table, sizes, scores, tags, labels):
+    """Objective terms for a grouping (and the random baseline it is compared with)."""
+    valid = table >= 0
+    idx = np.maximum(table, 0)
+    means = np.where(valid, scores[idx], 0.0).sum(axis=1) / sizes
+
+    strong = strong_tags(tags)
+    covered = np.zeros((len(table), tags.shape[1]), dtype=bool)
+    for column in range(table.shape[1]):
+        covered |= strong[idx[:, column]] & valid[:, column, None]
+
+    lab = np.where(valid, labels[idx], -1)
+    distinct = (np.diff(np.sort(lab, axis=1), axis=1) != 0).sum(axis=1) + 1 - (lab == -1).any(axis=1)
+    return {
+        "mean_accuracy_std": round(float(means.std()), 6),
+        "relative_spread": round(float(means.std() / max(scores.std(), 1e-12)), 6),
+        "tag_coverage": round(float(covered.mean()), 6),
+        "clusters_per_group": round(float(distinct.mean()), 4),
+    }
+
+@timed("groups.form")
+def form_groups(scores, tags, labels=None, size=DEFAULT_GROUP_SIZE, mode="balanced", remainder="spread", seed=SEED):
+    """
+    Group user indexes. scores is accuracy_score per user, tags the (n, len(TAG_LIST))
+    tag counts and labels the cluster per user (-1 or None when unknown). Returns
+    (list of index arrays, report) where the report has the objective terms for the
+    result and for a random grouping of the same sizes, plus the runtime.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got '{mode}'")
+    start = time.perf_counter()
+    scores = np.asarray(scores, dtype=np.float64)
+    tags = np.asarray(tags, dtype=np.float32)
+    labels = np.full(len(scores), -1, dtype=np.int64) if labels is None else np.asarray(labels, dtype=np.int64)
+    n_groups = group_count(len(scores), size, remainder)
+    if n_groups == 0:
+        return [], {"mode": mode, "users": 0, "groups": 0, "sizes": {}, "swaps": 0, "runtime_s": 0.0,
+                    "objective": {}, "random_baseline": {}}
+
+    # Random tie-breaks so equal scores do not always land in the same groups
+    jitter = np.random.default_rng(seed).random(len(scores))
+    if mode == "balanced":
+        order = np.lexsort((jitter, -scores))
+        swap_key, strong, rounds = None, None, REFINE_ROUNDS
+    else:
+        # Order by cluster, then by strongest tag: every run of n_groups consecutive members
+        # is spread over distinct groups, so similar profiles end up apart
+        top_tag = np.where(tags.sum(axis=1) > 0, tags.argmax(axis=1), -1)
+        order = np.lexsort((jitter, -scores, top_tag, labels))
+        swap_key = labels   # swaps stay within a cluster, so each group's cluster mix is kept
+        strong, rounds = strong_tags(tags), COVERAGE_ROUNDS
+    groups = snake_deal(order, n_groups)
+    table, sizes = member_table(groups, n_groups)
+    swaps = refine(table, sizes, scores, swap_key, strong, rounds, seed)
+    runtime = time.perf_counter() - start
+
+    shuffled = np.random.default_rng(seed).permutation(len(scores))
+    baseline_table, _ = member_table(np.arange(len(scores)) % n_groups, n_groups)
+    baseline_table = np.where(baseline_table >= 0, shuffled[np.maximum(baseline_table, 0)], -1)
+
+    report = {
+        "mode": mode,
+        "users": len(scores),
+        "groups": n_groups,
+        "sizes": {str(s): int(c) for s, c in zip(*np.unique(sizes, return_counts=True))},
+        "swaps": swaps,
+        "runtime_s": round(runtime, 4),
+        "objective": evaluate(table, sizes, scores, tags, labels),
+        "random_baseline": evaluate(baseline_table, sizes, scores, tags, labels),
+    }
+    return [row[row >= 0] for row in table], report
+
+def form_groups_from_store(usernames=None, size=DEFAULT_GROUP_SIZE, mode="balanced", remainder="spread", store=None):
+    """Form groups over feature-store users (all, or the given usernames). Returns ([[usernames]], report)."""
+    from clustering.feature_store import get_feature_store
+    from clustering.cluster_assignments import load_cluster_assignments
+
+    store = store or get_feature_store()
+    if usernames is None:
+        rows = np.arange(len(store))
+    else:
+        missing = [u for u in usernames if u not in store]
+        if missing:
+            print(f"⚠️ {len(missing)} users have no feature row and were left out: {missing[:5]}")
+        rows = np.array([store.row_index[u.strip().lower()] for u in usernames if u in store], dtype=np.int64)
+
+    aggregated = np.asarray(store.source_matrix('aggregated'))[rows]
+    assignments = load_cluster_assignments()
+    labels = np.full(len(rows), -1, dtype=np.int64)
+    if assignments is not None:
+        for i, row in enumerate(rows):
+            label = assignments.label_of(store.usernames[row])
+            labels[i] = -1 if label is None else label
+
+    groups, report = form_groups(aggregated[:, 0], aggregated[:, TAGS], labels, size, mode, remainder)
+    return [[store.usernames[rows[i]] for i in members] for members in groups], report
+
+def write_plan(groups, report, path):
+    with open(path, "w") as f:
+        json.dump({"report": report, "groups": {f"group{i}": g for i, g in enumerate(groups, start=1)}}, f, indent=2)
+    print(f"✅ Group plan written to {path}")
+
+def print_report(report):
+    objective, baseline = report["objective"], report["random_baseline"]
+    print(f"✅ Formed {report['groups']} {report['mode']} groups from {report['users']} users "
+          f"in {report['runtime_s']:.2f}s (sizes {report['sizes']}, {report['swaps']} swaps)")
+    for name in objective:
+        print(f"   {name:<20} {objective[name]:>10.4f}   random {baseline[name]:>10.4f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Form balanced or complementary practice groups from the feature store.")
+    parser.add_argument("--size", type=int, default=DEFAULT_GROUP_SIZE)
+    parser.add_argument("--mode", choices=MODES, default="balanced")
+    parser.add_argument("--remainder", choices=REMAINDERS, default="spread")
+    parser.add_argument("--out", help="write {group name: [usernames]} and the report as JSON")
+    args = parser.parse_args()
+
+    groups, report = form_groups_from_store(size=args.size, mode=args.mode, remainder=args.remainder)
+    print_report(report)
+    if args.out:
+        write_plan(groups, report, args.out)
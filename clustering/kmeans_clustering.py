@@ -1,63 +1,163 @@
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-import json
-from sklearn.cluster import KMeans
-from clustering.generate_features import generate_user_feature_vectors
+import time
+import numpy as np
+from clustering.feature_store import get_feature_store
+from clustering.ann_index import build_ann_index
+from clustering.model_selection import select_num_clusters
+from clustering.cluster_assignments import ClusterAssignments, load_cluster_assignments, ASSIGNMENTS_FILE
+from utils.metrics import timed, timer
 
 # --- Config ---
-DEFAULT_NUM_CLUSTERS = 8
-OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "clusters.json")
+DEFAULT_NUM_CLUSTERS = "auto"   # or a fixed int; "auto" selects k on full fits and keeps the saved k incrementally
+STREAM_CHUNK = 8192        # rows per partial_fit / predict step
+MINI_BATCH_SIZE = 1024
+DRIFT_THRESHOLD = 0.25     # refit fully once mean inertia grows 25% past the last full fit
+
+def iter_chunks(matrix, size=STREAM_CHUNK):
+    for start in range(0, len(matrix), size):
+        yield np.asarray(matrix[start:start + size], dtype=np.float32)
+
+@timed("kmeans.assign")
+def assign_to_centroids(matrix, centroids):
+    """Nearest-centroid labels and mean squared distance, streamed over the matrix in chunks."""
+    labels = np.empty(len(matrix), dtype=np.int32)
+    c_sq = (centroids.astype(np.float64) ** 2).sum(axis=1)
+    total = 0.0
+    offset = 0
+    for chunk in iter_chunks(matrix):
+        x = chunk.astype(np.float64)
+        d2 = (x ** 2).sum(axis=1)[:, None] - 2 * x @ centroids.T + c_sq[None, :]
+        chunk_labels = np.argmin(d2, axis=1)
+        labels[offset:offset + len(chunk)] = chunk_labels
+        total += np.maximum(d2[np.arange(len(chunk)), chunk_labels], 0).sum()
+        offset += len(chunk)
+    return labels, total / max(1, len(matrix))
 
 # --- Run Clustering on 180D Vectors ---
-def run_kmeans_clustering():
-    full_feature_map = generate_user_feature_vectors()
-    
-    # Extract base usernames (before ::platform)
-    user_set = set()
-    for key in full_feature_map:
-        if "::" in key:
-            user_set.add(key.split("::")[0])
-
-    usernames = sorted(user_set)
-    feature_vectors = []
-
-    for username in usernames:
-        agg_vec = full_feature_map.get(f"{username}::aggregated", [0] * 60)
-        lc_vec = full_feature_map.get(f"{username}::leetcode", [0] * 60)
-        cf_vec = full_feature_map.get(f"{username}::codeforces", [0] * 60)
-
-        # Combine into a single 180D vector
-        combined_vector = agg_vec + lc_vec + cf_vec
-        feature_vectors.append(combined_vector)
-
-    if not feature_vectors:
+def run_kmeans_clustering(mode="full", n_clusters=DEFAULT_NUM_CLUSTERS, metric="silhouette"):
+    """
+    mode="full": KMeans with n_init=10 over every user's 180D vector.
+    mode="incremental": warm-start MiniBatchKMeans from the saved centroids and stream
+    the feature matrix through partial_fit; falls back to a full refit when there is
+    no saved model, the cluster count changed, or inertia drifted past DRIFT_THRESHOLD.
+    n_clusters="auto" (the default) picks k with model_selection.select_num_clusters
+    (by `metric`) on every full fit; incremental updates keep the saved model's k. An
+    int overrides both. The chosen k,
+    selection scores and timings are stored in the clusters.npz metadata.
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans   # heavy; only the fit needs it
+    start = time.perf_counter()
+    store = get_feature_store()
+    usernames = store.usernames
+    feature_matrix = store.matrix  # (users, 180) float32, memory-mapped
+
+    if not usernames:
         print("❌ No user feature vectors found.")
         return {}
 
     num_users = len(usernames)
-    clusters_to_use = min(DEFAULT_NUM_CLUSTERS, num_users)
+    if num_users < 2:
+        print(f"⚠️ Not enough users to perform clustering. At least 2 users are required.")
+        return {}
+
+    model = load_cluster_assignments() if mode == "incremental" else None
+    if model is not None and model.centroids is None:
+        model = None
+    if n_clusters == "auto":
+        clusters_to_use = len(model.centroids) if model is not None else None
+    else:
+        clusters_to_use = min(n_clusters, num_users)
+
+    if mode == "incremental":
+        if model is None or model.centroids.shape != (clusters_to_use, feature_matrix.shape[1]):
+            print("⚠️ No compatible saved centroids. Running a full refit.")
+            mode = "full"
+        else:
+            _, inertia = assign_to_centroids(feature_matrix, model.centroids)
+            drift = inertia / model.baseline_inertia - 1 if model.baseline_inertia > 0 else 0.0
+            if drift > DRIFT_THRESHOLD:
+                print(f"⚠️ Cluster drift {drift:.1%} exceeds {DRIFT_THRESHOLD:.0%}. Running a full refit.")
+                mode = "full"
+
+    selection = None
+    if mode == "full" and n_clusters == "auto":
+        if num_users < 3:
+            clusters_to_use = 2
+        else:
+            selection = select_num_clusters(store, metric=metric)
+            clusters_to_use = selection["k"]
 
     if clusters_to_use < 2:
         print(f"⚠️ Not enough users to perform clustering. At least 2 users are required.")
         return {}
 
-    print(f"🧪 Clustering {num_users} users using 180D vectors into {clusters_to_use} clusters...")
-
-    kmeans = KMeans(n_clusters=clusters_to_use, random_state=42, n_init=10)
-    labels = kmeans.fit_predict(feature_vectors)
+    fit_start = time.perf_counter()
+    if mode == "incremental":
+        print(f"🧪 Incrementally updating {clusters_to_use} clusters over {num_users} users (mini-batch, warm start)...")
+        mbk = MiniBatchKMeans(n_clusters=clusters_to_use, init=model.centroids, n_init=1,
+                              batch_size=MINI_BATCH_SIZE, random_state=42)
+        with timer("kmeans.fit"):
+            for chunk in iter_chunks(feature_matrix):
+                if len(chunk) >= clusters_to_use:
+                    mbk.partial_fit(chunk)
+        centroids = mbk.cluster_centers_ if hasattr(mbk, "cluster_centers_") else model.centroids
+        labels, _ = assign_to_centroids(feature_matrix, centroids)
+        baseline = model.baseline_inertia
+        selection = model.meta.get("selection")
+    else:
+        print(f"🧪 Clustering {num_users} users using 180D vectors into {clusters_to_use} clusters...")
+        kmeans = KMeans(n_clusters=clusters_to_use, random_state=42, n_init=10)
+        with timer("kmeans.fit"):
+            labels = kmeans.fit_predict(np.asarray(feature_matrix, dtype=np.float32))
+        centroids = kmeans.cluster_centers_
+        baseline = kmeans.inertia_ / num_users
 
-    cluster_result = {}
-    for user, label in zip(usernames, labels):
-        cluster_key = f"cluster_{label}"
-        cluster_result.setdefault(cluster_key, []).append(user)
+    meta = {
+        "n_clusters": int(clusters_to_use),
+        "n_users": num_users,
+        "mode": mode,
+        "k_source": "auto" if n_clusters == "auto" else "fixed",
+        "selection": selection,
+        "fit_seconds": round(time.perf_counter() - fit_start, 3),
+        "total_seconds": round(time.perf_counter() - start, 3),
+    }
+    assignments = ClusterAssignments(usernames, labels, centroids, baseline, meta)
+    assignments.save()
+    assignments.export_json()
+    cluster_result = assignments.to_dict()
 
-    with open(OUTPUT_FILE, "w") as f:
-        json.dump(cluster_result, f, indent=2)
+    print(f"✅ Clustering complete with {clusters_to_use} clusters ({mode}, k {meta['k_source']}) in {meta['total_seconds']:.1f}s. Results saved to: {ASSIGNMENTS_FILE}")
 
-    print(f"✅ Clustering complete with {clusters_to_use} clusters. Results saved to: {OUTPUT_FILE}")
+    # Rebuild the cross-cluster ANN index alongside the new assignments
+    build_ann_index(store)
     return cluster_result
 
+def assign_users_to_clusters(usernames):
+    """Place new or updated users at their nearest saved centroid without refitting."""
+    assignments = load_cluster_assignments()
+    if assignments is None or assignments.centroids is None:
+        return {}
+    store = get_feature_store()
+    wanted = [u.strip().lower() for u in usernames]
+    wanted = [u for u in wanted if u in store.row_index]
+    if not wanted:
+        return {}
+
+    labels, _ = assign_to_centroids(store.matrix[[store.row_index[u] for u in wanted]], assignments.centroids)
+    assignments.assign(wanted, labels)
+    assignments.save()
+    assignments.export_json()
+    return {u: assignments.cluster_of(u) for u in wanted}
+
 # --- Optional: Run directly ---
 if __name__ == "__main__":
-    run_kmeans_clustering()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cluster every user's feature vector with KMeans.")
+    parser.add_argument("mode", nargs="?", choices=["full", "incremental"], default="full")
+    parser.add_argument("-k", "--clusters", default=str(DEFAULT_NUM_CLUSTERS), help="cluster count, or 'auto' (default) to select it")
+    parser.add_argument("--metric", choices=["silhouette", "elbow"], default="silhouette", help="selection score for -k auto")
+    args = parser.parse_args()
+    run_kmeans_clustering(args.mode, "auto" if args.clusters == "auto" else int(args.clusters), args.metric)
@@ -1,104 +1,147 @@
 import os
 import sys
 import numpy as np
-import json
-from sklearn.metrics.pairwise import cosine_similarity
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from clustering.generate_features import generate_user_feature_vectors
-from utils.load_all_users import load_all_users
-
-CLUSTERS_FILE = os.path.join(os.path.dirname(__file__), 'clusters.json')
-
-def load_cluster_assignments():
-    with open(CLUSTERS_FILE, 'r') as f:
-        return json.load(f)
-
-def compute_cluster_centroids(features, clusters):
-    centroids = {}
-    for cluster_id, members in clusters.items():
-        vectors = []
-        for u in members:
-            key = f"{u.strip().lower()}::aggregated"
-            if key in features:
-                vectors.append(features[key])
-        if vectors:
-            centroids[cluster_id] = np.mean(vectors, axis=0)
-    return centroids
+from clustering.feature_store import get_feature_store
+from clustering.cluster_assignments import ClusterAssignments, load_cluster_assignments
+from utils.metrics import timed
+
+QUERY_BLOCK = 1024  # query rows per matrix multiply, bounds the similarity block size
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def top_k(scores, k):
+    """Column indices of the k highest scores per row, best first."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, idx, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(idx, order, axis=1)
+
+
+class KNNEngine:
+    """
+    Batch cosine KNN over the aggregated feature vectors.
+
+    Vectors are L2-normalized once, each cluster's members are gathered into one
+    matrix, and every query block costs a single matrix multiply plus an
+    argpartition for the top-k. Users whose cluster has fewer than k other members
+    are searched across all clusters through the ANN index when one is given,
+    otherwise they fall back to the nearest cluster by centroid similarity.
+    """
+
+    @timed("knn.build")
+    def __init__(self, store=None, clusters=None, ann_index=None):
+        store = store if store is not None else get_feature_store()
+        clusters = clusters if clusters is not None else load_cluster_assignments()
+        if clusters is None:
+            raise FileNotFoundError("No cluster assignments found. Run clustering/kmeans_clustering.py first.")
+        if isinstance(clusters, dict):
+            clusters = ClusterAssignments.from_dict(clusters)
+
+        self.usernames = store.usernames
+        self.row_index = store.row_index
+        self.vectors = np.asarray(store.source_matrix('aggregated'), dtype=np.float32)
+        self.normed = normalize_rows(self.vectors)
+        self.ann_index = ann_index
+        self.assignments = clusters
+
+        # Member rows per cluster, mapped from assignment rows to feature-store rows
+        # (the store may have gained or lost users since the clustering run)
+        store_rows = np.array([self.row_index.get(u, -1) for u in clusters.usernames], dtype=np.int64)
+        self.members = {}
+        for cid in clusters.cluster_ids():
+            rows = store_rows[clusters.member_rows(cid)]
+            self.members[cid] = rows[rows >= 0]
+
+        # Nearest other cluster for each cluster (by centroid cosine similarity)
+        self.cluster_ids = [cid for cid, rows in self.members.items() if len(rows)]
+        self.fallback = {}
+        if len(self.cluster_ids) > 1:
+            centroids = np.stack([self.vectors[self.members[cid]].mean(axis=0) for cid in self.cluster_ids])
+            sims = normalize_rows(centroids) @ normalize_rows(centroids).T
+            np.fill_diagonal(sims, -np.inf)
+            best = np.argmax(sims, axis=1)
+            for i, cid in enumerate(self.cluster_ids):
+                self.fallback[cid] = (self.cluster_ids[best[i]], float(sims[i, best[i]]))
+
+    @timed("knn.query")
+    def query(self, usernames=None, k=3):
+        """Return {username: [(peer, score), ...]} for each requested user (all users by default)."""
+        if usernames is None:
+            usernames = [u for u in self.assignments.usernames if u in self.row_index]
+        usernames = [u.strip().lower() for u in usernames]
+
+        results = {}
+        by_cluster = {}
+        for u in usernames:
+            if u not in self.row_index:
+                print(f"❌ Feature vector not found for {u}")
+                results[u] = []
+            elif u not in self.assignments.row_index:
+                print(f"❌ Cluster assignment not found for {u}")
+                results[u] = []
+            else:
+                by_cluster.setdefault(self.assignments.cluster_of(u), []).append(u)
+
+        for cid, users in by_cluster.items():
+            member_rows = self.members[cid]
+            if len(member_rows) - 1 >= k:
+                self._search(users, member_rows, k, results, exclude_self=True)
+                continue
+
+            if self.ann_index is not None:
+                print(f"⚠️ Not enough users in cluster {cid}. Falling back to ANN search across clusters...")
+                self._search_ann(users, k, results)
+                continue
+
+            # Fallback: search the nearest cluster instead
+            print(f"⚠️ Not enough users in cluster {cid}. Falling back to nearest cluster...")
+            if cid not in self.fallback:
+                print("❌ Could not find a suitable fallback cluster.")
+                results.update({u: [] for u in users})
+                continue
+            best_cluster, best_score = self.fallback[cid]
+            print(f"➡️ Fallback to nearest cluster: {best_cluster} (similarity: {best_score:.4f})")
+            self._search(users, self.members[best_cluster], k, results, exclude_self=False)
+
+        return results
+
+    def _search(self, users, member_rows, k, results, exclude_self):
+        candidates = self.normed[member_rows]
+        for start in range(0, len(users), QUERY_BLOCK):
+            block = users[start:start + QUERY_BLOCK]
+            query_rows = np.array([self.row_index[u] for u in block], dtype=np.int64)
+            scores = self.normed[query_rows] @ candidates.T
+            if exclude_self:
+                scores[query_rows[:, None] == member_rows[None, :]] = -np.inf
+            best = top_k(scores, k)
+            for i, u in enumerate(block):
+                results[u] = [
+                    (self.usernames[member_rows[j]], float(scores[i, j]))
+                    for j in best[i] if np.isfinite(scores[i, j])
+                ]
+
+    def _search_ann(self, users, k, results):
+        queries = self.vectors[[self.row_index[u] for u in users]]
+        # Ask for a few spares: the index may still hold users deleted since it was built
+        found = self.ann_index.search(queries, k=k + 5, exclude=users)
+        for u, neighbours in zip(users, found):
+            results[u] = [(peer, score) for peer, score in neighbours if peer in self.row_index][:k]
+
+
+def knn_batch(usernames=None, k=3):
+    """Top-k neighbours for many users (or everyone) with a single engine build."""
+    from clustering.ann_index import load_ann_index
+    return KNNEngine(ann_index=load_ann_index()).query(usernames, k=k)
 
 def knn_within_cluster(username, k=3):
-    username = username.strip().lower()
-    user_key = f"{username}::aggregated"
-
-    features = generate_user_feature_vectors()
-    clusters = load_cluster_assignments()
-
-    if user_key not in features:
-        print(f"❌ Feature vector not found for {username}")
-        return []
-
-    # Find user's cluster
-    user_cluster = None
-    for cid, members in clusters.items():
-        if username in [m.strip().lower() for m in members]:
-            user_cluster = cid
-            break
-
-    if not user_cluster:
-        print(f"❌ Cluster assignment not found for {username}")
-        return []
-
-    # Try same-cluster KNN
-    user_vector = np.array(features[user_key]).reshape(1, -1)
-    same_cluster_users = [
-        u.strip().lower() for u in clusters[user_cluster]
-        if u.strip().lower() != username and f"{u.strip().lower()}::aggregated" in features
-    ]
-
-    if len(same_cluster_users) >= k:
-        similarities = []
-        for u in same_cluster_users:
-            vec = np.array(features[f"{u}::aggregated"]).reshape(1, -1)
-            score = cosine_similarity(user_vector, vec)[0][0]
-            similarities.append((u, score))
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:k]
-
-    # Fallback: find nearest cluster using centroid similarity
-    print(f"⚠️ Not enough users in cluster {user_cluster}. Falling back to nearest cluster...")
-    centroids = compute_cluster_centroids(features, clusters)
-    user_centroid = centroids.get(user_cluster)
-    if user_centroid is None:
-        print("❌ Could not compute centroid for user's cluster.")
-        return []
-
-    best_cluster = None
-    best_score = -1
-    for cid, centroid in centroids.items():
-        if cid == user_cluster:
-            continue
-        score = cosine_similarity(user_centroid.reshape(1, -1), centroid.reshape(1, -1))[0][0]
-        if score > best_score:
-            best_score = score
-            best_cluster = cid
-
-    if not best_cluster:
-        print("❌ Could not find a suitable fallback cluster.")
-        return []
-
-    print(f"➡️ Fallback to nearest cluster: {best_cluster} (similarity: {best_score:.4f})")
-    fallback_users = [
-        u.strip().lower() for u in clusters[best_cluster]
-        if f"{u.strip().lower()}::aggregated" in features
-    ]
-
-    similarities = []
-    for u in fallback_users:
-        vec = np.array(features[f"{u}::aggregated"]).reshape(1, -1)
-        score = cosine_similarity(user_vector, vec)[0][0]
-        similarities.append((u, score))
-
-    similarities.sort(key=lambda x: x[1], reverse=True)
-    return similarities[:k]
-
-print(knn_within_cluster("kurva_ravi_shanker"))
\ No newline at end of file
+    return knn_batch([username], k=k)[username.strip().lower()]
+
+if __name__ == "__main__":
+    print(knn_within_cluster("kurva_ravi_shanker"))
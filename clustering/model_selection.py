@@ -0,0 +1,143 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import time
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from clustering.feature_store import get_feature_store
+from utils.metrics import timed
+
+# --- Config ---
+K_MIN = 2
+K_MAX = 16
+SELECTION_SAMPLE = 20000    # rows each candidate k is fitted on
+SILHOUETTE_SAMPLE = 5000    # rows the silhouette is scored on
+SELECTION_N_INIT = 3
+SELECTION_METRICS = ["silhouette", "elbow"]
+CACHE_FILE = os.path.join(os.path.dirname(__file__), "k_selection_cache.json")
+FINGERPRINT_CHUNK = 65536
+
+def matrix_fingerprint(matrix):
+    """Content hash of the feature matrix (shape + bytes), read chunk by chunk."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(matrix.shape).encode())
+    for start in range(0, len(matrix), FINGERPRINT_CHUNK):
+        h.update(np.ascontiguousarray(matrix[start:start + FINGERPRINT_CHUNK]).tobytes())
+    return h.hexdigest()
+
+def load_selection_cache():
+    if not os.path.exists(CACHE_FILE):
+        return {}
+    try:
+        with open(CACHE_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_selection_cache(cache):
+    tmp = CACHE_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp, CACHE_FILE)
+
+def _evaluate_k(task):
+    """Worker: fit KMeans for one k on the sampled rows and score it. Opens the memmap itself."""
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+    from threadpoolctl import threadpool_limits
+
+    matrix_path, rows, k, seed = task
+    start = time.perf_counter()
+    # One BLAS/OpenMP thread per worker so the pool doesn't oversubscribe the cores
+    with threadpool_limits(limits=1):
+        matrix = np.load(matrix_path, mmap_mode='r')
+        X = np.asarray(matrix[rows], dtype=np.float32)
+        kmeans = KMeans(n_clusters=k, random_state=seed, n_init=SELECTION_N_INIT)
+        labels = kmeans.fit_predict(X)
+        if len(np.unique(labels)) > 1:
+            silhouette = float(silhouette_score(X, labels, sample_size=min(SILHOUETTE_SAMPLE, len(X)), random_state=seed))
+        else:
+            silhouette = -1.0
+    return k, {
+        "inertia": float(kmeans.inertia_ / len(X)),
+        "silhouette": silhouette,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+def pick_k(scores, metric="silhouette"):
+    """Best k from {k: {"inertia", "silhouette"}}: highest silhouette, or the elbow of the inertia curve."""
+    ks = sorted(scores)
+    if metric == "silhouette":
+        return max(ks, key=lambda k: (scores[k]["silhouette"], -k))
+    if len(ks) < 3:
+        return ks[0]
+    # Elbow: the point furthest below the chord joining the first and last (normalized) inertia values
+    x = (np.array(ks, dtype=float) - ks[0]) / (ks[-1] - ks[0])
+    inertia = np.array([scores[k]["inertia"] for k in ks])
+    span = inertia[0] - inertia[-1]
+    y = (inertia - inertia[-1]) / span if span > 0 else np.zeros_like(inertia)
+    return ks[int(np.argmax((1 - x) - y))]
+
+@timed("kmeans.select_k")
+def select_num_clusters(store=None, k_min=K_MIN, k_max=K_MAX, metric="silhouette", workers=None, seed=42):
+    """
+    Evaluate k_min..k_max in parallel (one process per candidate k) and return the chosen k.
+    Per-k scores are cached by feature-matrix fingerprint, so only k values not scored
+    for this exact matrix are refitted. Returns {"k", "metric", "scores", "fingerprint",
+    "evaluated", "seconds"}.
+    """
+    if metric not in SELECTION_METRICS:
+        raise ValueError(f"Unknown selection metric '{metric}'. Choose from {SELECTION_METRICS}")
+    store = store or get_feature_store()
+    start = time.perf_counter()
+    n = len(store)
+    k_max = min(k_max, n - 1)
+    if k_max < k_min:
+        raise ValueError(f"Need more than {k_min} users to select a cluster count (have {n}).")
+
+    fingerprint = matrix_fingerprint(store.matrix)
+    cache = load_selection_cache()
+    cached = {int(k): v for k, v in cache.get(fingerprint, {}).items()}
+    todo = [k for k in range(k_min, k_max + 1) if k not in cached]
+
+    if todo:
+        rng = np.random.default_rng(seed)
+        rows = np.arange(n) if n <= SELECTION_SAMPLE else np.sort(rng.choice(n, SELECTION_SAMPLE, replace=False))
+        tasks = [(store.matrix_path, rows, k, seed) for k in todo]
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(todo))) as pool:
+            for k, result in pool.map(_evaluate_k, tasks):
+                cached[k] = result
+        # Only the current matrix is worth keeping; older fingerprints can never match again
+        save_selection_cache({fingerprint: {str(k): v for k, v in sorted(cached.items())}})
+
+    scores = {k: cached[k] for k in range(k_min, k_max + 1)}
+    best_k = pick_k(scores, metric)
+    seconds = round(time.perf_counter() - start, 3)
+    print(f"✅ Selected k={best_k} by {metric} over k={k_min}..{k_max} "
+          f"({len(todo)} evaluated, {len(scores) - len(todo)} cached) in {seconds:.1f}s")
+    return {
+        "k": best_k,
+        "metric": metric,
+        "scores": {str(k): v for k, v in scores.items()},
+        "fingerprint": fingerprint,
+        "evaluated": todo,
+        "seconds": seconds,
+    }
+
+# --- Run directly ---
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score a range of KMeans cluster counts in parallel and pick the best one.")
+    parser.add_argument("--k-min", type=int, default=K_MIN)
+    parser.add_argument("--k-max", type=int, default=K_MAX)
+    parser.add_argument("--metric", choices=SELECTION_METRICS, default="silhouette")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    result = select_num_clusters(k_min=args.k_min, k_max=args.k_max, metric=args.metric, workers=args.workers)
+    for k, score in result["scores"].items():
+        marker = " ⬅️" if int(k) == result["k"] else ""
+        print(f"   k={k:>3}  silhouette={score['silhouette']:.4f}  inertia={score['inertia']:.4f}  ({score['seconds']}s){marker}")
@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from clustering.generate_features import TAG_LIST, DIFFICULTY_ORDER
+from clustering.feature_store import get_feature_store
+from clustering.knn_within_cluster import KNNEngine
+from clustering.ann_index import load_ann_index
+from insights.generate_insight import TAG_SLICE, DIFF_SLICE, PLATFORM_THRESHOLD, insight_record, render_insight
+from utils.load_all_users import iter_group_users
+from utils.storage import get_storage
+from utils.metrics import timed
+
+# --- Config ---
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "output")
+WRITE_CHUNK = 1000   # records per worker task
+DIRECT_LOOKUP_LIMIT = 64   # up to this many users, read only their own groups instead of streaming all groups
+TAG_INDEX = {tag: i for i, tag in enumerate(TAG_LIST)}
+DIFF_INDEX = {lvl: i for i, lvl in enumerate(DIFFICULTY_ORDER)}
+
+
+class PlatformTable:
+    """
+    Per-platform counters for the users an insight run needs, as arrays aligned to
+    feature-store rows: totals, tag counts over TAG_LIST and difficulty counts over
+    DIFFICULTY_ORDER. Filled in one streaming pass over the groups.
+    """
+
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+        self.order = {}       # row -> platform names in the user's own order
+        self.platforms = {}
+
+    def _arrays(self, platform):
+        if platform not in self.platforms:
+            self.platforms[platform] = {
+                "present": np.zeros(self.n_rows, dtype=bool),
+                "total": np.zeros(self.n_rows, dtype=np.int64),
+                "correct": np.zeros(self.n_rows, dtype=np.int64),
+                "unique": np.zeros(self.n_rows, dtype=np.int64),
+                "tags": np.zeros((self.n_rows, len(TAG_LIST)), dtype=np.int32),
+                "diffs": np.zeros((self.n_rows, len(DIFFICULTY_ORDER)), dtype=np.int32),
+            }
+        return self.platforms[platform]
+
+    def set_user(self, row, platforms):
+        # A later group overwrites an earlier one, the same rule load_user() follows
+        for arrays in self.platforms.values():
+            if arrays["present"][row]:
+                arrays["present"][row] = False
+                arrays["tags"][row] = 0
+                arrays["diffs"][row] = 0
+        self.order[row] = list(platforms)
+        for platform, pdata in platforms.items():
+            arrays = self._arrays(platform)
+            arrays["present"][row] = True
+            arrays["total"][row] = pdata.get("total_submissions", 0)
+            arrays["correct"][row] = pdata.get("correct_submissions", 0)
+            arrays["unique"][row] = pdata.get("unique_problems_solved", 0)
+            # Exact key matches only, like the defaultdict lookups in generate_insight_for_user
+            for tag, count in pdata.get("tags_summary", {}).items():
+                if tag in TAG_INDEX:
+                    arrays["tags"][row, TAG_INDEX[tag]] = count
+            for lvl, count in pdata.get("difficulty_summary", {}).items():
+                if lvl in DIFF_INDEX:
+                    arrays["diffs"][row, DIFF_INDEX[lvl]] = count
+
+    def scores(self, platform):
+        """acc * log-boost per row, as in generate_insight_for_user."""
+        arrays = self.platforms[platform]
+        total = arrays["total"]
+        acc = np.divide(arrays["correct"], total, out=np.zeros(self.n_rows), where=total > 0)
+        return acc * (np.log1p(arrays["unique"]) / np.log(101))
+
+
+def load_platform_table(store, rows):
+    """
+    Platform data for the wanted rows: for small sets only the owning groups (known to
+    the feature store) are read, otherwise one streaming pass over every group.
+    """
+    wanted = set(int(r) for r in rows)
+    table = PlatformTable(len(store))
+    if len(wanted) <= DIRECT_LOOKUP_LIMIT:
+        storage = get_storage()
+        by_group = {}
+        for row in wanted:
+            owner = store.owners.get(store.usernames[row])
+            if owner is not None:
+                by_group.setdefault(owner, set()).add(row)
+        groups = ((name, storage.load_group_users(name)) for name in sorted(by_group))
+    else:
+        groups = iter_group_users()
+    for _, users in groups:
+        for user in users:
+            row = store.row_index.get(user["username"].strip().lower())
+            if row is not None and row in wanted:
+                table.set_user(row, user.get("data", {}).get("platforms", {}))
+    return table
+
+
+def top_positive(gaps, n):
+    """Per row, column indices of the n largest positive gaps (ties keep column order)."""
+    order = np.argsort(-gaps, axis=1, kind="stable")[:, :n]
+    return order, np.take_along_axis(gaps, order, axis=1) > 0
+
+
+@timed("insight.build")
+def build_insight_records(usernames=None, k=3, store=None, engine=None):
+    """
+    Insight records for many users (everyone by default) from one feature-store load,
+    one KNN engine build and one pass over the groups. Peer choice, tag/difficulty
+    suggestions and peer gaps are computed as array ops over all users at once.
+    """
+    store = store if store is not None else get_feature_store()
+    engine = engine or KNNEngine(store=store, ann_index=load_ann_index())
+    if usernames is None:
+        usernames = list(store.usernames)
+    usernames = [u.strip().lower() for u in usernames]
+
+    records = {}
+    known = [u for u in usernames if u in store.row_index]
+    for u in usernames:
+        if u not in store.row_index:
+            records[u] = insight_record(u, "no_vector")
+    if not known:
+        return [records[u] for u in usernames]
+
+    neighbours = engine.query(known, k=k)
+    # Memmap view: only the rows of the queried users and their peers are read
+    vectors = store.source_matrix('aggregated')
+
+    rows = np.array([store.row_index[u] for u in known], dtype=np.int64)
+    peer_rows = np.full((len(known), k), -1, dtype=np.int64)
+    peer_sims = np.zeros((len(known), k))
+    for i, u in enumerate(known):
+        for j, (peer, similarity) in enumerate(neighbours.get(u, [])[:k]):
+            peer_rows[i, j] = store.row_index.get(peer, -1)
+            peer_sims[i, j] = similarity
+
+    # Better peer: the first (most similar) neighbour with a higher accuracy score
+    acc = np.asarray(vectors[rows, 0], dtype=np.float64)
+    peer_acc = np.asarray(vectors[np.maximum(peer_rows, 0), 0], dtype=np.float64)
+    has_peers = (peer_rows >= 0).any(axis=1)
+    better_mask = (peer_rows >= 0) & (peer_acc > acc[:, None])
+    has_better = better_mask.any(axis=1)
+    first = np.argmax(better_mask, axis=1)
+    better_rows = peer_rows[np.arange(len(known)), first]
+    better_sims = peer_sims[np.arange(len(known)), first]
+
+    for i, u in enumerate(known):
+        if not has_peers[i]:
+            records[u] = insight_record(u, "no_peers", float(acc[i]))
+        elif not has_better[i]:
+            records[u] = insight_record(u, "top_performer", float(acc[i]))
+
+    sel = np.flatnonzero(has_better)
+    if len(sel):
+        u_rows, b_rows = rows[sel], better_rows[sel]
+        u_vec = np.asarray(vectors[u_rows], dtype=np.float64)
+        b_vec = np.asarray(vectors[b_rows], dtype=np.float64)
+
+        # Global tag/difficulty suggestions from the feature vectors
+        tag_gap = b_vec[:, TAG_SLICE] - u_vec[:, TAG_SLICE]
+        tag_order = np.argsort(-tag_gap, axis=1)[:, :3]
+        tag_diff = np.take_along_axis(tag_gap, tag_order, axis=1)
+        tag_fallback = np.argsort(-b_vec[:, TAG_SLICE], axis=1)[:, :3]
+        diff_gap = b_vec[:, DIFF_SLICE] - u_vec[:, DIFF_SLICE]
+        diff_order = np.argsort(-diff_gap, axis=1)[:, :2]
+        diff_diff = np.take_along_axis(diff_gap, diff_order, axis=1)
+        diff_fallback = np.argsort(-b_vec[:, DIFF_SLICE], axis=1)[:, :2]
+
+        # Platform scores and peer gaps on the first platform both users share
+        table = load_platform_table(store, np.concatenate([u_rows, b_rows]))
+        platform_scores = {p: table.scores(p) for p in table.platforms}
+        compare = [next((p for p in table.order.get(ur, []) if table.platforms[p]["present"][br]), None)
+                   for ur, br in zip(u_rows, b_rows)]
+        peer_gaps = {}
+        for p in table.platforms:
+            idx = np.array([i for i, c in enumerate(compare) if c == p], dtype=np.int64)
+            if not len(idx):
+                continue
+            arrays = table.platforms[p]
+            tag_gaps = arrays["tags"][b_rows[idx]].astype(np.int64) - arrays["tags"][u_rows[idx]]
+            diff_gaps = arrays["diffs"][b_rows[idx]].astype(np.int64) - arrays["diffs"][u_rows[idx]]
+            peer_gaps[p] = (idx, top_positive(tag_gaps, 3), tag_gaps, top_positive(diff_gaps, 2), diff_gaps)
+
+        tag_gap_lists = [[] for _ in sel]
+        diff_gap_lists = [[] for _ in sel]
+        for p, (idx, (t_order, t_pos), t_gaps, (d_order, d_pos), d_gaps) in peer_gaps.items():
+            for n, i in enumerate(idx):
+                tag_gap_lists[i] = [{"tag": TAG_LIST[c], "gap": int(t_gaps[n, c])} for c, ok in zip(t_order[n], t_pos[n]) if ok]
+                diff_gap_lists[i] = [{"difficulty": DIFFICULTY_ORDER[c], "gap": int(d_gaps[n, c])} for c, ok in zip(d_order[n], d_pos[n]) if ok]
+
+        for n, i in enumerate(sel):
+            u, ur, br = known[i], int(u_rows[n]), int(b_rows[n])
+            tags = [TAG_LIST[c] for c, d in zip(tag_order[n], tag_diff[n]) if d > 0] or [TAG_LIST[c] for c in tag_fallback[n]]
+            diffs = [DIFFICULTY_ORDER[c] for c, d in zip(diff_order[n], diff_diff[n]) if d > 0] or [DIFFICULTY_ORDER[c] for c in diff_fallback[n]]
+            scores = {p: float(platform_scores[p][ur]) for p in table.order.get(ur, [])}
+            records[u] = insight_record(
+                u, "ok", float(u_vec[n, 0]),
+                peer={"username": store.usernames[br], "score": float(b_vec[n, 0]), "similarity": float(better_sims[i])},
+                suggested_tags=tags,
+                suggested_difficulties=diffs,
+                platform_scores=scores,
+                weak_platforms=[p for p, s in scores.items() if s < PLATFORM_THRESHOLD],
+                strong_platforms=[p for p, s in scores.items() if s >= PLATFORM_THRESHOLD],
+                compare_platform=compare[n],
+                peer_tag_gaps=tag_gap_lists[n],
+                peer_difficulty_gaps=diff_gap_lists[n],
+            )
+
+    return [records[u] for u in usernames]
+
+
+def _write_records(task):
+    """Worker: render and write one JSON file per record."""
+    out_dir, records = task
+    for record in records:
+        record = dict(record, text=render_insight(record))
+        path = os.path.join(out_dir, f"{record['username'].replace(os.sep, '_')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2, ensure_ascii=False)
+    return len(records)
+
+def write_insights(records, out_dir=OUTPUT_DIR, workers=None):
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(out_dir, records[i:i + WRITE_CHUNK]) for i in range(0, len(records), WRITE_CHUNK)]
+    if len(tasks) <= 1 or workers == 1:
+        return sum(_write_records(task) for task in tasks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(_write_records, tasks))
+
+def generate_bulk_insights(groups=None, k=3, out_dir=OUTPUT_DIR, workers=None):
+    """Insights for the members of the given groups (everyone when groups is None), one file per user."""
+    start = time.perf_counter()
+    usernames = None
+    if groups:
+        storage = get_storage()
+        usernames = [u["username"] for g in groups for u in storage.load_group_users(g)]
+
+    records = build_insight_records(usernames, k=k)
+    computed = time.perf_counter()
+    written = write_insights(records, out_dir=out_dir, workers=workers)
+
+    by_status = {}
+    for record in records:
+        by_status[record["status"]] = by_status.get(record["status"], 0) + 1
+    print(f"✅ Wrote {written} insights to {out_dir} ({by_status}) — "
+          f"compute {computed - start:.1f}s, write {time.perf_counter() - computed:.1f}s")
+    return records
+
+
+# --- Run directly ---
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate insights for whole groups or the whole population in one pass.")
+    parser.add_argument("--group", action="append", help="only members of this group (repeatable); default: everyone")
+    parser.add_argument("-k", type=int, default=3, help="neighbours considered per user")
+    parser.add_argument("--out", default=OUTPUT_DIR, help="output directory for per-user JSON files")
+    parser.add_argument("--workers", type=int, default=None, help="writer processes (default: all cores)")
+    args = parser.parse_args()
+    generate_bulk_insights(args.group, k=args.k, out_dir=args.out, workers=args.workers)
@@ -0,0 +1,130 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from clustering.feature_store import get_feature_store
+from clustering.cluster_assignments import assignments_version, load_cluster_assignments
+from clustering.knn_within_cluster import KNNEngine
+from clustering.ann_index import load_ann_index
+from insights.bulk_insights import build_insight_records
+from utils.metrics import timed, register_cache
+
+# --- Config ---
+INSIGHT_CACHE_SIZE = int(os.environ.get("INSIGHT_CACHE_SIZE", "4096"))
+
+
+class InsightCache:
+    """
+    LRU cache of insight records. Each entry is keyed by username and stamped with
+    (k, feature-store version, the user's feature-row version, the cluster model
+    version); a lookup with a different stamp is a miss. The store version is there
+    because a record quotes its peer's numbers and the peer choice depends on every
+    neighbour, so any feature change (even one made by another process) retires it.
+    invalidate() also drops the entries that used the given users as their better
+    peer, for callers that want the memory back before the next lookup.
+    """
+
+    def __init__(self, maxsize=INSIGHT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()   # username -> (stamp, record)
+        self.peer_of = {}              # peer -> set of usernames whose record uses it
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, username, stamp):
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, username, stamp, record):
+        with self.lock:
+            self._drop(username)
+            self.entries[username] = (stamp, record)
+            peer = (record.get("peer") or {}).get("username")
+            if peer:
+                self.peer_of.setdefault(peer, set()).add(username)
+            while len(self.entries) > self.maxsize:
+                self._drop(next(iter(self.entries)))
+
+    def _drop(self, username):
+        entry = self.entries.pop(username, None)
+        if entry is None:
+            return
+        peer = (entry[1].get("peer") or {}).get("username")
+        if peer in self.peer_of:
+            self.peer_of[peer].discard(username)
+            if not self.peer_of[peer]:
+                del self.peer_of[peer]
+
+    def invalidate(self, usernames):
+        with self.lock:
+            for username in usernames:
+                username = username.strip().lower()
+                for dependant in list(self.peer_of.get(username, ())):
+                    self._drop(dependant)
+                self._drop(username)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.peer_of.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self.entries), "maxsize": self.maxsize, "hits": self.hits,
+                "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+_cache = InsightCache()
+register_cache("insight", lambda: (_cache.hits, _cache.misses))
+_engine = {"key": None, "engine": None}
+_engine_lock = threading.Lock()
+
+def get_insight_cache():
+    return _cache
+
+def get_engine(store, model_version=None):
+    """One KNNEngine per (feature-store version, cluster model version), rebuilt only when either moves."""
+    model_version = model_version or assignments_version()
+    key = (store.version, model_version)
+    with _engine_lock:
+        if _engine["key"] != key:
+            _engine["engine"] = KNNEngine(store=store, clusters=load_cluster_assignments(), ann_index=load_ann_index())
+            _engine["key"] = key
+        return _engine["engine"]
+
+@timed("insight.get")
+def get_insight(username, k=3, store=None, engine=None, model_version=None):
+    """
+    Structured insight record for one user, served from the LRU cache when still current.
+    Pass store to skip the feature-store refresh (a long-running caller refreshes it itself),
+    and engine / model_version to query a snapshot the caller holds instead of the shared engine.
+    """
+    username = username.strip().lower()
+    store = store if store is not None else get_feature_store()
+    model_version = model_version or assignments_version()
+    stamp = (k, store.version, store.row_version(username), model_version)
+
+    record = _cache.get(username, stamp)
+    if record is None:
+        engine = engine if engine is not None else get_engine(store, model_version)
+        record = build_insight_records([username], k=k, store=store, engine=engine)[0]
+        _cache.put(username, stamp, record)
+    return record
+
+def invalidate_insights(usernames):
+    """
+    Hook for create/update/delete: drop this process's cached insights for these users
+    and for users who cite them as peer. Other processes (the insight service) notice
+    the change through the feature-store version in the stamp.
+    """
+    _cache.invalidate(usernames)
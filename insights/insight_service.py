@@ -0,0 +1,288 @@
+"""
+Long-running HTTP/JSON service for insights, KNN and cluster membership.
+
+Keeps the feature matrix, cluster assignments and KNN engine resident, so a query
+costs a dict lookup plus one small matrix multiply instead of a cold script run.
+A background thread re-checks group storage and clusters.npz every few seconds; a
+change is refreshed into a private staging store and a new engine is built off to
+the side, then swapped in as one (store, engine) snapshot, so queries never wait on
+a reload.
+
+    python insights/insight_service.py --port 8000
+
+    GET  /health                      versions, user and cluster counts
+    GET  /insight/<username>?k=3      structured insight (add &format=text for markdown)
+    GET  /knn/<username>?k=3          nearest peers with cosine scores
+    GET  /cluster/<username>          the user's cluster id
+    GET  /clusters/<cluster_id>       members of a cluster (?limit=N)
+    GET  /stats                       request counts, latency and insight-cache stats
+    GET  /metrics                     pipeline metrics in Prometheus text (PIPELINE_METRICS=1)
+    POST /reload                      check for changes right now
+"""
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from clustering.feature_store import FeatureStore
+from clustering.cluster_assignments import assignments_version, load_cluster_assignments
+from clustering.knn_within_cluster import KNNEngine
+from clustering.ann_index import load_ann_index
+from insights.insight_cache import get_insight, get_insight_cache
+from insights.generate_insight import render_insight
+from utils.metrics import count, timer, to_prometheus
+
+# --- Config ---
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+RELOAD_INTERVAL = 2.0   # seconds between change checks
+MAX_K = 50
+
+
+class ServiceState:
+    """
+    Resident store + engine. Requests read the current (store, engine, model_version)
+    snapshot without locking; reloads refresh a separate staging store and build the
+    new engine outside any request path, then swap the snapshot in one assignment.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()          # stats and snapshot swaps
+        self.reload_lock = threading.Lock()   # one reload at a time (watcher vs POST /reload)
+        self.staging = FeatureStore()
+        self.live = (None, None, None)
+        self.loaded_at = None
+        self.requests = {}
+        self.errors = 0
+        self.latency_ms = []
+        self.reload(force=True)
+
+    def snapshot(self):
+        """(store, engine, model_version) as of the last reload; never mutated after the swap."""
+        return self.live
+
+    def reload(self, force=False):
+        """Refresh the staging store from group storage; swap in a new snapshot if the features or clusters moved."""
+        with self.reload_lock:
+            start = time.perf_counter()
+            store, _, model_version = self.live
+            self.staging.refresh()
+            new_model = assignments_version()
+            if not force and (self.staging.version, new_model) == (store.version, model_version):
+                return False
+
+            # The refreshed staging store goes live; a fresh instance (same files) stages the next refresh
+            fresh, self.staging = self.staging, FeatureStore()
+            if store is not None and fresh.version != store.version:
+                # Every cached record is stamped with the old store version; free them now
+                get_insight_cache().clear()
+            if new_model is None:
+                print("⚠️ No cluster assignments yet. Run clustering/kmeans_clustering.py; KNN and insights are unavailable.")
+                engine = None
+            else:
+                engine = KNNEngine(store=fresh, clusters=load_cluster_assignments(), ann_index=load_ann_index())
+            with self.lock:
+                self.live = (fresh, engine, new_model)
+                self.loaded_at = time.time()
+            print(f"✅ Service state loaded: {len(fresh)} users, store v{fresh.version} "
+                  f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return True
+
+    def watch(self, interval=RELOAD_INTERVAL):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"❌ Reload failed: {e}")
+        threading.Thread(target=loop, daemon=True).start()
+
+    def record(self, route, ms, ok):
+        with self.lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+            self.errors += 0 if ok else 1
+            self.latency_ms.append(ms)
+            if len(self.latency_ms) > 10000:
+                del self.latency_ms[:5000]
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latency_ms)
+        pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3) if latencies else None
+        return {
+            "requests": dict(self.requests), "errors": self.errors,
+            "latency_ms": {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)},
+            "insight_cache": get_insight_cache().stats(),
+        }
+
+
+# --- Routes ---
+class NotFound(Exception):
+    pass
+
+def parse_k(query):
+    try:
+        return max(1, min(MAX_K, int(query.get("k", ["3"])[0])))
+    except ValueError:
+        raise ValueError("k must be an integer")
+
+def route_health(state, args, query):
+    store, engine, model_version = state.snapshot()
+    assignments = engine.assignments if engine else None
+    return {
+        "status": "ok",
+        "users": len(store),
+        "clusters": len(assignments.cluster_ids()) if assignments else 0,
+        "store_version": store.version,
+        "model_version": model_version,
+        "loaded_at": state.loaded_at,
+    }
+
+def require_engine(state):
+    """The current snapshot, or NotFound when no cluster model is loaded."""
+    store, engine, model_version = state.snapshot()
+    if engine is None:
+        raise NotFound("no cluster assignments loaded")
+    return store, engine, model_version
+
+def route_insight(state, args, query):
+    username, k = args[0].strip().lower(), parse_k(query)
+    store, engine, model_version = require_engine(state)
+    record = get_insight(username, k=k, store=store, engine=engine, model_version=model_version)
+    if query.get("format", ["json"])[0] == "text":
+        return render_insight(record)
+    return record
+
+def route_knn(state, args, query):
+    username, k = args[0].strip().lower(), parse_k(query)
+    store, engine, _ = require_engine(state)
+    if username not in store.row_index:
+        raise NotFound(f"unknown user '{username}'")
+    peers = engine.query([username], k=k)[username]
+    return {"username": username, "k": k, "neighbours": [{"username": p, "score": s} for p, s in peers]}
+
+def route_cluster(state, args, query):
+    username = args[0].strip().lower()
+    _, engine, _ = require_engine(state)
+    cid = engine.assignments.cluster_of(username)
+    if cid is None:
+        raise NotFound(f"no cluster assignment for '{username}'")
+    return {"username": username, "cluster": cid}
+
+def route_members(state, args, query):
+    _, engine, _ = require_engine(state)
+    try:
+        members = engine.assignments.members(args[0])
+    except ValueError:
+        raise NotFound(f"unknown cluster '{args[0]}'")
+    if not members:
+        raise NotFound(f"unknown cluster '{args[0]}'")
+    limit = int(query.get("limit", [len(members)])[0])
+    return {"cluster": args[0], "size": len(members), "members": members[:limit]}
+
+def route_stats(state, args, query):
+    return state.stats()
+
+def route_metrics(state, args, query):
+    return to_prometheus()
+
+def route_reload(state, args, query):
+    return {"reloaded": state.reload()}
+
+ROUTES = {
+    ("GET", "health"): (route_health, 0),
+    ("GET", "insight"): (route_insight, 1),
+    ("GET", "knn"): (route_knn, 1),
+    ("GET", "cluster"): (route_cluster, 1),
+    ("GET", "clusters"): (route_members, 1),
+    ("GET", "stats"): (route_stats, 0),
+    ("GET", "metrics"): (route_metrics, 0),
+    ("POST", "reload"): (route_reload, 0),
+}
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True   # headers and body go out as separate writes on keep-alive
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status, payload):
+            if isinstance(payload, str):
+                body, ctype = payload.encode(), "text/plain; charset=utf-8"
+            else:
+                body, ctype = json.dumps(payload, ensure_ascii=False).encode(), "application/json"
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _dispatch(self, method):
+            start = time.perf_counter()
+            url = urlsplit(self.path)
+            parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+            route = (method, parts[0] if parts else "")
+            status = 200
+            try:
+                if route not in ROUTES or len(parts) - 1 != ROUTES[route][1]:
+                    raise NotFound(f"no route for {method} {url.path}")
+                handler, _ = ROUTES[route]
+                with timer(f"service.{route[1]}"):
+                    payload = handler(state, parts[1:], parse_qs(url.query))
+            except NotFound as e:
+                status, payload = 404, {"error": str(e)}
+            except ValueError as e:
+                status, payload = 400, {"error": str(e)}
+            except Exception as e:
+                status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+            self._send(status, payload)
+            state.record(route[1], (time.perf_counter() - start) * 1000, status < 500)
+            count("service_requests", route=route[1] if route in ROUTES else "unknown", status=status)
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0) or 0)
+            if length:
+                self.rfile.read(length)
+            self._dispatch("POST")
+
+    return Handler
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, reload_interval=RELOAD_INTERVAL):
+    state = ServiceState()
+    if reload_interval > 0:
+        state.watch(reload_interval)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    print(f"🚀 Insight service listening on http://{host}:{server.server_address[1]}")
+    return server
+
+
+# --- Run directly ---
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve insights, KNN and cluster lookups from warm in-memory state.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL, help="seconds between change checks (0 disables)")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.reload_interval)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down.")
+        server.server_close()
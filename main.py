@@ -1,2 +1,176 @@
+"""
+Single entry point for the pipeline.
+
+    python main.py scrape group <group> [<group>...] | --all   re-scrape groups (each handle once)
+    python main.py scrape add <user> <group> --lc H --cf H [--new-group]
+    python main.py scrape update <user> <group>
+    python main.py cluster [full|incremental] [-k N|auto]
+    python main.py knn <user> [-k 3]
+    python main.py insight <user> [-k 3] [--json]
+    python main.py plot [--method pca|tsne] [--out plot.png]
+    python main.py pipeline [--dry-run] [--scrape G ... | --scrape-all] [--plot]
+    python main.py groups [--size 4] [--mode balanced|complementary] [--out plan.json]
+    python main.py serve [--port 8000]
+    python main.py bench startup | bench pipeline [--scales 1k,10k]
+
+Every subcommand imports its modules only when it runs, so --help and the light
+lookups (knn, insight) never load sklearn, matplotlib or requests.
+"""
 import sys
+import json
+import argparse
+
+
+# --- Subcommands ---
+def cmd_scrape(args):
+    if args.action == "group":
+        from scrapers.batch_scraper import refresh_groups
+        if not args.groups and not args.all:
+            print("❌ Name at least one group, or pass --all.")
+            return
+        kwargs = {"max_workers": args.workers} if args.workers else {}
+        refresh_groups(None if args.all else args.groups, **kwargs)
+    elif args.action == "add":
+        from utils.create_user import create_user_group_link
+        create_user_group_link(args.lc, args.cf, args.user, args.group, args.new_group)
+    else:
+        from utils.update_user import update_user_in_group
+        update_user_in_group(args.user, args.group)
+
+def cmd_cluster(args):
+    from clustering.kmeans_clustering import run_kmeans_clustering
+    kwargs = {"metric": args.metric}
+    if args.clusters:
+        kwargs["n_clusters"] = "auto" if args.clusters == "auto" else int(args.clusters)
+    run_kmeans_clustering(args.mode, **kwargs)
+
+def cmd_knn(args):
+    from clustering.knn_within_cluster import knn_within_cluster
+    for peer, score in knn_within_cluster(args.user, k=args.k):
+        print(f"{peer}\t{score:.4f}")
+
+def cmd_insight(args):
+    if args.json:
+        from insights.generate_insight import get_insight_record
+        print(json.dumps(get_insight_record(args.user, k=args.k), indent=2, ensure_ascii=False))
+    else:
+        from insights.generate_insight import generate_insight_for_user
+        print(generate_insight_for_user(args.user, k=args.k))
+
+def cmd_plot(args):
+    from visualization.plot_clusters import plot_clusters, OUTPUT_PNG
+    plot_clusters(args.method, args.out or OUTPUT_PNG, args.refit, args.show)
+
+def cmd_pipeline(args):
+    from utils.pipeline import run_pipeline
+    run_pipeline(args.k, args.dry_run, args.plot, args.scrape, args.scrape_all)
+
+def cmd_groups(args):
+    from clustering.group_formation import form_groups_from_store, print_report, write_plan
+    groups, report = form_groups_from_store(size=args.size, mode=args.mode, remainder=args.remainder)
+    print_report(report)
+    if args.out:
+        write_plan(groups, report, args.out)
+
+def cmd_serve(args):
+    from insights.insight_service import serve
+    server = serve(args.host, args.port, args.reload_interval)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down.")
+        server.server_close()
+
+def cmd_bench(args):
+    if args.suite == "startup":
+        from test_sample.bench_startup import run_startup_benchmark
+        run_startup_benchmark(repeat=args.repeat, out=args.out)
+    else:
+        from test_sample.benchmark_suite import run_suite
+        run_suite(args.scales.split(","), args.backend, args.out)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Group-based coding practice pipeline.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    scrape = sub.add_parser("scrape", help="scrape LeetCode/Codeforces profiles into group storage")
+    actions = scrape.add_subparsers(dest="action", required=True)
+    group = actions.add_parser("group", help="re-scrape every member of some groups and save")
+    group.add_argument("groups", nargs="*")
+    group.add_argument("--all", action="store_true", help="refresh every group")
+    group.add_argument("--workers", type=int, help="scraper threads")
+    add = actions.add_parser("add", help="scrape a new user and add them to a group")
+    add.add_argument("user")
+    add.add_argument("group")
+    add.add_argument("--lc", required=True, help="LeetCode handle")
+    add.add_argument("--cf", required=True, help="Codeforces handle")
+    add.add_argument("--new-group", action="store_true", help="create the group")
+    update = actions.add_parser("update", help="re-scrape one member")
+    update.add_argument("user")
+    update.add_argument("group")
+    scrape.set_defaults(func=cmd_scrape)
+
+    cluster = sub.add_parser("cluster", help="cluster every user's feature vector")
+    cluster.add_argument("mode", nargs="?", choices=["full", "incremental"], default="full")
+    cluster.add_argument("-k", "--clusters", help="cluster count, or 'auto' (default) to select it")
+    cluster.add_argument("--metric", choices=["silhouette", "elbow"], default="silhouette")
+    cluster.set_defaults(func=cmd_cluster)
+
+    knn = sub.add_parser("knn", help="nearest peers within the user's cluster")
+    knn.add_argument("user")
+    knn.add_argument("-k", type=int, default=3)
+    knn.set_defaults(func=cmd_knn)
+
+    insight = sub.add_parser("insight", help="personalized practice insight for a user")
+    insight.add_argument("user")
+    insight.add_argument("-k", type=int, default=3)
+    insight.add_argument("--json", action="store_true", help="print the structured record")
+    insight.set_defaults(func=cmd_insight)
+
+    plot = sub.add_parser("plot", help="2D plot of the clusters (headless PNG)")
+    plot.add_argument("--method", choices=["pca", "tsne"], default="pca")
+    plot.add_argument("--out", help="PNG path")
+    plot.add_argument("--refit", action="store_true", help="ignore the cached projection")
+    plot.add_argument("--show", action="store_true", help="also open an interactive window")
+    plot.set_defaults(func=cmd_plot)
+
+    pipeline = sub.add_parser("pipeline", help="incremental run: only what is downstream of changed users")
+    pipeline.add_argument("--dry-run", action="store_true", help="print the planned work without writing anything")
+    pipeline.add_argument("--scrape", nargs="+", metavar="GROUP", help="re-scrape these groups first")
+    pipeline.add_argument("--scrape-all", action="store_true", help="re-scrape every group first")
+    pipeline.add_argument("-k", type=int, default=3, help="neighbours per insight")
+    pipeline.add_argument("--plot", action="store_true", help="re-render the cluster plot when anything changed")
+    pipeline.set_defaults(func=cmd_pipeline)
+
+    groups = sub.add_parser("groups", help="plan balanced or complementary groups from the feature store")
+    groups.add_argument("--size", type=int, default=4)
+    groups.add_argument("--mode", choices=["balanced", "complementary"], default="balanced")
+    groups.add_argument("--remainder", choices=["spread", "short"], default="spread",
+                        help="leftovers join groups (spread) or form smaller groups (short)")
+    groups.add_argument("--out", help="write the plan and report as JSON")
+    groups.set_defaults(func=cmd_groups)
+
+    serve = sub.add_parser("serve", help="run the insight HTTP service")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--reload-interval", type=float, default=2.0)
+    serve.set_defaults(func=cmd_serve)
+
+    bench = sub.add_parser("bench", help="startup-time or end-to-end benchmarks")
+    bench.add_argument("suite", choices=["startup", "pipeline"])
+    bench.add_argument("--repeat", type=int, default=5, help="startup: runs per command")
+    bench.add_argument("--scales", default="1k,10k", help="pipeline: comma-separated scales")
+    bench.add_argument("--backend", choices=["json", "sqlite"], default="json", help="pipeline: group storage")
+    bench.add_argument("--out", help="report path")
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
 
+if __name__ == "__main__":
+    sys.exit(main())
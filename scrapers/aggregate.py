@@ -3,11 +3,19 @@ import json
 
 from scrapers.leetcode_scraper import process_leetcode
 from scrapers.codeforces_scraper import process_codeforces
+from scrapers.http_client import get_refresh_client
 from utils.normalizer import process_aggregation_of_data
+from utils.metrics import timed
+from utils.profile_store import fetch_summary
 
-def build_user_profile(leetcode_handle, codeforces_handle, user_name,group_name):
-    leetcode_data = process_leetcode(leetcode_handle)
-    codeforces_data = process_codeforces(codeforces_handle)
+@timed("scrape.profile")
+def build_user_profile(leetcode_handle, codeforces_handle, user_name,group_name, client=None, incremental_cf=False):
+    # Handles already scraped in the current refresh cycle (e.g. via another group) are reused;
+    # anything else is fetched live, never from the response cache (this is an explicit add / update)
+    client = client or get_refresh_client()
+    leetcode_data = fetch_summary("leetcode", leetcode_handle, lambda h: process_leetcode(h, client))
+    codeforces_data = fetch_summary("codeforces", codeforces_handle,
+                                    lambda h: process_codeforces(h, client, incremental=incremental_cf))
     aggregated = process_aggregation_of_data(leetcode_data, codeforces_data)
 
     user = {
@@ -0,0 +1,198 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scrapers.http_client import get_default_client
+from scrapers.leetcode_scraper import process_leetcode_batch, LEETCODE_BATCH_SIZE
+from scrapers.codeforces_scraper import process_codeforces
+from utils.normalizer import process_aggregation_of_data
+from utils.group_totals import rebuild_totals
+from utils.storage import get_storage
+from utils.profile_store import (refresh_cycle, cycle_summary, record_summary, link_member,
+                                 propagate_summaries)
+
+DEFAULT_WORKERS = 16
+
+def scrape_handles(lc_handles, cf_handles, max_workers=DEFAULT_WORKERS, client=None):
+    """
+    Scrape each distinct handle once, however many groups list it.
+
+    Handles are deduplicated case-insensitively; those already scraped in the current
+    refresh cycle come from the profile store instead of the network. LeetCode handles
+    go out in LEETCODE_BATCH_SIZE aliased GraphQL queries and Codeforces handles one
+    request each, side by side on a bounded thread pool. Fresh summaries are recorded
+    in the profile store. Returns ({lc_handle: summary}, {cf_handle: summary}) keyed by
+    lower-cased handle, with None where the scrape failed.
+    """
+    client = client or get_default_client()
+    results = {}
+    todo = {}
+    for platform, handles in (("leetcode", lc_handles), ("codeforces", cf_handles)):
+        results[platform] = {}
+        todo[platform] = {}
+        for handle in handles:
+            key = handle.strip().lower()
+            if key in results[platform] or key in todo[platform]:
+                continue
+            summary = cycle_summary(platform, handle)
+            if summary is not None:
+                results[platform][key] = summary
+            else:
+                todo[platform][key] = handle
+
+    with refresh_cycle(), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        lc_todo = list(todo["leetcode"].values())
+        lc_jobs = [(chunk, pool.submit(process_leetcode_batch, chunk, client))
+                   for chunk in (lc_todo[i:i + LEETCODE_BATCH_SIZE] for i in range(0, len(lc_todo), LEETCODE_BATCH_SIZE))]
+        cf_jobs = [(handle, pool.submit(process_codeforces, handle, client)) for handle in todo["codeforces"].values()]
+
+        for chunk, job in lc_jobs:
+            try:
+                batch = job.result()
+            except Exception as e:
+                print(f"❌ Error while scraping LeetCode handles {chunk[0]}..{chunk[-1]}: {e}")
+                batch = {}
+            for handle in chunk:
+                results["leetcode"][handle.strip().lower()] = batch.get(handle)
+        for handle, job in cf_jobs:
+            try:
+                results["codeforces"][handle.strip().lower()] = job.result()
+            except Exception as e:
+                print(f"❌ Error while scraping Codeforces handle '{handle}': {e}")
+                results["codeforces"][handle.strip().lower()] = None
+
+        for platform in todo:
+            for key, handle in todo[platform].items():
+                if results[platform][key] is not None:
+                    record_summary(platform, handle, results[platform][key])
+
+    reused = sum(len(results[p]) - len(todo[p]) for p in results)
+    if reused:
+        print(f"♻️ Reused {reused} handles already scraped in this refresh cycle.")
+    return results["leetcode"], results["codeforces"]
+
+def member_data(lc_summaries, cf_summaries, lc_handle, cf_handle):
+    """A member's data block from scraped handle summaries, or None if either scrape failed."""
+    leetcode_data = lc_summaries.get(lc_handle.strip().lower())
+    codeforces_data = cf_summaries.get(cf_handle.strip().lower())
+    if leetcode_data is None or codeforces_data is None:
+        return None
+    return {
+        "platforms": {
+            "leetcode": leetcode_data,
+            "codeforces": codeforces_data
+        },
+        "aggregated_data": process_aggregation_of_data(leetcode_data, codeforces_data)
+    }
+
+def scrape_user_profiles(users, max_workers=DEFAULT_WORKERS, client=None):
+    """
+    Scrape many users at once.
+
+    users is an iterable of (username, leetcode_handle, codeforces_handle, group_name).
+    Every distinct handle is scraped once (see scrape_handles), so a person listed in
+    several groups costs one LeetCode alias and one Codeforces request. The shared
+    HttpClient enforces per-host concurrency and rate limits, retries and connection
+    reuse. Returns {username: profile}, with None for users whose scrape failed.
+    Profiles have the same shape as build_user_profile().
+    """
+    users = list(users)
+    start = time.perf_counter()
+
+    with refresh_cycle():
+        lc_summaries, cf_summaries = scrape_handles([u[1] for u in users], [u[2] for u in users], max_workers, client)
+
+    profiles = {}
+    for username, lc_handle, cf_handle, group_name in users:
+        data = member_data(lc_summaries, cf_summaries, lc_handle, cf_handle)
+        if data is None:
+            missing = lc_handle if lc_summaries.get(lc_handle.strip().lower()) is None else cf_handle
+            print(f"❌ Error while scraping user '{username}': handle '{missing}' could not be scraped")
+            profiles[username] = None
+            continue
+        profiles[username] = {
+            "username": username.capitalize(),
+            "groupname": group_name.capitalize(),
+            "data": data
+        }
+
+    ok = sum(1 for p in profiles.values() if p)
+    print(f"✅ Scraped {ok}/{len(users)} users in {time.perf_counter() - start:.1f}s with {max_workers} workers.")
+    return profiles
+
+def scrape_group_profiles(groupname, max_workers=DEFAULT_WORKERS, client=None):
+    """Re-scrape every member of an existing group; LeetCode data comes back in batched queries."""
+    group_data = get_storage().load_group(groupname) or {}
+
+    members = [
+        (username, user["leetcode"], user["codeforces"], groupname)
+        for username, user in group_data.get("users", {}).items()
+    ]
+    return scrape_user_profiles(members, max_workers=max_workers, client=client)
+
+def refresh_groups(groupnames=None, max_workers=DEFAULT_WORKERS, client=None):
+    """
+    Re-scrape several groups (all of them by default) in one refresh cycle and save them.
+
+    Each distinct handle is scraped once across all the groups; every membership gets
+    its copy from that one summary, and memberships in groups outside groupnames are
+    brought up to date through the profile store. Members whose scrape failed keep
+    their old data. Returns {group: refreshed member count}.
+    """
+    storage = get_storage()
+    groupnames = list(groupnames or storage.list_groups())
+    groups = {}
+    for name in groupnames:
+        group_data = storage.load_group(name)
+        if group_data is None:
+            print(f"❌ Group '{name}' does not exist.")
+        else:
+            groups[name] = group_data
+    if not groups:
+        return {}
+
+    start = time.perf_counter()
+    with refresh_cycle():
+        entries = [entry for g in groups.values() for entry in g["users"].values()]
+        lc_summaries, cf_summaries = scrape_handles([e["leetcode"] for e in entries], [e["codeforces"] for e in entries],
+                                                    max_workers, client)
+
+        refreshed, items, counts = [], [], {}
+        for name, group_data in groups.items():
+            counts[name] = 0
+            for username, entry in group_data["users"].items():
+                link_member(entry, name, username)
+                data = member_data(lc_summaries, cf_summaries, entry["leetcode"], entry["codeforces"])
+                if data is not None:
+                    entry["data"] = data
+                    refreshed.append(username)
+                    counts[name] += 1
+            group_data["totalData"] = rebuild_totals(u["data"] for u in group_data["users"].values())
+            items.append((name, group_data))
+        storage.save_groups(items)
+
+        # The same handles may also be listed in groups that were not refreshed
+        summaries = {("leetcode", h): s for h, s in lc_summaries.items() if s is not None}
+        summaries.update({("codeforces", h): s for h, s in cf_summaries.items() if s is not None})
+        skip = [(name, username) for name, g in groups.items() for username in g["users"]]
+        refreshed += propagate_summaries(summaries, skip=skip, storage=storage)
+
+    # Same follow-ups as update_user_in_group: ANN vectors, nearest saved centroid, stale insights
+    from clustering.ann_index import add_users_to_ann_index
+    from clustering.kmeans_clustering import assign_users_to_clusters
+    from insights.insight_cache import invalidate_insights
+    refreshed = list(dict.fromkeys(refreshed))
+    try:
+        add_users_to_ann_index(refreshed)
+        assign_users_to_clusters(refreshed)
+    except Exception as e:
+        print(f"⚠️ Could not update ANN index / clusters: {e}")
+    invalidate_insights(refreshed)
+
+    total = sum(len(g["users"]) for g in groups.values())
+    print(f"✅ Refreshed {sum(counts.values())}/{total} memberships ({len(lc_summaries)} LeetCode / "
+          f"{len(cf_summaries)} Codeforces handles) across {len(groups)} groups in {time.perf_counter() - start:.1f}s.")
+    return counts
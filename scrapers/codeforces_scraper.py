@@ -1,35 +1,66 @@
-import requests
 from collections import Counter
 import sys
 import os
+import json
+import re
 
 # Add utils to path and import normalizer
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'utils')))
 from utils.normalizer import normalize_tag, normalize_difficulty, normalize_language
+from scrapers.http_client import CODEFORCES_API_URL, get_default_client, get_refresh_client
+from utils.metrics import timed
 
-def fetch_cf(handle):
+# --- Incremental sync ---
+CHECKPOINT_DIR = os.path.join(os.path.dirname(__file__), "cf_checkpoints")
+CF_PAGE_SIZE = 100
+PENDING_VERDICTS = {"", "TESTING"}  # not final yet; re-read on the next sync
+
+def fetch_cf(handle, client=None, start=None, count=None):
+    client = client or get_default_client()
+    params = {"handle": handle}
+    if start is not None:
+        params["from"] = start
+        params["count"] = count
     try:
-        resp = requests.get(f"https://codeforces.com/api/user.status?handle={handle}")
-        data = resp.json()
+        data = client.get_json(f"{CODEFORCES_API_URL}/user.status", params=params)
         return data["result"] if data.get("status") == "OK" else []
     except Exception as e:
         print("❌ Codeforces fetch error:", e)
         return []
 
-def process_codeforces(handle):
-    submissions = fetch_cf(handle)
-    total_subs = len(submissions)
-    correct_subs = 0
-    seen_ids = set()
-    tags_counter = Counter()
-    difficulty_counter = Counter()
-    language_summary = {}
+def empty_cf_state():
+    return {
+        "last_id": 0,
+        "pending_ids": [],
+        "total_submissions": 0,
+        "correct_submissions": 0,
+        "seen_ids": [],
+        "tags_summary": {},
+        "difficulty_summary": {},
+        "language_summary": {}
+    }
+
+@timed("normalize.codeforces")
+def fold_submissions(state, submissions):
+    """Add submissions to a running Codeforces tally (counters, seen problem ids, sync watermark)."""
+    seen_ids = set(state["seen_ids"])
+    tags_counter = Counter(state["tags_summary"])
+    difficulty_counter = Counter(state["difficulty_summary"])
+    language_summary = dict(state["language_summary"])
+    total_subs = state["total_submissions"]
+    correct_subs = state["correct_submissions"]
+    pending_ids = []
 
     for sub in submissions:
         verdict = sub.get("verdict", "")
+        if verdict in PENDING_VERDICTS and "id" in sub:
+            pending_ids.append(sub["id"])
+            continue
+
         problem = sub.get("problem", {})
         language = sub.get("programmingLanguage", "")
         pid = f"{problem.get('contestId', '')}{problem.get('index', '')}"
+        total_subs += 1
 
         # Normalize language
         normalized_lang = normalize_language(language)
@@ -52,12 +83,98 @@ def process_codeforces(handle):
             norm_diff = normalize_difficulty(difficulty)
             difficulty_counter[norm_diff] += 1
 
+    ids = [sub["id"] for sub in submissions if "id" in sub]
     return {
+        "last_id": max([state["last_id"]] + ids),
+        "pending_ids": sorted(pending_ids),
         "total_submissions": total_subs,
         "correct_submissions": correct_subs,
-        "wrong_submissions": total_subs - correct_subs,
-        "unique_problems_solved": len(seen_ids),
+        "seen_ids": sorted(seen_ids),
         "tags_summary": dict(tags_counter),
         "difficulty_summary": dict(difficulty_counter),
         "language_summary": language_summary
     }
+
+def summarize_cf_state(state):
+    return {
+        "total_submissions": state["total_submissions"],
+        "correct_submissions": state["correct_submissions"],
+        "wrong_submissions": state["total_submissions"] - state["correct_submissions"],
+        "unique_problems_solved": len(state["seen_ids"]),
+        "tags_summary": dict(state["tags_summary"]),
+        "difficulty_summary": dict(state["difficulty_summary"]),
+        "language_summary": dict(state["language_summary"])
+    }
+
+def checkpoint_path(handle):
+    safe = re.sub(r"[^a-z0-9_.-]", "_", handle.strip().lower())
+    return os.path.join(CHECKPOINT_DIR, f"{safe}.json")
+
+def load_cf_checkpoint(handle):
+    path = checkpoint_path(handle)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_cf_checkpoint(handle, state):
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = checkpoint_path(handle)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+def fetch_cf_since(handle, watermark, client=None):
+    """
+    Page through user.status (newest first) until reaching submissions at or below
+    watermark. Returns None if the watermark was never reached (a failed fetch looks
+    like the end of the history, so the caller must not trust a partial result).
+    """
+    newer = []
+    start = 1
+    while True:
+        page = fetch_cf(handle, client, start=start, count=CF_PAGE_SIZE)
+        for sub in page:
+            if sub.get("id", 0) <= watermark:
+                return newer
+            newer.append(sub)
+        if len(page) < CF_PAGE_SIZE:
+            return newer if watermark == 0 else None
+        start += CF_PAGE_SIZE
+
+def sync_codeforces(handle, client=None):
+    """
+    Incremental refresh: fetch only submissions newer than the handle's checkpoint
+    and fold them into the stored tallies. Submissions that were still being judged
+    last time are fetched again and counted once they have a final verdict.
+    """
+    state = load_cf_checkpoint(handle)
+    if state is None:
+        return None
+    client = client or get_refresh_client()   # a cached user.status page would hide new submissions
+
+    pending = set(state["pending_ids"])
+    watermark = min([state["last_id"]] + [pid - 1 for pid in pending])
+    newer = fetch_cf_since(handle, watermark, client)
+    if newer is None:
+        # Fetch failed midway: keep the old checkpoint rather than skipping submissions
+        return summarize_cf_state(state)
+
+    state["pending_ids"] = []
+    fresh = [sub for sub in newer if sub.get("id", 0) > state["last_id"] or sub.get("id") in pending]
+    state = fold_submissions(state, fresh)
+    save_cf_checkpoint(handle, state)
+    return summarize_cf_state(state)
+
+@timed("scrape.codeforces")
+def process_codeforces(handle, client=None, incremental=False):
+    if incremental:
+        summary = sync_codeforces(handle, client)
+        if summary is not None:
+            return summary
+
+    submissions = fetch_cf(handle, client)
+    state = fold_submissions(empty_cf_state(), submissions)
+    if submissions:
+        save_cf_checkpoint(handle, state)
+    return summarize_cf_state(state)
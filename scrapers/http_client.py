@@ -0,0 +1,177 @@
+import os
+import copy
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import count, metrics_enabled, timer
+from scrapers.response_cache import get_response_cache
+
+# --- Endpoints (override to point the scrapers at a local stub server) ---
+LEETCODE_GRAPHQL_URL = os.environ.get("LEETCODE_GRAPHQL_URL", "https://leetcode.com/graphql")
+CODEFORCES_API_URL = os.environ.get("CODEFORCES_API_URL", "https://codeforces.com/api")
+
+# --- Per-host limits: (max concurrent requests, max requests per second or None) ---
+# Codeforces asks API clients to stay at roughly one call every two seconds.
+HOST_LIMITS = {
+    "leetcode.com": (4, 4.0),
+    "codeforces.com": (1, 0.5),
+}
+DEFAULT_HOST_LIMIT = (8, None)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_TIMEOUT = 30
+
+
+class HostLimiter:
+    """Caps in-flight requests to one host and spaces them to a maximum rate."""
+
+    def __init__(self, max_concurrent, rate=None):
+        self.semaphore = threading.BoundedSemaphore(max_concurrent)
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        if self.interval:
+            with self.lock:
+                now = time.monotonic()
+                slot = max(now, self.next_slot)
+                self.next_slot = slot + self.interval
+            if slot > now:
+                time.sleep(slot - now)
+        return self
+
+    def __exit__(self, *exc):
+        self.semaphore.release()
+
+
+class HttpClient:
+    """
+    Shared HTTP client for the scrapers.
+
+    Each worker thread keeps its own keep-alive requests.Session, every host gets a
+    HostLimiter, and transient failures (connection errors, timeouts, 429/5xx) are
+    retried with exponential backoff and jitter, honouring Retry-After. Responses go
+    through the on-disk ResponseCache (pass cache=False to bypass it). A refresh
+    client (fresh(), get_refresh_client()) skips cached reads but still stores what it
+    fetches, for explicit user updates that must see the live profile.
+    """
+
+    def __init__(self, host_limits=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT, cache=None, refresh=False):
+        self.host_limits = dict(HOST_LIMITS)
+        self.host_limits.update(host_limits or {})
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+        self._local = threading.local()
+        self.cache = get_response_cache() if cache is None else (cache or None)
+        self.refresh = refresh
+
+    def fresh(self):
+        """A refresh client sharing this one's sessions and host limits (so rate limits still hold)."""
+        client = copy.copy(self)
+        client.refresh = True
+        return client
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def _limiter(self, url):
+        host = urlsplit(url).hostname or ""
+        with self._limiters_lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = HostLimiter(*self.host_limits.get(host, DEFAULT_HOST_LIMIT))
+                self._limiters[host] = limiter
+            return limiter
+
+    def _sleep_before_retry(self, attempt, response=None):
+        delay = self.backoff * (2 ** attempt)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        time.sleep(delay + random.uniform(0, self.backoff))
+
+    def request(self, method, url, **kwargs):
+        if self.cache is None:
+            return self._fetch(method, url, **kwargs)
+        params, body = kwargs.get("params"), kwargs.get("json")
+        # Replay stays offline even for refreshes; "on" / "record" go to the network
+        response = None if self.refresh and self.cache.mode != "replay" else self.cache.get(method, url, params, body)
+        if response is None:
+            response = self._fetch(method, url, **kwargs)
+            self.cache.put(method, url, response, params, body)
+        return response
+
+    def _fetch(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        limiter = self._limiter(url)
+        host = urlsplit(url).hostname or ""
+        for attempt in range(self.retries + 1):
+            try:
+                with limiter, timer("http.request"):
+                    response = self._session().request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                count("http_errors", host=host, error=type(e).__name__)
+                if attempt == self.retries:
+                    raise
+                count("http_retries", host=host)
+                self._sleep_before_retry(attempt)
+                continue
+
+            if metrics_enabled():
+                count("http_requests", host=host, status=response.status_code)
+                count("http_response_bytes", len(response.content), host=host)
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                count("http_retries", host=host)
+                self._sleep_before_retry(attempt, response)
+                continue
+            return response
+
+    def get_json(self, url, params=None, **kwargs):
+        return self.request("GET", url, params=params, **kwargs).json()
+
+    def post_json(self, url, json=None, **kwargs):
+        return self.request("POST", url, json=json, **kwargs).json()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def get_default_client():
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
+
+_refresh_client = None
+
+def get_refresh_client():
+    """Client for explicit single-user updates: never answered from the response cache (except in replay)."""
+    global _refresh_client
+    default = get_default_client()
+    with _default_client_lock:
+        if _refresh_client is None:
+            _refresh_client = default.fresh()
+        return _refresh_client
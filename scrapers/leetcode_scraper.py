@@ -1,27 +1,41 @@
-import requests
 from collections import Counter
 
-def process_leetcode(username):
-    headers = {
+from scrapers.http_client import LEETCODE_GRAPHQL_URL, get_default_client
+from utils.metrics import timed
+
+# Users per aliased GraphQL request in batch mode
+LEETCODE_BATCH_SIZE = 20
+
+# Submission stats, tag counts and language counts in one selection, so a user
+# costs a single round-trip instead of three separate queries
+USER_FIELDS = """{
+        submitStats {
+          acSubmissionNum { difficulty count submissions }
+          totalSubmissionNum { difficulty count submissions }
+        }
+        tagProblemCounts {
+          advanced { tagName problemsSolved }
+          intermediate { tagName problemsSolved }
+          fundamental { tagName problemsSolved }
+        }
+        languageProblemCount {
+          languageName
+          problemsSolved
+        }
+      }"""
+
+def _headers(username):
+    return {
         "Content-Type": "application/json",
         "Referer": f"https://leetcode.com/{username}/",
         "User-Agent": "Mozilla/5.0"
     }
 
+@timed("normalize.leetcode")
+def parse_leetcode_user(matched_user):
+    """Turn one matchedUser GraphQL object into the platform summary stored per user."""
     # Submission Stats
-    query1 = """query userSessionProgress($username: String!) {
-      allQuestionsCount { difficulty count }
-      matchedUser(username: $username) {
-        submitStats {
-          acSubmissionNum { difficulty count submissions }
-          totalSubmissionNum { difficulty count submissions }
-        }
-      }
-    }"""
-    resp1 = requests.post("https://leetcode.com/graphql", headers=headers, json={
-        "operationName": "userSessionProgress", "query": query1, "variables": {"username": username}
-    })
-    data1 = resp1.json()["data"]["matchedUser"]["submitStats"]
+    data1 = matched_user["submitStats"]
     total_submissions = sum(x["submissions"] for x in data1["totalSubmissionNum"] if x["difficulty"] != "All")
     correct_submissions = sum(x["count"] for x in data1["acSubmissionNum"] if x["difficulty"] != "All")
     wrong_submissions = total_submissions - correct_submissions
@@ -31,35 +45,14 @@ def process_leetcode(username):
     }
 
     # Tags Summary
-    query2 = """query skillStats($username: String!) {
-      matchedUser(username: $username) {
-        tagProblemCounts {
-          advanced { tagName problemsSolved }
-          intermediate { tagName problemsSolved }
-          fundamental { tagName problemsSolved }
-        }
-      }
-    }"""
-    resp2 = requests.post("https://leetcode.com/graphql", headers=headers, json={"query": query2, "variables": {"username": username}})
-    tags_data = resp2.json()["data"]["matchedUser"]["tagProblemCounts"]
+    tags_data = matched_user["tagProblemCounts"]
     tags_counter = Counter()
     for level in ["fundamental", "intermediate", "advanced"]:
         for tag in tags_data.get(level, []):
             tags_counter[tag["tagName"]] += tag["problemsSolved"]
 
     # Language Summary
-    query3 = """query languageStats($username: String!) {
-      matchedUser(username: $username) {
-        languageProblemCount {
-          languageName
-          problemsSolved
-        }
-      }
-    }"""
-    resp3 = requests.post("https://leetcode.com/graphql", headers=headers, json={
-        "operationName": "languageStats", "query": query3, "variables": {"username": username}
-    })
-    language_data = resp3.json()["data"]["matchedUser"]["languageProblemCount"]
+    language_data = matched_user["languageProblemCount"]
     language_summary = {x["languageName"]: x["problemsSolved"] for x in language_data}
 
     return {
@@ -71,3 +64,49 @@ def process_leetcode(username):
         "difficulty_summary": difficulty_summary,
         "language_summary": language_summary
     }
+
+@timed("scrape.leetcode")
+def process_leetcode(username, client=None):
+    client = client or get_default_client()
+
+    query = f"""query userProfile($username: String!) {{
+      allQuestionsCount {{ difficulty count }}
+      matchedUser(username: $username) {USER_FIELDS}
+    }}"""
+    resp = client.post_json(LEETCODE_GRAPHQL_URL, headers=_headers(username), json={
+        "operationName": "userProfile", "query": query, "variables": {"username": username}
+    })
+    matched_user = (resp.get("data") or {}).get("matchedUser")
+    if not matched_user:
+        raise ValueError(f"LeetCode user '{username}' not found")
+    return parse_leetcode_user(matched_user)
+
+@timed("scrape.leetcode_batch")
+def process_leetcode_batch(usernames, client=None, batch_size=LEETCODE_BATCH_SIZE):
+    """
+    Scrape several LeetCode users per request by aliasing matchedUser once per user
+    (u0: matchedUser(username: $u0) ...). Returns {username: summary}, with None for
+    handles LeetCode does not know.
+    """
+    client = client or get_default_client()
+    usernames = list(dict.fromkeys(usernames))
+    results = {}
+
+    for start in range(0, len(usernames), batch_size):
+        chunk = usernames[start:start + batch_size]
+        variables = {f"u{i}": name for i, name in enumerate(chunk)}
+        params = ", ".join(f"${var}: String!" for var in variables)
+        selections = "\n      ".join(f"{var}: matchedUser(username: ${var}) {USER_FIELDS}" for var in variables)
+        query = f"""query batchUserProfiles({params}) {{
+      {selections}
+    }}"""
+
+        resp = client.post_json(LEETCODE_GRAPHQL_URL, headers=_headers(chunk[0]), json={
+            "operationName": "batchUserProfiles", "query": query, "variables": variables
+        })
+        data = resp.get("data") or {}
+        for var, name in variables.items():
+            matched_user = data.get(var)
+            results[name] = parse_leetcode_user(matched_user) if matched_user else None
+
+    return results
@@ -0,0 +1,271 @@
+"""
+On-disk cache of scraper HTTP responses, content-addressed by endpoint and query.
+
+The key is a SHA-256 over method, URL and the canonical params / JSON body, so the
+same LeetCode GraphQL query or Codeforces user.status page maps to the same entry
+whichever caller asks (a retried batch, a re-scrape of overlapping groups). Only
+200 responses without GraphQL "errors" are stored. Entries are gzip-compressed JSON files under scrapers/http_cache/<2 hex>/<key>.json.gz.
+
+Modes (SCRAPER_CACHE env var):
+    on      read-through with per-endpoint TTLs and size-bounded LRU eviction (default);
+            only bulk scrapes read it, explicit user updates / Codeforces syncs go through
+            a refresh client that always fetches live (and stores the result)
+    off     always hit the network, store nothing
+    record  always hit the network and store every 200 response, never evict
+    replay  serve only what was recorded (TTLs ignored); a miss raises ReplayMiss
+
+SCRAPER_CACHE_DIR points record/replay at a fixture directory, e.g. to run the
+scrape -> aggregate -> feature pipeline offline:
+
+    SCRAPER_CACHE=record SCRAPER_CACHE_DIR=/tmp/fixtures python main.py scrape group <group>
+    SCRAPER_CACHE=replay SCRAPER_CACHE_DIR=/tmp/fixtures python main.py scrape group <group>
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.metrics import count, register_cache
+
+# --- Config ---
+CACHE_MODE = os.environ.get("SCRAPER_CACHE", "on").lower()
+CACHE_DIR = os.environ.get("SCRAPER_CACHE_DIR") or os.path.join(os.path.dirname(__file__), "http_cache")
+CACHE_MAX_BYTES = int(os.environ.get("SCRAPER_CACHE_MAX_MB", "256")) * 1024 * 1024
+CACHE_MODES = ["on", "off", "record", "replay"]
+
+# Seconds an entry stays fresh, by longest matching "host/path" prefix
+ENDPOINT_TTLS = {
+    "leetcode.com/graphql": 6 * 3600,            # profile stats move slowly
+    "codeforces.com/api/user.status": 15 * 60,   # new submissions show up within a contest
+    "codeforces.com/api/": 3600,
+}
+DEFAULT_TTL = 15 * 60
+EVICT_TO = 0.9   # evict down to this fraction of the size bound
+
+
+class ReplayMiss(requests.RequestException):
+    """No recorded response for this request in replay mode."""
+
+
+def endpoint_of(url):
+    parts = urlsplit(url)
+    return f"{parts.hostname or ''}{parts.path}"
+
+def ttl_for(url):
+    endpoint = endpoint_of(url)
+    matches = [prefix for prefix in ENDPOINT_TTLS if endpoint.startswith(prefix)]
+    return ENDPOINT_TTLS[max(matches, key=len)] if matches else DEFAULT_TTL
+
+def request_key(method, url, params=None, json_body=None):
+    """Content address of a request: method, URL and canonical params / body (headers excluded)."""
+    canonical = json.dumps([method.upper(), url, sorted((params or {}).items()), json_body],
+                           sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, cache_dir=CACHE_DIR, mode=CACHE_MODE, max_bytes=CACHE_MAX_BYTES):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"SCRAPER_CACHE must be one of {CACHE_MODES}, got '{mode}'")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        # Recorded fixtures are never evicted
+        self.max_bytes = max_bytes if mode == "on" else None
+        self.lock = threading.Lock()
+        self.entries = None   # key -> [size, last access], scanned from disk on first use
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def _scan(self):
+        if self.entries is not None:
+            return
+        self.entries, self.total_bytes = {}, 0
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json.gz"):
+                    stat = entry.stat()
+                    self.entries[entry.name[:-len(".json.gz")]] = [stat.st_size, stat.st_mtime]
+                    self.total_bytes += stat.st_size
+
+    # --- Lookup ---
+    def get(self, method, url, params=None, json_body=None):
+        """Cached requests.Response, or None when the request must go to the network."""
+        if self.mode in ("off", "record"):
+            return None
+        key = request_key(method, url, params, json_body)
+        host = urlsplit(url).hostname or ""
+        try:
+            with gzip.open(self._path(key), "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+
+        if entry is not None and self.mode == "on" and time.time() - entry["created"] > ttl_for(url):
+            count("http_cache", host=host, result="expired")
+            entry = None
+        if entry is None:
+            with self.lock:
+                self.misses += 1
+            if self.mode == "replay":
+                raise ReplayMiss(f"no recorded response for {method} {url} in {self.cache_dir}")
+            count("http_cache", host=host, result="miss")
+            return None
+
+        with self.lock:
+            self.hits += 1
+            self._scan()
+            if key in self.entries:
+                self.entries[key][1] = time.time()
+        if self.mode == "on":
+            try:
+                os.utime(self._path(key))   # mtime doubles as the LRU stamp across runs
+            except OSError:
+                pass
+        count("http_cache", host=host, result="hit")
+        return self._response(entry)
+
+    @staticmethod
+    def _response(entry):
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = entry["url"]
+        return response
+
+    @staticmethod
+    def _has_errors(response):
+        # GraphQL reports unknown users and query errors in a 200 body; those must be re-asked
+        if "json" not in response.headers.get("Content-Type", "application/json"):
+            return False
+        try:
+            body = response.json()
+        except ValueError:
+            return False
+        return isinstance(body, dict) and bool(body.get("errors"))
+
+    # --- Store ---
+    def put(self, method, url, response, params=None, json_body=None):
+        if self.mode in ("off", "replay") or response.status_code != 200 or self._has_errors(response):
+            return
+        key = request_key(method, url, params, json_body)
+        path = self._path(key)
+        entry = {
+            "created": time.time(),
+            "status": response.status_code,
+            "headers": {"Content-Type": response.headers.get("Content-Type", "application/json")},
+            "url": url,
+            "request": {"method": method.upper(), "params": params, "json": json_body},
+            "body": response.text,
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(entry, f, separators=(",", ":"))
+        os.replace(tmp, path)
+        count("http_cache", host=urlsplit(url).hostname or "", result="stored")
+
+        with self.lock:
+            self._scan()
+            size = os.path.getsize(path)
+            old = self.entries.get(key)
+            self.total_bytes += size - (old[0] if old else 0)
+            self.entries[key] = [size, time.time()]
+            if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * EVICT_TO))
+
+    def _evict(self, target):
+        for key, (size, _) in sorted(self.entries.items(), key=lambda item: item[1][1]):
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del self.entries[key]
+            self.total_bytes -= size
+            count("http_cache_evictions")
+
+    # --- Maintenance ---
+    def stats(self):
+        with self.lock:
+            self._scan()
+            return {"mode": self.mode, "dir": self.cache_dir, "entries": len(self.entries), "bytes": self.total_bytes,
+                    "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+    def prune(self):
+        """Drop entries past their endpoint TTL. Returns the number removed."""
+        removed = 0
+        with self.lock:
+            self._scan()
+            for key in list(self.entries):
+                try:
+                    with gzip.open(self._path(key), "rt", encoding="utf-8") as f:
+                        entry = json.load(f)
+                    expired = time.time() - entry["created"] > ttl_for(entry["url"])
+                except (OSError, ValueError, KeyError):
+                    expired = True
+                if expired:
+                    try:
+                        os.remove(self._path(key))
+                    except OSError:
+                        pass
+                    self.total_bytes -= self.entries.pop(key)[0]
+                    removed += 1
+        return removed
+
+    def clear(self):
+        with self.lock:
+            self._scan()
+            for key in list(self.entries):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self.entries, self.total_bytes = {}, 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Process-wide response cache configured from SCRAPER_CACHE / SCRAPER_CACHE_DIR."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+            register_cache("http_response", lambda: (_cache.hits, _cache.misses))
+        return _cache
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clean the scraper HTTP response cache.")
+    parser.add_argument("action", choices=["stats", "prune", "clear"])
+    args = parser.parse_args()
+
+    cache = get_response_cache()
+    if args.action == "prune":
+        print(f"🗑️ Removed {cache.prune()} expired responses.")
+    elif args.action == "clear":
+        cache.clear()
+        print(f"🗑️ Cleared {cache.cache_dir}")
+    print(json.dumps(cache.stats(), indent=2))
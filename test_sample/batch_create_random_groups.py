@@ -2,11 +2,19 @@ import json
 import os
 import random
 import sys
+import numpy as np
 
 # Setup path to access your core logic
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from utils.create_user import create_user_group_link
+from scrapers.batch_scraper import scrape_user_profiles
+from clustering.feature_store import user_row, ROW_DIM
+from clustering.cluster_assignments import load_cluster_assignments
+from clustering.group_formation import form_groups, print_report, TAGS
+
+GROUP_SIZE = 4
+FORMATION_MODE = "balanced"   # or "complementary"; see clustering/group_formation.py
 
 # Load user list: [username, leetcode_id, codeforces_id]
 with open("test_sample/testUsers.json", "r") as f:
@@ -14,28 +22,39 @@ with open("test_sample/testUsers.json", "r") as f:
 
 random.shuffle(users)
 
-GROUP_SIZE = 4
-group_number = 1
-
-# Create groups of 4
-for i in range(0, len(users), GROUP_SIZE):
-    group_chunk = users[i:i + GROUP_SIZE]
-
-    # Skip if not enough users for a full group
-    if len(group_chunk) < GROUP_SIZE:
-        print(f"⚠️ Skipping incomplete group of {len(group_chunk)} users.")
-        break
-
+# Scrape everyone concurrently up front; groups are formed from the scraped profiles
+profiles = scrape_user_profiles((username, lc_handle, cf_handle, "unassigned") for username, lc_handle, cf_handle in users)
+for username, _, _ in users:
+    if not profiles.get(username):
+        print(f"⚠️ Skipping '{username}': scrape failed.")
+users = [u for u in users if profiles.get(u[0])]
+
+# Aggregated feature block per user, labelled with the nearest saved centroid if clusters exist
+rows = np.stack([user_row(profiles[username])[1] for username, _, _ in users]) if users else np.zeros((0, ROW_DIM))
+assignments = load_cluster_assignments()
+labels = None
+if assignments is not None and assignments.centroids is not None and len(users):
+    from clustering.kmeans_clustering import assign_to_centroids
+    labels, _ = assign_to_centroids(rows, assignments.centroids)
+
+# Balanced (or complementary) groups of GROUP_SIZE; leftovers join existing groups instead of being dropped
+index_groups, report = form_groups(rows[:, 0], rows[:, TAGS], labels, size=GROUP_SIZE, mode=FORMATION_MODE)
+print_report(report)
+groups = [[users[i] for i in members] for members in index_groups]
+
+# Create the groups
+for group_number, group_chunk in enumerate(groups, start=1):
     group_name = f"group{group_number}"
     print(f"\n🔧 Creating {group_name} with users: {[u[0] for u in group_chunk]}")
 
-    for idx, (username, lc_handle, cf_handle) in enumerate(group_chunk):
+    group_created = False
+    for username, lc_handle, cf_handle in group_chunk:
         create_user_group_link(
             username_lc=lc_handle,
             username_cf=cf_handle,
             username=username,
             group_name=group_name,
-            create_new_group=(idx == 0)  # First user creates the group
+            create_new_group=not group_created,  # First user creates the group
+            user_profile=profiles[username]
         )
-
-    group_number += 1
+        group_created = True
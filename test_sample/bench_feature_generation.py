@@ -0,0 +1,91 @@
+"""
+Feature generation benchmark: cold feature-store builds over a synthetic population,
+serial and with FeatureStore(workers=N), checking that every parallel build is
+identical to the serial one (usernames, group index and every float32 bit). It
+also checks that a group deleted and recreated under the same name (what removing
+its last member and adding someone else does) is picked up by a warm refresh.
+
+    python test_sample/bench_feature_generation.py --users 100000 --workers 1,2,4,8
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from clustering.feature_store import FeatureStore
+from test_sample.synthetic_population import generate_population, PopulationGenerator
+from utils.storage import JSONGroupStorage, SQLiteGroupStorage
+
+
+def cold_build(storage, store_dir, workers):
+    os.makedirs(store_dir)
+    store = FeatureStore(storage=storage, store_dir=store_dir, workers=workers)
+    start = time.perf_counter()
+    store.refresh()
+    return store, time.perf_counter() - start
+
+def check_recreate(workdir, backend="json", seed=42):
+    """Delete a group, recreate it with a different member, refresh: the store must follow."""
+    if backend == "sqlite":
+        storage = SQLiteGroupStorage(os.path.join(workdir, "recreate.sqlite3"))
+    else:
+        storage = JSONGroupStorage(os.path.join(workdir, "recreate_groups"))
+    generator = PopulationGenerator(seed)
+    alice, bob = generator.user_entry(0), generator.user_entry(1)
+
+    storage.put_user("g1", "alice", alice, alice["data"]["aggregated_data"])
+    os.makedirs(os.path.join(workdir, "recreate_store"))
+    store = FeatureStore(storage=storage, store_dir=os.path.join(workdir, "recreate_store"), workers=1)
+    store.refresh()
+    storage.delete_group("g1")
+    storage.put_user("g1", "bob", bob, bob["data"]["aggregated_data"])
+    store.refresh()
+    ok = store.groups.get("g1", {}).get("users") == ["bob"] and "bob" in store and "alice" not in store
+    print(f"   delete -> recreate  {'✅ refreshed' if ok else '❌ stale: ' + str(store.groups.get('g1', {}).get('users'))}")
+    return ok
+
+def run_benchmark(n_users, worker_counts, backend="json", seed=42):
+    workdir = tempfile.mkdtemp(prefix="gbcp_features_")
+    try:
+        if backend == "sqlite":
+            storage = SQLiteGroupStorage(os.path.join(workdir, "groups.sqlite3"))
+        else:
+            storage = JSONGroupStorage(os.path.join(workdir, "groups"))
+        generate_population(n_users, storage, seed=seed)
+
+        report = {"users": n_users, "backend": backend, "cpu_count": os.cpu_count(), "runs": {}}
+        serial = None
+        for workers in [1] + [w for w in worker_counts if w != 1]:
+            store, seconds = cold_build(storage, os.path.join(workdir, f"store_{workers}"), workers)
+            if serial is None:
+                serial, base = store, seconds
+            identical = (store.usernames == serial.usernames and store.groups.keys() == serial.groups.keys()
+                         and all(store.groups[g]["users"] == serial.groups[g]["users"] for g in store.groups)
+                         and np.array_equal(np.asarray(store.matrix), np.asarray(serial.matrix)))
+            report["runs"][workers] = {"seconds": round(seconds, 3), "speedup": round(base / seconds, 2), "identical": identical}
+            print(f"   workers={workers:<3} {seconds:7.2f}s  x{base / seconds:.2f}  {'✅ identical' if identical else '❌ differs from serial'}")
+        report["recreate_refreshed"] = check_recreate(workdir, backend, seed)
+        return report
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare serial and multi-process feature-store builds.")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.users, [int(w) for w in args.workers.split(",")], args.backend)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,83 @@
+"""
+Microbenchmark: tag/language normalization over a synthetic 100k-submission
+Codeforces history, comparing the old per-call linear scans with the precompiled
+lookup tables (+ LRU cache) and the bulk API.
+
+    python test_sample/bench_normalizer.py [num_submissions]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import normalizer
+from utils.normalizer import TAG_NORMALIZATION_MAP, LANGUAGE_NORMALIZATION_MAP, clean_token
+
+CF_TAGS = sorted({v for variants in TAG_NORMALIZATION_MAP.values() for v in variants}) + ["dfs and similar", "*special problem"]
+CF_LANGUAGES = ["GNU G++17 7.3.0", "GNU G++20 11.2.0 (64 bit, winlibs)", "Python 3", "PyPy 3-64",
+                "Java 11", "Kotlin 1.7", "C# 10", "Rust 2021", "GNU C11", "Go"]
+
+
+# --- Reference implementations (before the lookup tables) ---
+def legacy_normalize_tag(tag):
+    if not tag:
+        return "unknown"
+    cleaned = clean_token(tag)
+    for canonical, variants in TAG_NORMALIZATION_MAP.items():
+        if cleaned in variants:
+            return canonical
+    return cleaned or "unknown"
+
+def legacy_normalize_language(lang):
+    if not lang:
+        return "unknown"
+    cleaned = clean_token(lang.replace("(", "").replace(")", ""))
+    for canonical, variants in LANGUAGE_NORMALIZATION_MAP.items():
+        if cleaned in {clean_token(v.replace("(", "").replace(")", "")) for v in variants}:
+            return canonical
+    return cleaned or "unknown"
+
+
+def synthetic_history(n, seed=7):
+    rng = random.Random(seed)
+    return [
+        {"tags": rng.sample(CF_TAGS, rng.randint(1, 4)), "programmingLanguage": rng.choice(CF_LANGUAGES)}
+        for _ in range(n)
+    ]
+
+def timed(label, fn, baseline=None):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    speedup = f"  ({baseline / elapsed:.1f}x)" if baseline else ""
+    print(f"   {label:<30} {elapsed * 1000:9.1f} ms{speedup}")
+    return result, elapsed
+
+
+def main(n=100_000):
+    history = synthetic_history(n)
+    tags = [tag for sub in history for tag in sub["tags"]]
+    languages = [sub["programmingLanguage"] for sub in history]
+    print(f"⏱️ Normalizing {len(tags)} tags and {len(languages)} languages from {n} submissions")
+
+    legacy, base = timed("legacy per-call scan", lambda: (
+        [legacy_normalize_tag(t) for t in tags], [legacy_normalize_language(l) for l in languages]))
+
+    normalizer.normalize_tag.cache_clear()
+    normalizer.normalize_language.cache_clear()
+    per_call, _ = timed("lookup table + LRU", lambda: (
+        [normalizer.normalize_tag(t) for t in tags], [normalizer.normalize_language(l) for l in languages]), base)
+
+    normalizer.normalize_tag.cache_clear()
+    normalizer.normalize_language.cache_clear()
+    bulk, _ = timed("bulk normalize_tags/languages", lambda: (
+        normalizer.normalize_tags(tags), normalizer.normalize_languages(languages)), base)
+
+    assert legacy == per_call == bulk, "normalized output differs from the legacy implementation"
+    print(f"✅ Identical output. Tag cache: {normalizer.normalize_tag.cache_info()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,72 @@
+"""
+Startup-time benchmark: wall time of fresh interpreters running main.py subcommands
+(--help, so no data is needed) and importing each pipeline module, plus which heavy
+dependencies every import drags in.
+
+    python test_sample/bench_startup.py [--repeat 5] [--out startup.json]
+    python main.py bench startup
+"""
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# --- Config ---
+COMMANDS = [["--help"], ["knn", "--help"], ["insight", "--help"], ["cluster", "--help"], ["scrape", "--help"]]
+MODULES = [
+    "clustering.knn_within_cluster", "insights.generate_insight", "insights.insight_cache",
+    "insights.insight_service", "clustering.kmeans_clustering", "utils.create_user",
+    "scrapers.batch_scraper", "visualization.plot_clusters",
+]
+HEAVY = ["sklearn", "matplotlib", "scipy", "requests"]
+LIGHT_BUDGET = 1.0   # seconds; knn/insight paths should start well under this
+
+PROBE = "import sys, json; import {module}; print(json.dumps([m for m in {heavy} if m in sys.modules]))"
+
+
+def wall_time(argv, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return {"median_s": round(statistics.median(times), 4), "min_s": round(min(times), 4)}
+
+def run_startup_benchmark(repeat=5, out=None):
+    report = {"python": sys.version.split()[0], "repeat": repeat,
+              "baseline": wall_time([sys.executable, "-c", "pass"], repeat), "commands": {}, "modules": {}}
+    print(f"🧪 Interpreter baseline: {report['baseline']['median_s'] * 1000:.0f} ms")
+
+    for args in COMMANDS:
+        name = "main.py " + " ".join(args)
+        report["commands"][name] = wall_time([sys.executable, "main.py"] + args, repeat)
+        print(f"   {name:<36} {report['commands'][name]['median_s'] * 1000:7.0f} ms")
+
+    for module in MODULES:
+        stats = wall_time([sys.executable, "-c", f"import {module}"], repeat)
+        probe = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+                               cwd=ROOT, capture_output=True, text=True, check=True)
+        stats["heavy_imports"] = json.loads(probe.stdout.strip().splitlines()[-1])
+        report["modules"][module] = stats
+        flag = "" if stats["median_s"] < LIGHT_BUDGET else " ⚠️"
+        print(f"   import {module:<29} {stats['median_s'] * 1000:7.0f} ms  {', '.join(stats['heavy_imports']) or '-'}{flag}")
+
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Startup report written to {out}")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure CLI and module import startup time.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per command (median reported)")
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+    run_startup_benchmark(args.repeat, args.out)
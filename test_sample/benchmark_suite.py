@@ -0,0 +1,187 @@
+"""
+End-to-end benchmark harness.
+
+For each scale, copies the code into a scratch workspace (so groups/ and the
+generated artifacts of this checkout are never touched), writes a synthetic
+population there, starts the stub LeetCode/Codeforces API, and times the main
+paths in a fresh process. All runs go into one JSON report:
+
+    python test_sample/benchmark_suite.py --scales 1k,10k
+    python test_sample/benchmark_suite.py --scales 1k --compare test_sample/bench_results/<old>.json
+
+Timed steps: load_all_users, generate_user_feature_vectors (cold and warm),
+run_kmeans_clustering, knn_within_cluster, generate_insight_for_user (cache miss
+and hit), create_user_group_link, update_user_in_group and delete_user_from_group.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import threading
+import subprocess
+import contextlib
+import io
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+# --- Config ---
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "bench_results")
+SCALES = {"1k": 1000, "10k": 10000, "100k": 100000}
+DEFAULT_SCALES = "1k,10k"
+CODE_DIRS = ["clustering", "insights", "scrapers", "utils", "visualization", "test_sample"]
+IGNORE = shutil.ignore_patterns("__pycache__", "*.npy", "*.npz", "features_index.json", "k_selection_cache.json",
+                                "output", "cf_checkpoints", "http_cache", "bench_results", "*.png")
+INSIGHT_SAMPLE = 50
+SEED = 42
+
+
+# --- Worker (runs inside the scratch workspace) ---
+def timed(results, name, func, *args, repeat=1, **kwargs):
+    """Run func quietly `repeat` times; record total seconds, per-call ms and peak RSS."""
+    import resource
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            value = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    results[name] = {
+        "seconds": round(seconds, 4),
+        "ms_per_call": round(seconds * 1000 / repeat, 3),
+        "calls": repeat,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    print(f"   {name:<36} {seconds:8.3f}s" + (f"  ({results[name]['ms_per_call']} ms/call)" if repeat > 1 else ""))
+    return value
+
+def run_worker(n_users, seed=SEED):
+    import random
+    from test_sample.synthetic_population import generate_population
+    from utils.load_all_users import load_all_users
+    from clustering.generate_features import generate_user_feature_vectors
+    from clustering.kmeans_clustering import run_kmeans_clustering
+    from clustering.knn_within_cluster import knn_within_cluster
+    from insights.generate_insight import generate_insight_for_user
+    from utils.create_user import create_user_group_link
+    from utils.update_user import update_user_in_group
+    from utils.delete_user import delete_user_from_group
+    from utils.storage import get_storage
+
+    steps = {}
+    n_groups = timed(steps, "generate_population", generate_population, n_users, seed=seed)
+    timed(steps, "load_all_users", load_all_users)
+    features = timed(steps, "generate_user_feature_vectors_cold", generate_user_feature_vectors)
+    timed(steps, "generate_user_feature_vectors_warm", generate_user_feature_vectors)
+    timed(steps, "run_kmeans_clustering", run_kmeans_clustering)
+
+    usernames = sorted({key.split("::")[0] for key in features})
+    sample = random.Random(seed).sample(usernames, min(INSIGHT_SAMPLE, len(usernames)))
+    timed(steps, "knn_within_cluster", knn_within_cluster, sample[0])
+    misses = iter(sample)
+    timed(steps, "generate_insight_for_user_miss", lambda: generate_insight_for_user(next(misses)), repeat=len(sample))
+    timed(steps, "generate_insight_for_user_hit", generate_insight_for_user, sample[0], repeat=len(sample))
+
+    timed(steps, "create_user_group_link", create_user_group_link,
+          "lc_bench_new", "cf_bench_new", "bench_newcomer", "bench_newgroup", True)
+    timed(steps, "update_user_in_group", update_user_in_group, "bench_newcomer", "bench_newgroup")
+    timed(steps, "delete_user_from_group", delete_user_from_group, "bench_newcomer", "bench_newgroup")
+    return {"users": n_users, "groups": n_groups, "backend": get_storage().kind, "steps": steps}
+
+
+# --- Driver ---
+def make_workspace():
+    workspace = tempfile.mkdtemp(prefix="gbcp_bench_")
+    for name in CODE_DIRS:
+        shutil.copytree(os.path.join(ROOT, name), os.path.join(workspace, name), ignore=IGNORE)
+    os.makedirs(os.path.join(workspace, "groups"))
+    return workspace
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def environment():
+    import numpy
+    import sklearn
+    return {"python": platform.python_version(), "numpy": numpy.__version__, "sklearn": sklearn.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "commit": git_commit()}
+
+def run_scale(n_users, backend, stub_url, keep=False):
+    workspace = make_workspace()
+    out = os.path.join(workspace, "result.json")
+    # Response cache off so the create/update steps always time a real (stub) scrape
+    env = dict(os.environ, GROUP_STORAGE=backend, SCRAPER_CACHE="off",
+               LEETCODE_GRAPHQL_URL=f"{stub_url}/graphql", CODEFORCES_API_URL=f"{stub_url}/api")
+    print(f"🧪 {n_users} users ({backend}) in {workspace}")
+    try:
+        subprocess.run([sys.executable, os.path.join(workspace, "test_sample", "benchmark_suite.py"),
+                        "--worker", str(n_users), "--out", out], cwd=workspace, env=env, check=True)
+        with open(out) as f:
+            return json.load(f)
+    finally:
+        if not keep:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+def compare_reports(old, new):
+    """Print per-step ratios (new / old) for every scale both reports ran."""
+    old_runs = {(r["users"], r["backend"]): r for r in old["runs"]}
+    for run in new["runs"]:
+        base = old_runs.get((run["users"], run["backend"]))
+        if base is None:
+            continue
+        print(f"📊 {run['users']} users ({run['backend']}) vs {old['environment'].get('commit')}:")
+        for step, stats in run["steps"].items():
+            if step in base["steps"] and base["steps"][step]["seconds"] > 0:
+                ratio = stats["seconds"] / base["steps"][step]["seconds"]
+                flag = " ⚠️" if ratio > 1.2 else ""
+                print(f"   {step:<36} {base['steps'][step]['seconds']:8.3f}s → {stats['seconds']:8.3f}s  x{ratio:.2f}{flag}")
+
+def run_suite(scales, backend="json", out=None, keep=False):
+    from test_sample.stub_api_server import serve
+    server = serve(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(), "runs": []}
+    try:
+        for scale in scales:
+            report["runs"].append(run_scale(SCALES.get(scale) or int(scale), backend, stub_url, keep))
+    finally:
+        server.shutdown()
+
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}-{report['environment']['commit'] or 'local'}.json")
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Benchmark report written to {out}")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic populations.")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated: 1k, 10k, 100k or a user count")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--out", help="report path (default: test_sample/bench_results/bench-<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch workspaces")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.worker)
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        sys.exit(0)
+
+    report = run_suite(args.scales.split(","), args.backend, args.out, args.keep)
+    if args.compare:
+        with open(args.compare) as f:
+            compare_reports(json.load(f), report)
@@ -0,0 +1,101 @@
+"""
+Load test for insights/insight_service.py.
+
+    python insights/insight_service.py --port 8000 &
+    python test_sample/load_test_service.py --url http://127.0.0.1:8000 -n 5000 -c 8
+
+Picks users from the service's own clusters, fires a mix of insight / knn / cluster
+requests from several keep-alive connections, and prints latency percentiles per
+route. --json writes the same numbers as a machine-readable report.
+"""
+import json
+import random
+import threading
+import time
+import http.client
+from urllib.parse import urlsplit, quote
+
+ROUTES = ["insight", "knn", "cluster"]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def pick_users(conn, limit=200):
+    conn.request("GET", "/health")
+    health = json.loads(conn.getresponse().read())
+    users = []
+    for i in range(health.get("clusters", 0)):
+        conn.request("GET", f"/clusters/cluster_{i}?limit={limit}")
+        resp = conn.getresponse()
+        body = json.loads(resp.read())
+        if resp.status == 200:
+            users.extend(body["members"])
+    return users
+
+
+def run_load_test(url, total=2000, concurrency=8, routes=ROUTES, seed=0):
+    parts = urlsplit(url)
+    connect = lambda: http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+    users = pick_users(connect())
+    if not users:
+        raise SystemExit("❌ Service has no clustered users to query.")
+
+    rng = random.Random(seed)
+    plan = [(rng.choice(routes), rng.choice(users)) for _ in range(total)]
+    latencies = {route: [] for route in routes}
+    errors = []
+    lock = threading.Lock()
+
+    def worker(jobs):
+        conn = connect()
+        for route, user in jobs:
+            start = time.perf_counter()
+            conn.request("GET", f"/{route}/{quote(user)}")
+            resp = conn.getresponse()
+            resp.read()
+            ms = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies[route].append(ms)
+                if resp.status != 200:
+                    errors.append((route, user, resp.status))
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(plan[i::concurrency],)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    report = {"url": url, "requests": total, "concurrency": concurrency, "users": len(users),
+              "seconds": round(elapsed, 3), "rps": round(total / elapsed, 1), "errors": len(errors), "routes": {}}
+    for route, values in latencies.items():
+        report["routes"][route] = {"count": len(values),
+                                   **{f"p{int(q * 100)}_ms": round(percentile(values, q), 3) for q in (0.5, 0.95, 0.99) if values}}
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fire concurrent requests at the insight service and report latency.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma-separated subset of " + ",".join(ROUTES))
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = run_load_test(args.url, args.requests, args.concurrency, args.routes.split(","))
+    print(f"📈 {report['requests']} requests, {report['concurrency']} connections: "
+          f"{report['rps']} req/s, {report['errors']} errors")
+    for route, stats in report["routes"].items():
+        print(f"   {route:<8} n={stats['count']:<6} " + "  ".join(f"{k}={v}" for k, v in stats.items() if k != "count"))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
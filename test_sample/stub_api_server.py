@@ -0,0 +1,145 @@
+"""
+Local stand-in for the LeetCode GraphQL and Codeforces APIs.
+
+Serves deterministic fake data for any handle so the scrapers can be exercised
+offline and under load:
+
+    python test_sample/stub_api_server.py --port 8765 --latency 0.2
+    LEETCODE_GRAPHQL_URL=http://127.0.0.1:8765/graphql \\
+    CODEFORCES_API_URL=http://127.0.0.1:8765/api python test_sample/batch_create_random_groups.py
+
+--fail-rate makes a fraction of requests answer 503 to exercise retries.
+"""
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+LC_TAGS = ["Array", "String", "Hash Table", "Dynamic Programming", "Math", "Sorting", "Greedy",
+           "Depth-First Search", "Binary Search", "Tree", "Two Pointers", "Stack", "Graph"]
+CF_TAGS = ["implementation", "math", "greedy", "dp", "data structures", "brute force",
+           "constructive algorithms", "graphs", "sortings", "binary search", "strings", "number theory"]
+LANGUAGES = ["Python3", "C++", "Java", "JavaScript"]
+CF_LANGUAGES = ["GNU G++17 7.3.0", "Python 3", "PyPy 3-64", "Java 11"]
+
+
+def rng_for(handle):
+    return random.Random(zlib.crc32(handle.encode()))
+
+
+def leetcode_user(handle):
+    rng = rng_for("lc:" + handle)
+    solved = {d: rng.randint(0, 300) for d in ("Easy", "Medium", "Hard")}
+    subs = {d: n + rng.randint(0, n + 5) for d, n in solved.items()}
+    ac = [{"difficulty": d, "count": n, "submissions": n} for d, n in solved.items()]
+    total = [{"difficulty": d, "count": n, "submissions": subs[d]} for d, n in solved.items()]
+    ac.insert(0, {"difficulty": "All", "count": sum(solved.values()), "submissions": sum(solved.values())})
+    total.insert(0, {"difficulty": "All", "count": sum(solved.values()), "submissions": sum(subs.values())})
+    tags = [{"tagName": t, "problemsSolved": rng.randint(0, 80)} for t in rng.sample(LC_TAGS, 8)]
+    return {
+        "submitStats": {"acSubmissionNum": ac, "totalSubmissionNum": total},
+        "tagProblemCounts": {"fundamental": tags[:3], "intermediate": tags[3:6], "advanced": tags[6:]},
+        "languageProblemCount": [{"languageName": l, "problemsSolved": rng.randint(1, 200)} for l in rng.sample(LANGUAGES, 2)],
+    }
+
+
+def codeforces_submissions(handle):
+    rng = rng_for("cf:" + handle)
+    subs = []
+    for sid in range(rng.randint(0, 400), 0, -1):
+        contest = rng.randint(1, 2000)
+        subs.append({
+            "id": sid,
+            "verdict": "OK" if rng.random() < 0.6 else "WRONG_ANSWER",
+            "programmingLanguage": rng.choice(CF_LANGUAGES),
+            "problem": {"contestId": contest, "index": rng.choice("ABCDE"),
+                        "rating": rng.choice([800, 1000, 1200, 1500, 1800, 2100]),
+                        "tags": rng.sample(CF_TAGS, rng.randint(1, 3))},
+        })
+    return subs
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+    latency = 0.0
+    fail_rate = 0.0
+    stats = {"requests": 0, "connections": set()}
+    stats_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _begin(self):
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            self.stats["connections"].add(self.client_address)
+        time.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            self._reply(503, {"error": "stub: injected failure"})
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/stats":
+            with self.stats_lock:
+                return self._reply(200, {"requests": self.stats["requests"], "connections": len(self.stats["connections"])})
+        if not self._begin():
+            return
+        if url.path.endswith("/user.status"):
+            query = parse_qs(url.query)
+            subs = codeforces_submissions(query.get("handle", [""])[0])
+            start = int(query.get("from", ["1"])[0]) - 1
+            count = int(query.get("count", [str(len(subs))])[0])
+            return self._reply(200, {"status": "OK", "result": subs[start:start + count]})
+        self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not self._begin():
+            return
+        variables = payload.get("variables", {})
+        query = payload.get("query", "")
+        data = {}
+        # Plain "matchedUser(username: $username)" or aliased "u0: matchedUser(username: $u0)"
+        for alias, var in re.findall(r"(?:(\w+)\s*:\s*)?matchedUser\(username:\s*\$(\w+)\)", query):
+            user = leetcode_user(variables.get(var, ""))
+            data[alias or "matchedUser"] = {k: v for k, v in user.items() if k in query}
+        if "allQuestionsCount" in query:
+            data["allQuestionsCount"] = [{"difficulty": d, "count": 1000} for d in ("All", "Easy", "Medium", "Hard")]
+        self._reply(200, {"data": data})
+
+
+def serve(port=8765, latency=0.0, fail_rate=0.0):
+    StubHandler.latency = latency
+    StubHandler.fail_rate = fail_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stub LeetCode/Codeforces API server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of artificial latency per request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.fail_rate)
+    print(f"🧪 Stub API listening on http://127.0.0.1:{args.port} (graphql: /graphql, codeforces: /api)")
+    server.serve_forever()
@@ -0,0 +1,181 @@
+"""
+Synthetic group data at any scale, in exactly the shape the scrapers store.
+
+Per-user skill is log-normal and drives volume, accuracy, difficulty mix and CF
+ratings; tag and language counts follow popularity-weighted, per-user skewed
+distributions over real LeetCode / Codeforces names (LeetCode keys stay raw,
+Codeforces keys are normalized, as the scrapers do). Deterministic for a seed.
+
+    python test_sample/synthetic_population.py --users 10000 --out /tmp/bench_groups
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.normalizer import normalize_tag, normalize_difficulty, normalize_language, process_aggregation_of_data
+from utils.group_totals import rebuild_totals
+from utils.storage import get_storage, new_group_data
+
+# Relative popularity (roughly problems per tag on each site)
+LC_TAGS = {
+    "Array": 30, "String": 18, "Hash Table": 15, "Dynamic Programming": 14, "Math": 12, "Sorting": 10,
+    "Greedy": 10, "Depth-First Search": 8, "Binary Search": 8, "Tree": 7, "Two Pointers": 7,
+    "Breadth-First Search": 6, "Matrix": 6, "Bit Manipulation": 5, "Stack": 5, "Heap (Priority Queue)": 5,
+    "Graph": 4, "Prefix Sum": 4, "Simulation": 4, "Sliding Window": 4, "Backtracking": 3, "Linked List": 3,
+    "Union Find": 2, "Trie": 2, "Design": 2, "Database": 2, "Segment Tree": 1, "Number Theory": 1,
+    "Geometry": 1, "Game Theory": 1, "Shell": 0.3, "Concurrency": 0.3,
+}
+CF_TAGS = {
+    "implementation": 20, "math": 18, "greedy": 16, "constructive algorithms": 10, "brute force": 10,
+    "dp": 9, "sortings": 8, "data structures": 7, "strings": 6, "number theory": 6, "binary search": 5,
+    "graphs": 4, "dfs and similar": 4, "trees": 3, "two pointers": 3, "bitmasks": 3, "combinatorics": 2,
+    "geometry": 1, "games": 1, "interactive": 1, "shortest paths": 1, "dsu": 1,
+}
+LC_LANGUAGES = {"Python3": 35, "C++": 30, "Java": 25, "JavaScript": 8, "Go": 2}
+CF_LANGUAGES = {"GNU G++17 7.3.0": 55, "Python 3": 15, "PyPy 3-64": 10, "Java 11": 12, "GNU G++20 11.2.0 (64 bit, winlibs)": 8}
+CF_RATINGS = np.arange(800, 3600, 100)
+GROUP_SIZE_RANGE = (2, 6)
+WRITE_BATCH = 500   # groups per storage.save_groups() call
+TAGS_PER_PROBLEM = 1.8
+
+
+def _weights(table):
+    names = list(table)
+    weights = np.array([table[n] for n in names], dtype=float)
+    return names, weights / weights.sum()
+
+def _skewed(rng, base, concentration=0.6):
+    """Popularity weights reshaped by a per-user Dirichlet-like draw (favourite topics)."""
+    w = base * rng.gamma(concentration, 1.0, size=len(base))
+    return w / w.sum() if w.sum() > 0 else base
+
+def _counts(names, counts, normalize=None):
+    summary = {}
+    for name, count in zip(names, counts):
+        if count:
+            key = normalize(name) if normalize else name
+            summary[key] = summary.get(key, 0) + int(count)
+    return summary
+
+def empty_platform():
+    return {"total_submissions": 0, "correct_submissions": 0, "wrong_submissions": 0, "unique_problems_solved": 0,
+            "tags_summary": {}, "difficulty_summary": {}, "language_summary": {}}
+
+
+class PopulationGenerator:
+    def __init__(self, seed=42):
+        self.rng = np.random.default_rng(seed)
+        self.lc_tags, self.lc_tag_w = _weights(LC_TAGS)
+        self.cf_tags, self.cf_tag_w = _weights(CF_TAGS)
+        self.lc_langs, self.lc_lang_w = _weights(LC_LANGUAGES)
+        self.cf_langs, self.cf_lang_w = _weights(CF_LANGUAGES)
+        self.cf_rating_names = [normalize_difficulty(str(r)) for r in CF_RATINGS]
+
+    def leetcode(self, skill):
+        rng = self.rng
+        if rng.random() < 0.1:
+            return empty_platform()
+        solved = int(min(3000, rng.pareto(1.5) * 25 * skill + rng.integers(1, 20)))
+        hard = min(0.35, 0.04 * skill)
+        easy = 0.65 / (1 + 0.35 * skill)
+        by_diff = rng.multinomial(solved, [easy, 1 - easy - hard, hard])
+        accuracy = rng.beta(2 + skill, 2)
+        total = int(solved / max(accuracy, 0.05) * rng.uniform(1.0, 1.4))
+        tags = rng.multinomial(int(solved * TAGS_PER_PROBLEM), _skewed(rng, self.lc_tag_w))
+        if rng.random() < 0.5:   # about half of users stick to a single language
+            langs = np.zeros(len(self.lc_langs), dtype=int)
+            langs[rng.choice(len(self.lc_langs), p=self.lc_lang_w)] = solved
+        else:
+            langs = rng.multinomial(solved, _skewed(rng, self.lc_lang_w, 0.3))
+        return {
+            "total_submissions": total,
+            "correct_submissions": solved,
+            "wrong_submissions": total - solved,
+            "unique_problems_solved": solved,
+            "tags_summary": _counts(self.lc_tags, tags),
+            "difficulty_summary": {d: int(n) for d, n in zip(("Easy", "Medium", "Hard"), by_diff)},
+            "language_summary": _counts(self.lc_langs, langs),
+        }
+
+    def codeforces(self, skill):
+        rng = self.rng
+        if rng.random() < 0.3:
+            return empty_platform()
+        total = int(min(8000, rng.pareto(1.3) * 40 * skill + rng.integers(1, 30)))
+        correct = int(total * rng.beta(1.5 + skill, 2.5))
+        unique = int(correct * rng.uniform(0.7, 0.95))
+        rating = np.clip(rng.normal(900 + 350 * skill, 300, size=unique), 800, 3500)
+        by_rating = np.bincount(((rating - 800) // 100).astype(int), minlength=len(CF_RATINGS))
+        tags = rng.multinomial(int(unique * TAGS_PER_PROBLEM), _skewed(rng, self.cf_tag_w))
+        langs = rng.multinomial(total, _skewed(rng, self.cf_lang_w, 0.3))
+        return {
+            "total_submissions": total,
+            "correct_submissions": correct,
+            "wrong_submissions": total - correct,
+            "unique_problems_solved": unique,
+            "tags_summary": _counts(self.cf_tags, tags, normalize_tag),
+            "difficulty_summary": _counts(self.cf_rating_names, by_rating),
+            "language_summary": _counts(self.cf_langs, langs, normalize_language),
+        }
+
+    def user_entry(self, index):
+        skill = float(np.clip(self.rng.lognormal(0.0, 0.6), 0.1, 6.0))
+        lc, cf = self.leetcode(skill), self.codeforces(skill)
+        return {
+            "leetcode": f"lc_bench_{index}",
+            "codeforces": f"cf_bench_{index}",
+            "data": {"platforms": {"leetcode": lc, "codeforces": cf},
+                     "aggregated_data": process_aggregation_of_data(lc, cf)},
+        }
+
+    def groups(self, n_users, prefix="bench"):
+        """Yield (group_name, group_data) until n_users users have been placed."""
+        placed, g = 0, 0
+        while placed < n_users:
+            size = min(n_users - placed, int(self.rng.integers(GROUP_SIZE_RANGE[0], GROUP_SIZE_RANGE[1] + 1)))
+            name = f"{prefix}_group{g}"
+            group_data = new_group_data(name)
+            for i in range(placed, placed + size):
+                username = f"{prefix}_user{i}"
+                group_data["users"][username] = self.user_entry(i)
+                group_data["groupMembers"].append(username)
+            group_data["groupSize"] = size
+            group_data["totalData"] = rebuild_totals(u["data"] for u in group_data["users"].values())
+            yield name, group_data
+            placed += size
+            g += 1
+
+
+def generate_population(n_users, storage=None, seed=42, prefix="bench"):
+    """Write n_users synthetic users into storage (default: the configured backend). Returns the group count."""
+    storage = storage or get_storage()
+    start = time.perf_counter()
+    batch, n_groups = [], 0
+    for item in PopulationGenerator(seed).groups(n_users, prefix):
+        batch.append(item)
+        if len(batch) >= WRITE_BATCH:
+            storage.save_groups(batch)
+            n_groups += len(batch)
+            batch = []
+    if batch:
+        storage.save_groups(batch)
+        n_groups += len(batch)
+    print(f"✅ Generated {n_users} synthetic users in {n_groups} groups ({storage.kind}) in {time.perf_counter() - start:.1f}s")
+    return n_groups
+
+
+if __name__ == "__main__":
+    import argparse
+    from utils.storage import JSONGroupStorage
+
+    parser = argparse.ArgumentParser(description="Write a synthetic population of group JSON files.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--out", required=True, help="directory for the group JSON files (kept apart from groups/)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    generate_population(args.users, JSONGroupStorage(os.path.abspath(args.out)), seed=args.seed)
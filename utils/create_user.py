@@ -1,48 +1,40 @@
 import sys
 import os
-import json
 
 # Add parent directory to sys.path to access scrapers and utils
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from scrapers.aggregate import build_user_profile
-from utils.normalizer import process_aggregation_of_data
+from utils.group_totals import add_member
+from utils.storage import get_storage, new_group_data
+from utils.profile_store import link_member
+from clustering.ann_index import add_users_to_ann_index
+from clustering.kmeans_clustering import assign_users_to_clusters
+from insights.insight_cache import invalidate_insights
 
-def create_user_group_link(username_lc: str, username_cf: str, username: str, group_name: str, create_new_group: bool):
-    group_file_path = os.path.join("groups", f"{group_name}.json")
+def create_user_group_link(username_lc: str, username_cf: str, username: str, group_name: str, create_new_group: bool, user_profile: dict = None):
+    storage = get_storage()
 
-    # Step 1: Load or initialize group JSON
+    # Step 1: Load or initialize group (members and totals only; other users' data isn't needed)
     if create_new_group:
-        if os.path.exists(group_file_path):
+        if storage.group_exists(group_name):
             print(f"❌ Group '{group_name}' already exists. Choose a different name or join instead.")
             return
-        group_data = {
-            "groupname": group_name.capitalize(),
-            "groupSize": 0,
-            "groupMembers": [],
-            "totalData": {
-                "platforms": {
-                    "leetcode": {},
-                    "codeforces": {}
-                },
-                "aggregated_data": {}
-            },
-            "users": {}
-        }
+        group_data = new_group_data(group_name)
     else:
-        if not os.path.exists(group_file_path):
+        group_data = storage.load_group(group_name, include_users=False)
+        if group_data is None:
             print(f"❌ Group '{group_name}' does not exist. Use create_new_group=True to create it.")
             return
-        with open(group_file_path, 'r') as f:
-            group_data = json.load(f)
 
         if username in group_data["groupMembers"]:
             print(f"⚠️ User '{username}' is already a member of group '{group_name}'")
             return
 
-    # Step 2: Build user profile
+    # Step 2: Build user profile (unless it was already scraped, e.g. by scrape_user_profiles)
     try:
-        user_profile = build_user_profile(username_lc, username_cf, username, group_name)
+        if user_profile is None:
+            user_profile = build_user_profile(username_lc, username_cf, username, group_name)
         if not isinstance(user_profile, dict) or not user_profile:
             print(f"❌ Failed to fetch valid data for user: {username}")
             return
@@ -51,9 +43,8 @@ def create_user_group_link(username_lc: str, username_cf: str, username: str, gr
         return
 
     # Step 3: Add user data with handles
-    group_data["groupMembers"].append(username)
     group_data["groupSize"] += 1
-    group_data["users"][username] = {
+    user_entry = {
         "leetcode": username_lc,
         "codeforces": username_cf,
         "data": user_profile["data"]
@@ -61,36 +52,31 @@ def create_user_group_link(username_lc: str, username_cf: str, username: str, gr
 
     user_data = user_profile["data"]
 
-    # Step 4: Update totalData
-    if group_data["groupSize"] == 1:
-        group_data["totalData"] = {
-            "platforms": user_data["platforms"],
-            "aggregated_data": user_data["aggregated_data"]
-        }
-    else:
-        group_data["totalData"] = {
-            "platforms": {
-                "leetcode": process_aggregation_of_data(
-                    group_data["totalData"]["platforms"]["leetcode"],
-                    user_data["platforms"]["leetcode"]
-                ),
-                "codeforces": process_aggregation_of_data(
-                    group_data["totalData"]["platforms"]["codeforces"],
-                    user_data["platforms"]["codeforces"]
-                )
-            },
-            "aggregated_data": process_aggregation_of_data(
-                group_data["totalData"]["aggregated_data"],
-                user_data["aggregated_data"]
-            )
-        }
-
-    # Step 5: Save updated group JSON
-    os.makedirs("groups", exist_ok=True)  # Ensure the 'groups' folder exists
-    with open(group_file_path, "w") as f:
-        json.dump(group_data, f, indent=4)
-
-    # Step 6: Final confirmation
+    # Step 4: Update totalData (add this member's contribution to the group counters)
+    group_data["totalData"] = add_member(group_data["totalData"], user_data)
+
+    # Step 5: Save the new member and group totals
+    storage.put_user(group_name, username, user_entry, group_data["totalData"], groupname=group_name)
+
+    # Step 5b: Reference the handles from the shared profile store so later refreshes reach this membership
+    link_member(user_entry, group_name, username)
+
+    # Step 6: Insert the new user into the ANN index (if one has been built)
+    try:
+        add_users_to_ann_index([username])
+    except Exception as e:
+        print(f"⚠️ Could not update ANN index for '{username}': {e}")
+
+    # Step 6b: Place the user at the nearest saved centroid (no refit)
+    try:
+        assign_users_to_clusters([username])
+    except Exception as e:
+        print(f"⚠️ Could not assign cluster for '{username}': {e}")
+
+    # Step 6c: Drop any cached insight for this username
+    invalidate_insights([username])
+
+    # Step 7: Final confirmation
     if create_new_group:
         print(f"✅ New group '{group_name}' created with user '{username}'")
     else:
@@ -0,0 +1,120 @@
+import os
+import sys
+import copy
+from collections import Counter
+
+# Add project root to sys.path to allow relative imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.normalizer import normalize_tag, normalize_difficulty, normalize_language
+from utils.storage import get_storage, empty_total_data
+
+COUNT_FIELDS = ["total_submissions", "correct_submissions", "wrong_submissions", "unique_problems_solved"]
+SUMMARY_FIELDS = {
+    "tags_summary": normalize_tag,
+    "difficulty_summary": normalize_difficulty,
+    "language_summary": normalize_language,
+}
+
+# Group totals are plain sums of each member's normalized contribution, so adding,
+# removing or replacing one member is a delta on the counters. Keys are normalized
+# once, on the member's side; the totals themselves are never re-normalized.
+
+def normalize_contribution(summary):
+    """A member's platform/aggregated summary with tag, difficulty and language keys normalized."""
+    contribution = {field: summary.get(field, 0) for field in COUNT_FIELDS}
+    for field, normalize_func in SUMMARY_FIELDS.items():
+        counter = Counter()
+        for key, count in summary.get(field, {}).items():
+            counter[normalize_func(key)] += count
+        contribution[field] = dict(counter)
+    return contribution
+
+def _apply(total, summary, sign):
+    contribution = normalize_contribution(summary)
+    for field in COUNT_FIELDS:
+        total[field] = total.get(field, 0) + sign * contribution[field]
+    for field in SUMMARY_FIELDS:
+        counts = total.setdefault(field, {})
+        for key, count in contribution[field].items():
+            value = counts.get(key, 0) + sign * count
+            if value:
+                counts[key] = value
+            else:
+                counts.pop(key, None)
+
+def apply_member_delta(total_data, user_data, sign):
+    """Return total_data with one member's data added (sign=1) or subtracted (sign=-1)."""
+    total = copy.deepcopy(total_data) if total_data else empty_total_data()
+    platforms = total.setdefault("platforms", {})
+    for platform, summary in user_data.get("platforms", {}).items():
+        _apply(platforms.setdefault(platform, {}), summary, sign)
+    _apply(total.setdefault("aggregated_data", {}), user_data.get("aggregated_data", {}), sign)
+    return total
+
+def add_member(total_data, user_data):
+    return apply_member_delta(total_data, user_data, 1)
+
+def remove_member(total_data, user_data):
+    return apply_member_delta(total_data, user_data, -1)
+
+def replace_member(total_data, old_user_data, new_user_data):
+    return add_member(remove_member(total_data, old_user_data), new_user_data)
+
+def rebuild_totals(users_data):
+    """Totals from scratch over every member's data block."""
+    total = empty_total_data()
+    for user_data in users_data:
+        total = add_member(total, user_data)
+    return total
+
+
+# --- Verification ---
+def diff_totals(expected, actual, path="totalData"):
+    """List the differences between two totals structures; missing counters count as zero."""
+    if isinstance(expected, dict) or isinstance(actual, dict):
+        expected = expected if isinstance(expected, dict) else {}
+        actual = actual if isinstance(actual, dict) else {}
+        diffs = []
+        for key in sorted(set(expected) | set(actual)):
+            diffs.extend(diff_totals(expected.get(key), actual.get(key), f"{path}.{key}"))
+        return diffs
+    if (expected or 0) != (actual or 0):
+        return [f"{path}: stored {actual!r}, rebuilt {expected!r}"]
+    return []
+
+def verify_group_totals(fix=False, storage=None, names=None):
+    """Rebuild every group's (or just the named groups') totals from its members and report (optionally repair) drift."""
+    storage = storage or get_storage()
+    mismatched = 0
+    for name in (storage.list_groups() if names is None else names):
+        group_data = storage.load_group(name)
+        rebuilt = rebuild_totals(u["data"] for u in group_data.get("users", {}).values())
+        diffs = diff_totals(rebuilt, group_data.get("totalData", {}))
+        if not diffs:
+            continue
+        mismatched += 1
+        print(f"⚠️ Group '{name}' totals differ in {len(diffs)} field(s):")
+        for line in diffs[:10]:
+            print(f"   {line}")
+        if len(diffs) > 10:
+            print(f"   ... and {len(diffs) - 10} more")
+        if fix:
+            storage.set_totals(name, rebuilt)
+            print(f"🔧 Rewrote totals for '{name}'")
+
+    if mismatched:
+        print(f"❌ {mismatched} group(s) with drifted totals." if not fix else f"✅ Repaired totals for {mismatched} group(s).")
+    else:
+        print("✅ All group totals match their members.")
+    return mismatched
+
+
+# --- Run directly ---
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild every group's totalData from its members and diff against the stored totals.")
+    parser.add_argument("--fix", action="store_true", help="overwrite stored totals that differ")
+    args = parser.parse_args()
+    sys.exit(1 if verify_group_totals(fix=args.fix) and not args.fix else 0)
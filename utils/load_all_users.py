@@ -1,32 +1,45 @@
 import os
+import sys
 import json
 
-def load_all_users():
-    groups_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'groups'))
-    all_users = []
-
-    for filename in os.listdir(groups_dir):
-        if filename.endswith('.json'):
-            group_path = os.path.join(groups_dir, filename)
-
-            with open(group_path, 'r') as f:
-                group_data = json.load(f)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.storage import get_storage
+from utils.metrics import timed
 
-            users_dict = group_data.get('users', {})
+def iter_group_users():
+    """Yield (group_name, users) one group at a time; only one group is held in memory."""
+    storage = get_storage()
+    for name in storage.list_groups():
+        yield name, storage.load_group_users(name)
 
-            if isinstance(users_dict, dict):
-                for username, user_data in users_dict.items():
-                    if 'data' in user_data and 'aggregated_data' in user_data['data']:
-                        user_data["username"] = username  # add username to the object
-                        all_users.append(user_data)
-                    else:
-                        print(f"⚠️ Skipping invalid user: {username} in {filename}")
-            else:
-                print(f"⚠️ 'users' field is not a dict in {filename}, skipping.")
+def iter_users():
+    """Yield valid users group by group instead of materializing every user up front."""
+    for _, users in iter_group_users():
+        yield from users
 
+@timed("load_all_users")
+def load_all_users():
+    all_users = list(iter_users())
     print(f"✅ Loaded {len(all_users)} valid users from all group files.")
     return all_users
 
+def find_user_group(username):
+    """Name of the group holding username, from the persisted username -> group index."""
+    groups = get_storage().find_user_groups(username)
+    # Same rule as the feature store: the last group in sorted order wins for duplicates
+    return groups[-1] if groups else None
+
+def load_user(username):
+    """Load one user (entry plus "username") by reading only the group that holds them."""
+    group_name = find_user_group(username)
+    if group_name is None:
+        return None
+    wanted = username.strip().lower()
+    for user in get_storage().load_group_users(group_name):
+        if user["username"].strip().lower() == wanted:
+            return user
+    return None
+
 # Test run
 if __name__ == "__main__":
     users = load_all_users()
@@ -0,0 +1,277 @@
+"""
+Opt-in instrumentation for the pipeline: stage timers, counters and latency histograms.
+
+Off by default, and then every hook is a flag check. Turn it on with
+PIPELINE_METRICS=1 (or enable_metrics()); PIPELINE_METRICS_OUT=<file.json|file.prom>
+writes a report at exit, and PIPELINE_PROFILE=<file.prof> also runs cProfile and
+dumps its stats at exit. As a flag, run any script through this module:
+
+    python utils/metrics.py --out metrics.prom --profile run.prof clustering/kmeans_clustering.py full
+
+Stages record a histogram over LATENCY_BUCKETS (count, sum, max, p50/p95/p99 read
+off the buckets). Counters carry labels (HTTP requests by host and status, bytes
+received, retries). Caches register a (hits, misses) callback and are read only at
+export time, so the lru_cache'd normalizers pay nothing per lookup.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import bisect
+import threading
+import functools
+
+# --- Config ---
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROM_PREFIX = "pipeline"
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)   # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (capped at the observed max)."""
+        if not self.count:
+            return None
+        target, seen = q * self.count, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target and n:
+                return min(LATENCY_BUCKETS[i], self.max) if i < len(LATENCY_BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count, "sum": round(self.sum, 6), "max": round(self.max, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            **{f"p{int(q * 100)}": round(self.quantile(q), 6) if self.count else None for q in (0.50, 0.95, 0.99)},
+            "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], self.buckets)),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.stages = {}     # stage -> Histogram
+        self.counters = {}   # (name, ((label, value), ...)) -> number
+        self.caches = {}     # cache name -> callable returning (hits, misses)
+        self.profiler = None
+        self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+            self.started = time.time()
+
+
+_metrics = Metrics()
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _metrics.observe(self.stage, time.perf_counter() - self.start)
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_TIMER = _NoTimer()
+
+
+# --- Recording API ---
+def metrics_enabled():
+    return _metrics.enabled
+
+def timer(stage):
+    """Context manager timing one stage; a shared no-op when metrics are off."""
+    return _Timer(stage) if _metrics.enabled else _NO_TIMER
+
+def timed(stage):
+    """Decorator form of timer()."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _metrics.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _metrics.observe(stage, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def count(name, value=1, **labels):
+    if _metrics.enabled:
+        _metrics.count(name, value, **labels)
+
+def register_cache(name, stats):
+    """Register a cache; stats() returns (hits, misses) and is only called at export time."""
+    _metrics.caches[name] = stats
+
+
+# --- Control ---
+def enable_metrics(profile_path=None):
+    """Start recording; with profile_path, also run cProfile until exit and dump its stats there."""
+    _metrics.enabled = True
+    if profile_path and _metrics.profiler is None:
+        import cProfile
+        _metrics.profiler = cProfile.Profile()
+        _metrics.profiler.enable()
+        atexit.register(dump_profile, profile_path)
+
+def disable_metrics():
+    _metrics.enabled = False
+
+def reset_metrics():
+    _metrics.reset()
+
+def dump_profile(path):
+    profiler = _metrics.profiler
+    if profiler is None:
+        return
+    profiler.disable()
+    profiler.dump_stats(path)
+    print(f"✅ cProfile stats written to {path} (view with: python -m pstats {path})")
+
+
+# --- Export ---
+def cache_stats():
+    caches = {}
+    for name, stats in sorted(_metrics.caches.items()):
+        try:
+            hits, misses = stats()
+        except Exception:
+            continue
+        total = hits + misses
+        caches[name] = {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else 0.0}
+    return caches
+
+def snapshot():
+    """Everything recorded so far as a JSON-ready dict."""
+    with _metrics.lock:
+        stages = {stage: hist.to_dict() for stage, hist in sorted(_metrics.stages.items())}
+        counters = [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(_metrics.counters.items())]
+    return {"enabled": _metrics.enabled, "since": _metrics.started, "uptime_seconds": round(time.time() - _metrics.started, 3),
+            "stages": stages, "counters": counters, "caches": cache_stats()}
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels.items()) + "}" if labels else ""
+
+def to_prometheus():
+    """Prometheus text exposition format."""
+    snap = snapshot()
+    lines = [f"# TYPE {PROM_PREFIX}_stage_seconds histogram"]
+    for stage, hist in snap["stages"].items():
+        cumulative = 0
+        for le, n in hist["buckets"].items():
+            cumulative += n
+            lines.append(f"{PROM_PREFIX}_stage_seconds_bucket{_labels(stage=stage, le=le)} {cumulative}")
+        lines.append(f"{PROM_PREFIX}_stage_seconds_sum{_labels(stage=stage)} {hist['sum']}")
+        lines.append(f"{PROM_PREFIX}_stage_seconds_count{_labels(stage=stage)} {hist['count']}")
+
+    typed = set()
+    for counter in snap["counters"]:
+        metric = f"{PROM_PREFIX}_{counter['name']}_total"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_labels(**counter['labels'])} {counter['value']}")
+
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("hit_rate", "gauge")):
+        metric = f"{PROM_PREFIX}_cache_{field}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, stats in snap["caches"].items():
+            lines.append(f"{metric}{_labels(cache=name)} {stats[field]}")
+    return "\n".join(lines) + "\n"
+
+def export_metrics(path):
+    """Write the report to path: Prometheus text for .prom/.txt, JSON otherwise."""
+    text = to_prometheus() if path.endswith((".prom", ".txt")) else json.dumps(snapshot(), indent=2)
+    with open(path, "w") as f:
+        f.write(text)
+    print(f"✅ Metrics written to {path}")
+
+def print_summary():
+    snap = snapshot()
+    print("📈 Stage timings:")
+    for stage, hist in snap["stages"].items():
+        print(f"   {stage:<28} n={hist['count']:<7} total={hist['sum']:.3f}s  p50≤{hist['p50']}s  max={hist['max']}s")
+    for counter in snap["counters"]:
+        labels = ",".join(f"{k}={v}" for k, v in counter["labels"].items())
+        print(f"   {counter['name']}[{labels}] = {counter['value']}")
+    for name, stats in snap["caches"].items():
+        print(f"   cache {name:<22} hits={stats['hits']} misses={stats['misses']} hit_rate={stats['hit_rate']:.1%}")
+
+
+# --- Environment opt-in ---
+if os.environ.get("PIPELINE_METRICS", "").lower() in ("1", "true", "yes") or os.environ.get("PIPELINE_PROFILE"):
+    enable_metrics(os.environ.get("PIPELINE_PROFILE") or None)
+    if os.environ.get("PIPELINE_METRICS_OUT"):
+        atexit.register(export_metrics, os.environ["PIPELINE_METRICS_OUT"])
+
+
+# --- Run a script with metrics on ---
+if __name__ == "__main__":
+    import argparse
+    import runpy
+
+    parser = argparse.ArgumentParser(description="Run a pipeline script with instrumentation enabled.")
+    parser.add_argument("--out", help="write the report here (.prom for Prometheus text, JSON otherwise)")
+    parser.add_argument("--profile", help="also run cProfile and dump its stats to this file")
+    parser.add_argument("script", help="script to run, e.g. clustering/kmeans_clustering.py")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    # Share this module with the script's imports instead of a second __main__ copy
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    sys.modules.setdefault("utils.metrics", sys.modules[__name__])
+    enable_metrics(args.profile)
+    sys.argv = [args.script] + args.args
+    try:
+        runpy.run_path(args.script, run_name="__main__")
+    finally:
+        print_summary()
+        if args.out:
+            export_metrics(args.out)
@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+
+# Add project root to sys.path to allow relative imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.storage import JSONGroupStorage, SQLiteGroupStorage, GROUPS_DIR, SQLITE_FILE
+
+def copy_groups(source, target):
+    """Copy every group (members, platform summaries, totals) from one storage backend to another."""
+    start = time.perf_counter()
+    groups = source.list_groups()
+    users = 0
+    for name in groups:
+        group_data = source.load_group(name)
+        target.save_group(name, group_data)
+        users += len(group_data.get("users", {}))
+    print(f"✅ Copied {len(groups)} groups / {users} users from {source.kind} to {target.kind} in {time.perf_counter() - start:.1f}s")
+    return len(groups)
+
+def migrate_json_to_sqlite(groups_dir=GROUPS_DIR, db_path=SQLITE_FILE):
+    return copy_groups(JSONGroupStorage(groups_dir), SQLiteGroupStorage(db_path))
+
+def export_sqlite_to_json(db_path=SQLITE_FILE, groups_dir=GROUPS_DIR):
+    return copy_groups(SQLiteGroupStorage(db_path), JSONGroupStorage(groups_dir))
+
+
+# --- Run directly ---
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate group data between the JSON files and the SQLite database.")
+    parser.add_argument("--to", choices=["sqlite", "json"], default="sqlite",
+                        help="sqlite: import groups/*.json into the database (default); json: export the database back to groups/*.json")
+    args = parser.parse_args()
+
+    if args.to == "sqlite":
+        migrate_json_to_sqlite()
+        print("➡️ Set GROUP_STORAGE=sqlite to use the database.")
+    else:
+        export_sqlite_to_json()
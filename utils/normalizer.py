@@ -1,6 +1,14 @@
 from collections import defaultdict
+from functools import lru_cache
+
+from utils.metrics import timed, register_cache
+
+# Raw tokens seen per process are few (a few hundred tags/languages), so the caches
+# stay small while absorbing every repeat lookup from large submission histories
+NORMALIZE_CACHE_SIZE = 8192
 
 # --- Difficulty Normalization ---
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_difficulty(rating_str):
     try:
         rating = int(rating_str)
@@ -81,13 +89,24 @@ TAG_NORMALIZATION_MAP = {
 def clean_token(token):
     return token.strip().lower().replace(" ", "").replace("-", "").replace("_", "")
 
+def build_reverse_lookup(normalization_map, key_func=lambda v: v):
+    """Flatten {canonical: variants} into {variant_key: canonical}; the first canonical listing a variant wins."""
+    lookup = {}
+    for canonical, variants in normalization_map.items():
+        for variant in variants:
+            lookup.setdefault(key_func(variant), canonical)
+    return lookup
+
+TAG_LOOKUP = build_reverse_lookup(TAG_NORMALIZATION_MAP)
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_tag(tag):
     if not tag:
         return "unknown"
     cleaned = clean_token(tag)
-    for canonical, variants in TAG_NORMALIZATION_MAP.items():
-        if cleaned in variants:
-            return canonical
+    canonical = TAG_LOOKUP.get(cleaned)
+    if canonical is not None:
+        return canonical
     return cleaned or "unknown"
 
 # --- Language Normalization ---
@@ -133,15 +152,37 @@ LANGUAGE_NORMALIZATION_MAP = {
     "vanilla_js": {"vanilla js", "vanillajs"},
 }
 
+def clean_language_token(lang):
+    return clean_token(lang.replace("(", "").replace(")", ""))
+
+LANGUAGE_LOOKUP = build_reverse_lookup(LANGUAGE_NORMALIZATION_MAP, clean_language_token)
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_language(lang):
     if not lang:
         return "unknown"
-    cleaned = clean_token(lang.replace("(", "").replace(")", ""))
-    for canonical, variants in LANGUAGE_NORMALIZATION_MAP.items():
-        if cleaned in {clean_token(v.replace("(", "").replace(")", "")) for v in variants}:
-            return canonical
+    cleaned = clean_language_token(lang)
+    canonical = LANGUAGE_LOOKUP.get(cleaned)
+    if canonical is not None:
+        return canonical
     return cleaned or "unknown"
 
+# --- Bulk Normalization ---
+def normalize_many(tokens, normalize_func):
+    """Normalize a sequence of tokens, resolving each distinct token once."""
+    tokens = list(tokens)
+    resolved = {token: normalize_func(token) for token in set(tokens)}
+    return [resolved[token] for token in tokens]
+
+def normalize_tags(tags):
+    return normalize_many(tags, normalize_tag)
+
+def normalize_languages(languages):
+    return normalize_many(languages, normalize_language)
+
+def normalize_difficulties(ratings):
+    return normalize_many(ratings, normalize_difficulty)
+
 # --- Merge Utilities ---
 def merge_and_normalize_dicts(dict1, dict2, normalize_func):
     result = defaultdict(int)
@@ -160,6 +201,7 @@ def normalize_and_merge_difficulties(dict1, dict2):
     return dict(result)
 
 # --- Main Aggregation ---
+@timed("normalize.aggregate")
 def process_aggregation_of_data(data_1, data_2):
     return {
         "total_submissions": data_1["total_submissions"] + data_2["total_submissions"],
@@ -170,3 +212,6 @@ def process_aggregation_of_data(data_1, data_2):
         "difficulty_summary": normalize_and_merge_difficulties(data_1["difficulty_summary"], data_2["difficulty_summary"]),
         "language_summary": merge_and_normalize_dicts(data_1["language_summary"], data_2["language_summary"], normalize_language),
     }
+
+for _func in (normalize_tag, normalize_language, normalize_difficulty):
+    register_cache(_func.__name__, lambda f=_func: tuple(f.cache_info()[:2]))
@@ -0,0 +1,290 @@
+"""
+Incremental pipeline runner: scrape -> aggregate -> features -> clusters -> insights (-> plot).
+
+pipeline_state.json records what every stage last consumed and produced: the digest
+of each group, a hash of each user's feature row, each user's cluster label, a hash
+of the cluster model, and the neighbours each written insight was computed from. A
+run compares the current state against it and only redoes what is downstream of a
+change:
+
+    aggregate  verify / repair totals of groups whose digest changed
+    features   refresh the feature store (changed groups only); users whose row hash
+               moved are "changed"
+    clusters   nearest saved centroid for changed users (no refit), ANN index upsert;
+               users whose label moved join the changed set
+    insights   rewrite insights/output/<user>.json for changed users, users whose last
+               insight cited a changed user, and the changed users' current neighbours
+    plot       re-render the cluster plot (--plot) when anything changed
+
+A new cluster model (a full `main.py cluster`) or a different k invalidates every
+insight. --dry-run prints the planned work without writing anything.
+
+    python utils/pipeline.py [--dry-run] [--scrape GROUP ... | --scrape-all] [-k 3] [--plot]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.metrics import timer
+
+# --- Config ---
+STATE_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'clustering', 'pipeline_state.json'))
+STATE_VERSION = 1
+SHOW_NAMES = 5   # names listed per stage in the plan
+
+
+def row_hash(row):
+    return hashlib.blake2b(np.ascontiguousarray(row, dtype=np.float32).tobytes(), digest_size=8).hexdigest()
+
+def model_hash(assignments):
+    if assignments is None or assignments.centroids is None:
+        return None
+    return hashlib.blake2b(np.ascontiguousarray(assignments.centroids).tobytes(), digest_size=8).hexdigest()
+
+def load_state(path=STATE_FILE):
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+        if state.get("version") == STATE_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return {"version": STATE_VERSION, "groups": {}, "rows": {}, "labels": {}, "model": None, "k": None, "insights": {}}
+
+def save_state(state, path=STATE_FILE):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def preview(names):
+    names = sorted(names)
+    more = f" (+{len(names) - SHOW_NAMES} more)" if len(names) > SHOW_NAMES else ""
+    return ", ".join(names[:SHOW_NAMES]) + more if names else "-"
+
+
+class Pipeline:
+    def __init__(self, k=3, dry_run=False, plot=False, state_path=STATE_FILE):
+        from clustering.feature_store import get_feature_store
+        self.store = get_feature_store(refresh=False)
+        self.k = k
+        self.dry_run = dry_run
+        self.plot = plot
+        self.state_path = state_path
+        self.state = load_state(state_path)
+        self.plan = {}
+
+    def note(self, stage, summary, names=()):
+        self.plan[stage] = {"summary": summary, "count": len(names), "names": sorted(names)[:SHOW_NAMES]}
+        prefix = "📋" if self.dry_run else "➡️"
+        print(f"{prefix} {stage:<9} {summary}" + (f": {preview(names)}" if names else ""))
+
+    # --- Stages ---
+    def scrape(self, groups=None, scrape_all=False):
+        if not groups and not scrape_all:
+            return
+        from utils.storage import get_storage
+        names = get_storage().list_groups() if scrape_all else groups
+        if self.dry_run:
+            self.note("scrape", f"would re-scrape {len(names)} groups (each handle once)", names)
+            return
+        from scrapers.batch_scraper import refresh_groups
+        with timer("pipeline.scrape"):
+            refresh_groups(None if scrape_all else groups)
+        self.note("scrape", f"re-scraped {len(names)} groups", names)
+
+    def aggregate(self):
+        """Groups whose content changed since the last run; their totals are verified (and repaired)."""
+        stamps = self.store.storage.group_stamps()
+        todo, _, removed = self.store.plan(stamps)
+        known = self.state["groups"]
+        # Groups already refreshed into the store by another process but not seen by the pipeline yet
+        unseen = {name for name, entry in self.store.groups.items() if name in stamps and known.get(name) != entry["digest"]}
+        changed = sorted(set(todo) | unseen)
+        gone = sorted(set(known).difference(stamps) | set(removed))
+        if self.dry_run:
+            self.note("aggregate", f"would verify totals of {len(changed)} changed groups, {len(gone)} removed", changed)
+            return changed, gone, todo
+        from utils.group_totals import verify_group_totals
+        with timer("pipeline.aggregate"):
+            mismatched = verify_group_totals(fix=True, storage=self.store.storage, names=changed) if changed else 0
+        self.note("aggregate", f"{len(changed)} changed groups ({mismatched} totals repaired), {len(gone)} removed", changed)
+        return changed, gone, todo
+
+    def features(self, changed_groups, todo):
+        """(changed or new users, removed users) by feature-row hash."""
+        rows = self.state["rows"]
+        stamps = self.store.storage.group_stamps()
+        removed_groups = [name for name in self.store.groups if name not in stamps]
+        # Members from before the refresh count too: a user dropped by the group that owned their
+        # row is re-read from another group they are still in (the store's orphan pass)
+        before = {u for name in set(changed_groups) | set(removed_groups) if name in self.store.groups
+                  for u in self.store.groups[name]["users"]}
+        if self.dry_run:
+            # Parse the changed groups (and the orphan pass) without saving; neighbours below come
+            # from the current index, so the plan is an estimate of what a real run touches
+            parsed = self.store._parse_many(todo, live=stamps)
+            self.store._reread_orphans(stamps, parsed, removed_groups)
+            current = {u: row_hash(r) for info in parsed.values() for u, r in info["rows"].items()}
+            for u in set(self.store.row_index).difference(rows).difference(current):
+                current[u] = row_hash(self.store.matrix[self.store.row_index[u]])
+            dropped = {u for u in before if u not in current and (self.store.owners.get(u) in parsed
+                                                                  or self.store.owners.get(u) in removed_groups)}
+            present = set(self.store.row_index).difference(dropped) | set(current)
+        else:
+            with timer("pipeline.features"):
+                self.store.refresh()
+            reread = set(changed_groups) | set(self.store.last_reread)
+            candidates = before | {u for name in reread if name in self.store.groups for u in self.store.groups[name]["users"]}
+            candidates |= set(self.store.row_index).difference(rows)
+            current = {u: row_hash(self.store.matrix[self.store.row_index[u]]) for u in candidates if u in self.store.row_index}
+            present = set(self.store.row_index)
+
+        changed = {u for u, h in current.items() if rows.get(u) != h}
+        removed = set(rows).difference(present)
+        verb = "would re-derive" if self.dry_run else "re-derived"
+        self.note("features", f"{verb} {len(changed)} user rows ({len(removed)} users removed)", changed)
+        if not self.dry_run:
+            for u in changed:
+                rows[u] = current[u]
+            for u in removed:
+                rows.pop(u, None)
+            self.state["groups"] = {name: entry["digest"] for name, entry in self.store.groups.items()}
+        return changed, removed
+
+    def clusters(self, changed):
+        """Reassign changed users to the saved centroids. Returns (users whose label moved, model changed)."""
+        from clustering.cluster_assignments import load_cluster_assignments
+        assignments = load_cluster_assignments()
+        if assignments is None or assignments.centroids is None:
+            self.note("clusters", "no saved cluster model; run `main.py cluster` first")
+            return set(), False
+
+        model = model_hash(assignments)
+        model_changed = model != self.state["model"]
+        # On the first run every row is "changed"; only users the model has never seen need a centroid
+        first_run = self.state["model"] is None
+        wanted = sorted(u for u in changed if u in self.store.row_index and not (first_run and u in assignments))
+        if self.dry_run:
+            summary = f"would assign {len(wanted)} users to saved centroids"
+            self.note("clusters", summary + (" (new cluster model: every label re-read)" if model_changed else ""), wanted)
+            return set(wanted), model_changed
+
+        from clustering.kmeans_clustering import assign_users_to_clusters
+        from clustering.ann_index import add_users_to_ann_index
+        with timer("pipeline.clusters"):
+            if wanted:
+                assign_users_to_clusters(wanted)
+                add_users_to_ann_index(wanted, store=self.store)
+            assignments = load_cluster_assignments()
+
+        labels = self.state["labels"]
+        check = assignments.usernames if model_changed else wanted
+        moved = set()
+        for u in check:
+            label = assignments.label_of(u)
+            if label is not None and labels.get(u) != label:
+                moved.add(u)
+                labels[u] = label
+        for u in set(labels).difference(self.store.row_index):
+            labels.pop(u)
+        self.state["model"] = model
+        self.note("clusters", f"assigned {len(wanted)} users, {len(moved)} labels moved"
+                  + (" (new cluster model)" if model_changed else ""), moved)
+        return moved, model_changed
+
+    def insights(self, changed, removed, moved, model_changed):
+        """Rewrite the insights downstream of the changed users."""
+        from insights.insight_cache import get_engine, invalidate_insights
+        from insights.bulk_insights import build_insight_records, write_insights, OUTPUT_DIR
+
+        deps = self.state["insights"]
+        everyone = model_changed or self.state["k"] != self.k or not deps
+        dirty = set(changed) | set(moved)
+        if everyone:
+            affected = set(self.store.row_index)
+            reason = "all users (new cluster model, k or first run)"
+        else:
+            engine = get_engine(self.store)
+            touched = dirty | set(removed)
+            affected = {u for u, peers in deps.items() if touched.intersection(peers)}
+            live = [u for u in dirty if u in self.store.row_index]
+            for u, peers in engine.query(live, k=self.k).items():
+                affected.add(u)
+                affected.update(p for p, _ in peers)
+            affected = {u for u in affected if u in self.store.row_index}
+            reason = f"{len(dirty)} changed users, their neighbours and dependants"
+
+        if self.dry_run:
+            self.note("insights", f"would rewrite {len(affected)} insights, delete {len(removed)} ({reason})", affected)
+            return affected
+
+        with timer("pipeline.insights"):
+            users = sorted(affected)
+            engine = get_engine(self.store)
+            records = build_insight_records(users, k=self.k, store=self.store, engine=engine) if users else []
+            write_insights(records)
+            for u, peers in engine.query(users, k=self.k).items():
+                deps[u] = [p for p, _ in peers]
+            for u in removed:
+                deps.pop(u, None)
+                try:
+                    os.remove(os.path.join(OUTPUT_DIR, f"{u.replace(os.sep, '_')}.json"))
+                except OSError:
+                    pass
+            invalidate_insights(list(affected | set(removed)))
+        self.state["k"] = self.k
+        self.note("insights", f"rewrote {len(affected)} insights, deleted {len(removed)} ({reason})", affected)
+        return affected
+
+    def render(self, anything_changed):
+        if not self.plot:
+            return
+        if not anything_changed:
+            self.note("plot", "unchanged")
+            return
+        if self.dry_run:
+            self.note("plot", "would re-render the cluster plot")
+            return
+        from visualization.plot_clusters import plot_clusters
+        with timer("pipeline.plot"):
+            plot_clusters()
+        self.note("plot", "re-rendered")
+
+    def run(self, scrape_groups=None, scrape_all=False):
+        start = time.perf_counter()
+        self.scrape(scrape_groups, scrape_all)
+        changed_groups, _, todo = self.aggregate()
+        changed, removed = self.features(changed_groups, todo)
+        moved, model_changed = self.clusters(changed)
+        affected = self.insights(changed, removed, moved, model_changed)
+        self.render(bool(changed or removed or moved or model_changed))
+
+        if self.dry_run:
+            print(f"📋 Dry run: nothing written ({time.perf_counter() - start:.2f}s).")
+        else:
+            save_state(self.state, self.state_path)
+            print(f"✅ Pipeline run complete in {time.perf_counter() - start:.2f}s "
+                  f"({len(changed)} users changed, {len(affected)} insights rewritten).")
+        return self.plan
+
+
+def run_pipeline(k=3, dry_run=False, plot=False, scrape_groups=None, scrape_all=False):
+    return Pipeline(k=k, dry_run=dry_run, plot=plot).run(scrape_groups, scrape_all)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the pipeline, redoing only what is downstream of changed users.")
+    parser.add_argument("--dry-run", action="store_true", help="print the planned work without writing anything")
+    parser.add_argument("--scrape", nargs="+", metavar="GROUP", help="re-scrape these groups first")
+    parser.add_argument("--scrape-all", action="store_true", help="re-scrape every group first")
+    parser.add_argument("-k", type=int, default=3, help="neighbours per insight")
+    parser.add_argument("--plot", action="store_true", help="also re-render the cluster plot when anything changed")
+    args = parser.parse_args()
+    run_pipeline(args.k, args.dry_run, args.plot, args.scrape, args.scrape_all)
@@ -0,0 +1,238 @@
+"""
+Shared per-handle profile store.
+
+One record per (platform, handle) under groups/profiles/<platform>/<handle>.json holds
+the latest scraped summary, the refresh cycle it was scraped in, and the group
+memberships that reference the handle. Group documents keep their embedded copy of
+each member's platform data (the format in groups/group_format.txt that the
+frontend, totals and feature store read), but every copy of a handle is written from
+this one record, so a handle shared by several groups is scraped once and stays
+identical everywhere.
+
+A refresh cycle bounds scraping: inside `with refresh_cycle():` (or with PROFILE_CYCLE
+set, to share one cycle across processes) each handle is scraped at most once and
+later requests reuse the stored summary.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.storage import GROUPS_DIR, get_storage
+from utils.group_totals import replace_member
+from utils.normalizer import process_aggregation_of_data
+from utils.metrics import count
+
+# --- Config ---
+PROFILE_DIR = os.environ.get("PROFILE_STORE_DIR") or os.path.join(GROUPS_DIR, "profiles")
+PLATFORMS = ("leetcode", "codeforces")
+
+
+class ProfileStore:
+    def __init__(self, root=PROFILE_DIR):
+        self.root = root
+        self.lock = threading.Lock()
+
+    def _path(self, platform, handle):
+        return os.path.join(self.root, platform, f"{quote(handle.strip().lower(), safe='')}.json")
+
+    def get(self, platform, handle):
+        try:
+            with open(self._path(platform, handle), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, platform, handle, record):
+        path = self._path(platform, handle)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp, path)
+
+    def _update(self, platform, handle, change):
+        with self.lock:
+            record = self.get(platform, handle) or {"platform": platform, "handle": handle.strip().lower(),
+                                                    "summary": None, "scraped_at": None, "cycle": None, "refs": []}
+            if change(record) is not False:   # change() returns False when there is nothing to write
+                self._write(platform, handle, record)
+            return record
+
+    def put(self, platform, handle, summary, cycle=None):
+        """Store a freshly scraped summary (memberships are kept)."""
+        def change(record):
+            record.update(summary=summary, scraped_at=time.time(), cycle=cycle)
+        return self._update(platform, handle, change)
+
+    def link(self, platform, handle, group, username):
+        ref = [group, username.strip().lower()]
+        def change(record):
+            if ref in record["refs"]:
+                return False
+            record["refs"].append(ref)
+        self._update(platform, handle, change)
+
+    def unlink(self, platform, handle, group, username):
+        ref = [group, username.strip().lower()]
+        def change(record):
+            if ref not in record["refs"]:
+                return False
+            record["refs"].remove(ref)
+        self._update(platform, handle, change)
+
+    def memberships(self, platform, handle):
+        record = self.get(platform, handle)
+        return [tuple(r) for r in record["refs"]] if record else []
+
+    def reindex(self, storage=None):
+        """Rebuild every handle's memberships from the groups themselves. Returns the handle count."""
+        storage = storage or get_storage()
+        refs = {}
+        for name in storage.list_groups():
+            for username, entry in (storage.load_group(name) or {}).get("users", {}).items():
+                for platform in PLATFORMS:
+                    if entry.get(platform):
+                        refs.setdefault((platform, entry[platform].strip().lower()), []).append([name, username.strip().lower()])
+        for platform in PLATFORMS:
+            folder = os.path.join(self.root, platform)
+            if os.path.isdir(folder):
+                for filename in os.listdir(folder):
+                    record = self.get(platform, filename[:-5]) if filename.endswith(".json") else None
+                    if record and (platform, record["handle"]) not in refs:
+                        self._update(platform, record["handle"], lambda r: r.update(refs=[]))
+        for (platform, handle), handle_refs in refs.items():
+            self._update(platform, handle, lambda r, h=handle_refs: r.update(refs=h))
+        return len(refs)
+
+
+_store = None
+_cycle = {"id": None, "depth": 0}
+_cycle_lock = threading.Lock()
+
+def get_profile_store():
+    global _store
+    if _store is None:
+        _store = ProfileStore()
+    return _store
+
+@contextmanager
+def refresh_cycle():
+    """Open a refresh cycle (nested calls join the outer one). Yields the cycle id."""
+    with _cycle_lock:
+        if _cycle["depth"] == 0:
+            _cycle["id"] = os.environ.get("PROFILE_CYCLE") or f"{time.time_ns()}-{os.getpid()}"
+        _cycle["depth"] += 1
+    try:
+        yield _cycle["id"]
+    finally:
+        with _cycle_lock:
+            _cycle["depth"] -= 1
+            if _cycle["depth"] == 0:
+                _cycle["id"] = None
+
+def current_cycle():
+    return _cycle["id"] or os.environ.get("PROFILE_CYCLE")
+
+def cycle_summary(platform, handle):
+    """The stored summary if this handle was already scraped in the current cycle, else None."""
+    cycle = current_cycle()
+    if cycle is None:
+        return None
+    record = get_profile_store().get(platform, handle)
+    if record and record["cycle"] == cycle and record["summary"] is not None:
+        count("profile_reuse", platform=platform)
+        return record["summary"]
+    return None
+
+def fetch_summary(platform, handle, scrape):
+    """Platform summary for a handle: reused within the current cycle, otherwise scrape(handle) and store it."""
+    summary = cycle_summary(platform, handle)
+    if summary is None:
+        summary = scrape(handle)
+        record_summary(platform, handle, summary)
+    return summary
+
+def record_summary(platform, handle, summary):
+    get_profile_store().put(platform, handle, summary, current_cycle())
+
+def link_member(entry, group, username):
+    store = get_profile_store()
+    for platform in PLATFORMS:
+        if entry.get(platform):
+            store.link(platform, entry[platform], group, username)
+
+def unlink_member(entry, group, username):
+    store = get_profile_store()
+    for platform in PLATFORMS:
+        if entry.get(platform):
+            store.unlink(platform, entry[platform], group, username)
+
+
+def propagate_summaries(summaries, skip=(), storage=None):
+    """
+    Write fresh summaries ({(platform, handle): summary}) into every membership that
+    references those handles, except the (group, username) pairs in skip. Group totals
+    are adjusted per member; each touched group is saved once. Returns the updated
+    usernames (for cluster / insight follow-ups).
+    """
+    storage = storage or get_storage()
+    store = get_profile_store()
+    skip = {(g, u.strip().lower()) for g, u in skip}
+    by_group = {}
+    for (platform, handle), summary in summaries.items():
+        for group, username in store.memberships(platform, handle):
+            if (group, username) not in skip:
+                by_group.setdefault(group, {}).setdefault(username, {})[platform] = (handle, summary)
+
+    updated, items = [], []
+    for group, members in sorted(by_group.items()):
+        group_data = storage.load_group(group)
+        if group_data is None:
+            continue
+        users = {u.strip().lower(): u for u in group_data["users"]}
+        changed = False
+        for username, platforms in members.items():
+            key = users.get(username)
+            entry = group_data["users"].get(key) if key else None
+            data = entry.get("data", {}) if entry else {}
+            new_platforms = dict(data.get("platforms", {}))
+            for platform, (handle, summary) in platforms.items():
+                if entry is None or (entry.get(platform) or "").strip().lower() != handle.strip().lower():
+                    store.unlink(platform, handle, group, username)   # stale reference
+                    continue
+                new_platforms[platform] = summary
+            if entry is None or new_platforms == data.get("platforms"):
+                continue
+            new_data = {"platforms": new_platforms, "aggregated_data": process_aggregation_of_data(
+                new_platforms.get("leetcode", {}), new_platforms.get("codeforces", {}))}
+            group_data["totalData"] = replace_member(group_data["totalData"], data, new_data)
+            entry["data"] = new_data
+            updated.append(key)
+            changed = True
+        if changed:
+            items.append((group, group_data))
+    if items:
+        storage.save_groups(items)
+        print(f"✅ Propagated fresh profiles to {len(updated)} memberships in {len(items)} other groups.")
+    return updated
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the per-handle profile store.")
+    parser.add_argument("action", choices=["show", "reindex"])
+    parser.add_argument("handle", nargs="?", help="handle to show")
+    parser.add_argument("--platform", choices=PLATFORMS, default="leetcode")
+    args = parser.parse_args()
+
+    store = get_profile_store()
+    if args.action == "reindex":
+        print(f"✅ Reindexed memberships for {store.reindex()} handles in {store.root}")
+    else:
+        print(json.dumps(store.get(args.platform, args.handle or ""), indent=2))
@@ -0,0 +1,463 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+GROUPS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'groups'))
+SQLITE_FILE = os.path.join(GROUPS_DIR, "groups.sqlite3")
+USER_INDEX_FILE = os.path.join(GROUPS_DIR, ".user_index")
+USER_INDEX_RESYNC = float(os.environ.get("USER_INDEX_RESYNC", "60"))   # seconds between lookup-time stamp checks
+
+# "json" keeps one groups/<name>.json file per group (the original layout);
+# "sqlite" keeps users, membership and platform summaries in indexed tables
+STORAGE_BACKEND = os.environ.get("GROUP_STORAGE", "json")
+
+PLATFORMS = ["leetcode", "codeforces"]
+
+
+def empty_total_data():
+    return {
+        "platforms": {
+            "leetcode": {},
+            "codeforces": {}
+        },
+        "aggregated_data": {}
+    }
+
+def new_group_data(groupname):
+    return {
+        "groupname": groupname.capitalize(),
+        "groupSize": 0,
+        "groupMembers": [],
+        "totalData": empty_total_data(),
+        "users": {}
+    }
+
+
+class JSONGroupStorage:
+    """
+    One JSON document per group under groups/; every write rewrites that group's file.
+
+    A persisted username -> group index (groups/.user_index) lets single-user lookups
+    open just the group that holds the user. It is updated on every write made through
+    this class, so lookups trust it and are a dict hit; it is re-synced against file
+    stamps (picking up files edited by hand) on the first lookup in a process, then at
+    most every USER_INDEX_RESYNC seconds, or on an explicit sync_user_index().
+    """
+    kind = "json"
+
+    def __init__(self, groups_dir=GROUPS_DIR, index_path=None):
+        self.groups_dir = groups_dir
+        self.index_path = index_path or os.path.join(groups_dir, os.path.basename(USER_INDEX_FILE))
+        self._index = None
+        self._user_groups = None   # username -> [groups], derived from the index
+        self._synced_at = None
+
+    def __getstate__(self):
+        # Sent to worker processes by path; the user index is reloaded there if needed
+        return dict(self.__dict__, _index=None, _user_groups=None, _synced_at=None)
+
+    def _path(self, name):
+        return os.path.join(self.groups_dir, f"{name}.json")
+
+    def _write(self, name, group_data, save_index=True):
+        os.makedirs(self.groups_dir, exist_ok=True)
+        path = self._path(name)
+        with open(path + ".tmp", "w") as f:
+            json.dump(group_data, f, indent=4)
+        os.replace(path + ".tmp", path)
+        self._index_group(name, group_data, save=save_index)
+
+    # --- Username -> group index ---
+    def _load_index(self):
+        if self._index is None:
+            self._index = {}
+            if os.path.exists(self.index_path):
+                try:
+                    with open(self.index_path, 'r') as f:
+                        self._index = json.load(f)
+                except (OSError, ValueError):
+                    print("⚠️ User index unreadable, rebuilding.")
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(self.groups_dir, exist_ok=True)
+        with open(self.index_path + ".tmp", 'w') as f:
+            json.dump(self._index, f)
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    def _index_group(self, name, group_data, save=True):
+        index = self._load_index()
+        self._user_groups = None
+        if group_data is None:
+            index.pop(name, None)
+        else:
+            st = os.stat(self._path(name))
+            index[name] = {
+                "stamp": [st.st_mtime_ns, st.st_size],
+                "users": sorted(u.strip().lower() for u in group_data.get("users", {}))
+            }
+        if save:
+            self._save_index()
+
+    def sync_user_index(self):
+        """Re-read only the group files whose stamp differs from the index. Returns {username: [groups]}."""
+        index = self._load_index()
+        stamps = self.group_stamps()
+        dirty = False
+        for name in [n for n in index if n not in stamps]:
+            self._index_group(name, None, save=False)
+            dirty = True
+        for name, stamp in stamps.items():
+            if index.get(name, {}).get("stamp") != stamp:
+                self._index_group(name, self.load_group(name), save=False)
+                dirty = True
+        if dirty:
+            self._save_index()
+        self._synced_at = time.monotonic()
+        return self._user_map()
+
+    def _user_map(self):
+        if self._user_groups is None:
+            index = self._load_index()
+            self._user_groups = {}
+            for name in sorted(index):
+                for username in index[name]["users"]:
+                    self._user_groups.setdefault(username, []).append(name)
+        return self._user_groups
+
+    def find_user_groups(self, username):
+        if self._synced_at is None or time.monotonic() - self._synced_at > USER_INDEX_RESYNC:
+            self.sync_user_index()
+        return list(self._user_map().get(username.strip().lower(), []))
+
+    # --- Groups ---
+    def list_groups(self):
+        if not os.path.isdir(self.groups_dir):
+            return []
+        return sorted(f[:-5] for f in os.listdir(self.groups_dir) if f.endswith('.json'))
+
+    def group_exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def load_group(self, name, include_users=True):
+        if not self.group_exists(name):
+            return None
+        with open(self._path(name), 'r') as f:
+            group_data = json.load(f)
+        if not include_users:
+            group_data.pop("users", None)
+        return group_data
+
+    def save_group(self, name, group_data):
+        self._write(name, group_data)
+
+    def save_groups(self, items):
+        """Write many (name, group_data) pairs; the user index is saved once at the end."""
+        for name, group_data in items:
+            self._write(name, group_data, save_index=False)
+        self._save_index()
+
+    def delete_group(self, name):
+        if self.group_exists(name):
+            os.remove(self._path(name))
+        self._index_group(name, None)
+
+    # --- Users ---
+    def get_user(self, name, username):
+        group_data = self.load_group(name)
+        return group_data["users"].get(username) if group_data else None
+
+    def put_user(self, name, username, entry, total_data, groupname=None):
+        """Insert or replace one member and the group's totals, creating the group if needed."""
+        group_data = self.load_group(name) or new_group_data(groupname or name)
+        if username not in group_data["users"]:
+            group_data["groupMembers"].append(username)
+            group_data["groupSize"] += 1
+        group_data["users"][username] = entry
+        group_data["totalData"] = total_data
+        self._write(name, group_data)
+
+    def remove_user(self, name, username, total_data):
+        group_data = self.load_group(name)
+        if not group_data or username not in group_data["users"]:
+            return False
+        del group_data["users"][username]
+        group_data["groupMembers"].remove(username)
+        group_data["groupSize"] -= 1
+        group_data["totalData"] = total_data
+        self._write(name, group_data)
+        return True
+
+    def set_totals(self, name, total_data):
+        group_data = self.load_group(name)
+        group_data["totalData"] = total_data
+        self._write(name, group_data)
+
+    def load_group_users(self, name):
+        """Valid members of a group as flat user dicts (entry plus "username"), like load_all_users()."""
+        filename = f"{name}.json"
+        group_data = self.load_group(name) or {}
+        users = []
+        users_dict = group_data.get('users', {})
+
+        if isinstance(users_dict, dict):
+            for username, user_data in users_dict.items():
+                if 'data' in user_data and 'aggregated_data' in user_data['data']:
+                    user_data["username"] = username  # add username to the object
+                    users.append(user_data)
+                else:
+                    print(f"⚠️ Skipping invalid user: {username} in {filename}")
+        else:
+            print(f"⚠️ 'users' field is not a dict in {filename}, skipping.")
+
+        return users
+
+    # --- Change detection (used by the feature store) ---
+    def group_stamps(self):
+        """Cheap per-group change stamps: {name: [mtime_ns, size]}."""
+        stamps = {}
+        for name in self.list_groups():
+            st = os.stat(self._path(name))
+            stamps[name] = [st.st_mtime_ns, st.st_size]
+        return stamps
+
+    def group_digest(self, name):
+        h = hashlib.sha1()
+        with open(self._path(name), 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+
+class SQLiteGroupStorage:
+    """
+    Groups in a single SQLite database with row-level updates.
+
+    groups holds the display name, totals and a revision counter bumped on every
+    write; members holds one row per (group, username) with the platform handles;
+    platform_summaries holds each member's leetcode / codeforces / aggregated summary.
+    group_revisions keeps the last revision of deleted groups, so a group recreated
+    under the same name continues its count instead of reusing old revisions.
+    """
+    kind = "sqlite"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS groups (
+        name TEXT PRIMARY KEY,
+        groupname TEXT NOT NULL,
+        revision INTEGER NOT NULL DEFAULT 0,
+        total_data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS members (
+        group_name TEXT NOT NULL REFERENCES groups(name) ON DELETE CASCADE,
+        username TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        leetcode TEXT,
+        codeforces TEXT,
+        PRIMARY KEY (group_name, username)
+    );
+    CREATE INDEX IF NOT EXISTS members_username ON members(username COLLATE NOCASE);
+    CREATE TABLE IF NOT EXISTS platform_summaries (
+        group_name TEXT NOT NULL,
+        username TEXT NOT NULL,
+        platform TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        PRIMARY KEY (group_name, username, platform),
+        FOREIGN KEY (group_name, username) REFERENCES members(group_name, username) ON DELETE CASCADE
+    );
+    CREATE TABLE IF NOT EXISTS group_revisions (
+        name TEXT PRIMARY KEY,
+        revision INTEGER NOT NULL
+    );
+    """
+
+    def __init__(self, db_path=SQLITE_FILE):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def __getstate__(self):
+        # Connections don't cross processes; each worker opens its own
+        return {"db_path": self.db_path}
+
+    def __setstate__(self, state):
+        self.db_path = state["db_path"]
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("PRAGMA journal_mode = WAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Groups ---
+    def list_groups(self):
+        return [row[0] for row in self._conn().execute("SELECT name FROM groups ORDER BY name")]
+
+    def group_exists(self, name):
+        return self._conn().execute("SELECT 1 FROM groups WHERE name = ?", (name,)).fetchone() is not None
+
+    def load_group(self, name, include_users=True):
+        conn = self._conn()
+        row = conn.execute("SELECT groupname, total_data FROM groups WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        members = [r[0] for r in conn.execute(
+            "SELECT username FROM members WHERE group_name = ? ORDER BY position", (name,))]
+        group_data = {
+            "groupname": row[0],
+            "groupSize": len(members),
+            "groupMembers": members,
+            "totalData": json.loads(row[1])
+        }
+        if include_users:
+            group_data["users"] = {username: entry for username, entry in self._iter_entries(name)}
+        return group_data
+
+    def save_group(self, name, group_data):
+        self.save_groups([(name, group_data)])
+
+    def save_groups(self, items):
+        """Write many (name, group_data) pairs in a single transaction."""
+        with self._conn() as conn:
+            for name, group_data in items:
+                self._save_group(conn, name, group_data)
+
+    def _save_group(self, conn, name, group_data):
+        # Keep the revision moving across overwrites so change detection still sees them
+        revision = self._last_revision(conn, name)
+        conn.execute("DELETE FROM groups WHERE name = ?", (name,))
+        conn.execute("INSERT INTO groups (name, groupname, revision, total_data) VALUES (?, ?, ?, ?)",
+                     (name, group_data.get("groupname", name.capitalize()), revision + 1,
+                      json.dumps(group_data.get("totalData", {}))))
+        order = group_data.get("groupMembers") or list(group_data.get("users", {}))
+        users = group_data.get("users", {})
+        for position, username in enumerate(order):
+            if username in users:
+                self._insert_member(conn, name, username, users[username], position)
+
+    def _last_revision(self, conn, name):
+        """Current revision of a group, or the last one it had before being deleted (0 if never seen)."""
+        row = conn.execute(
+            "SELECT MAX(revision) FROM (SELECT revision FROM groups WHERE name = ? "
+            "UNION ALL SELECT revision FROM group_revisions WHERE name = ?)", (name, name)).fetchone()
+        return row[0] or 0
+
+    def delete_group(self, name):
+        with self._conn() as conn:
+            # Tombstone the revision: a recreated group must not repeat stamps the feature store already saw
+            conn.execute("INSERT OR REPLACE INTO group_revisions (name, revision) "
+                         "SELECT name, revision FROM groups WHERE name = ?", (name,))
+            conn.execute("DELETE FROM groups WHERE name = ?", (name,))
+
+    # --- Users ---
+    def _insert_member(self, conn, name, username, entry, position):
+        conn.execute(
+            "INSERT INTO members (group_name, username, position, leetcode, codeforces) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (group_name, username) DO UPDATE SET leetcode = excluded.leetcode, codeforces = excluded.codeforces",
+            (name, username, position, entry.get("leetcode"), entry.get("codeforces")))
+        data = entry.get("data", {})
+        summaries = [(p, data.get("platforms", {}).get(p, {})) for p in PLATFORMS]
+        summaries.append(("aggregated", data.get("aggregated_data", {})))
+        conn.executemany(
+            "INSERT OR REPLACE INTO platform_summaries (group_name, username, platform, summary) VALUES (?, ?, ?, ?)",
+            [(name, username, platform, json.dumps(summary)) for platform, summary in summaries])
+
+    def _iter_entries(self, name, username=None):
+        conn = self._conn()
+        sql = "SELECT username, leetcode, codeforces FROM members WHERE group_name = ?"
+        args = [name]
+        if username is not None:
+            sql += " AND username = ?"
+            args.append(username)
+        members = conn.execute(sql + " ORDER BY position", args).fetchall()
+
+        sql = "SELECT username, platform, summary FROM platform_summaries WHERE group_name = ?"
+        summaries = {}
+        for uname, platform, summary in conn.execute(sql + (" AND username = ?" if username is not None else ""), args):
+            summaries.setdefault(uname, {})[platform] = json.loads(summary)
+
+        for uname, leetcode, codeforces in members:
+            per_platform = summaries.get(uname, {})
+            yield uname, {
+                "leetcode": leetcode,
+                "codeforces": codeforces,
+                "data": {
+                    "platforms": {p: per_platform.get(p, {}) for p in PLATFORMS},
+                    "aggregated_data": per_platform.get("aggregated", {})
+                }
+            }
+
+    def get_user(self, name, username):
+        for _, entry in self._iter_entries(name, username):
+            return entry
+        return None
+
+    def put_user(self, name, username, entry, total_data, groupname=None):
+        with self._conn() as conn:
+            if not self.group_exists(name):
+                conn.execute("INSERT INTO groups (name, groupname, revision, total_data) VALUES (?, ?, ?, '{}')",
+                             (name, (groupname or name).capitalize(), self._last_revision(conn, name)))
+            row = conn.execute("SELECT position FROM members WHERE group_name = ? AND username = ?", (name, username)).fetchone()
+            if row is None:
+                row = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM members WHERE group_name = ?", (name,)).fetchone()
+            self._insert_member(conn, name, username, entry, row[0])
+            conn.execute("UPDATE groups SET total_data = ?, revision = revision + 1 WHERE name = ?",
+                         (json.dumps(total_data), name))
+
+    def remove_user(self, name, username, total_data):
+        with self._conn() as conn:
+            deleted = conn.execute("DELETE FROM members WHERE group_name = ? AND username = ?", (name, username)).rowcount
+            if deleted:
+                conn.execute("UPDATE groups SET total_data = ?, revision = revision + 1 WHERE name = ?",
+                             (json.dumps(total_data), name))
+        return bool(deleted)
+
+    def set_totals(self, name, total_data):
+        with self._conn() as conn:
+            conn.execute("UPDATE groups SET total_data = ?, revision = revision + 1 WHERE name = ?",
+                         (json.dumps(total_data), name))
+
+    def load_group_users(self, name):
+        users = []
+        for username, entry in self._iter_entries(name):
+            entry["username"] = username
+            users.append(entry)
+        return users
+
+    def find_user_groups(self, username):
+        rows = self._conn().execute(
+            "SELECT group_name FROM members WHERE username = ? COLLATE NOCASE ORDER BY group_name",
+            (username.strip(),))
+        return [row[0] for row in rows]
+
+    # --- Change detection (used by the feature store) ---
+    def group_stamps(self):
+        return {name: [revision] for name, revision in self._conn().execute("SELECT name, revision FROM groups")}
+
+    def group_digest(self, name):
+        row = self._conn().execute("SELECT revision FROM groups WHERE name = ?", (name,)).fetchone()
+        return f"rev-{row[0]}" if row else None
+
+
+STORAGE_BACKENDS = {
+    "json": JSONGroupStorage,
+    "sqlite": SQLiteGroupStorage,
+}
+
+_storage = None
+
+def get_storage():
+    """Process-wide group storage, selected with the GROUP_STORAGE env var (json | sqlite)."""
+    global _storage
+    if _storage is None:
+        _storage = STORAGE_BACKENDS[STORAGE_BACKEND]()
+    return _storage
@@ -1,75 +1,72 @@
 import sys
 import os
-import json
 
 # Add parent directory to sys.path to access scrapers and utils
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from scrapers.aggregate import build_user_profile
-from utils.normalizer import process_aggregation_of_data
-
-def update_user_in_group(username: str, groupname: str):
-    group_file_path = os.path.join("groups", f"{groupname}.json")
-
-    if not os.path.exists(group_file_path):
+from utils.group_totals import replace_member
+from utils.storage import get_storage
+from utils.profile_store import link_member, propagate_summaries
+from clustering.ann_index import add_users_to_ann_index
+from clustering.kmeans_clustering import assign_users_to_clusters
+from insights.insight_cache import invalidate_insights
+
+def update_user_in_group(username: str, groupname: str, incremental_cf: bool = True):
+    storage = get_storage()
+    group_data = storage.load_group(groupname, include_users=False)
+
+    if group_data is None:
         print(f"❌ Group '{groupname}' does not exist.")
         return
 
-    with open(group_file_path, "r") as f:
-        group_data = json.load(f)
-
-    if username not in group_data["users"]:
+    user_entry = storage.get_user(groupname, username)
+    if user_entry is None:
         print(f"❌ User '{username}' not found in group '{groupname}'.")
         return
 
     # Get platform handles from stored data
-    lc_handle = group_data["users"][username]["leetcode"]
-    cf_handle = group_data["users"][username]["codeforces"]
+    lc_handle = user_entry["leetcode"]
+    cf_handle = user_entry["codeforces"]
 
-    # Rebuild user profile
+    # Rebuild user profile (Codeforces syncs only submissions newer than the handle's checkpoint)
     try:
-        updated_user_profile = build_user_profile(lc_handle, cf_handle, username, groupname)
+        updated_user_profile = build_user_profile(lc_handle, cf_handle, username, groupname, incremental_cf=incremental_cf)
     except Exception as e:
         print(f"❌ Failed to update user '{username}': {e}")
         return
 
-    # Update only the user's data block
-    group_data["users"][username]["data"] = updated_user_profile["data"]
-
-    # Recompute totalData from all users
-    users = group_data["users"].values()
-    user_list = list(users)
-    first = user_list[0]["data"]
-    recomputed_total = {
-        "platforms": first["platforms"],
-        "aggregated_data": first["aggregated_data"]
-    }
-
-    for u in user_list[1:]:
-        recomputed_total = {
-            "platforms": {
-                "leetcode": process_aggregation_of_data(
-                    recomputed_total["platforms"]["leetcode"],
-                    u["data"]["platforms"]["leetcode"]
-                ),
-                "codeforces": process_aggregation_of_data(
-                    recomputed_total["platforms"]["codeforces"],
-                    u["data"]["platforms"]["codeforces"]
-                )
-            },
-            "aggregated_data": process_aggregation_of_data(
-                recomputed_total["aggregated_data"],
-                u["data"]["aggregated_data"]
-            )
-        }
-
-    group_data["totalData"] = recomputed_total
-
-    # Save updated group JSON
-    with open(group_file_path, "w") as f:
-        json.dump(group_data, f, indent=4)
-
-    print(f"✅ User '{username}' updated in group '{groupname}' and group totals recomputed.")
+    # Update only the user's data block, and swap their old contribution to the totals for the new one
+    old_data = user_entry["data"]
+    user_entry["data"] = updated_user_profile["data"]
+    new_total = replace_member(group_data["totalData"], old_data, user_entry["data"])
+
+    # Save the updated member row and group totals
+    storage.put_user(groupname, username, user_entry, new_total)
+
+    # Other groups listing the same handles get the same fresh data (no second scrape)
+    link_member(user_entry, groupname, username)
+    platforms = user_entry["data"]["platforms"]
+    updated = propagate_summaries({("leetcode", lc_handle): platforms["leetcode"],
+                                   ("codeforces", cf_handle): platforms["codeforces"]},
+                                  skip=[(groupname, username)], storage=storage)
+
+    # Refresh the user's vector in the ANN index (if one has been built)
+    try:
+        add_users_to_ann_index([username] + updated)
+    except Exception as e:
+        print(f"⚠️ Could not update ANN index for '{username}': {e}")
+
+    # Move the user to their nearest saved centroid (no refit)
+    try:
+        assign_users_to_clusters([username] + updated)
+    except Exception as e:
+        print(f"⚠️ Could not assign cluster for '{username}': {e}")
+
+    # Cached insights for this user (and for users citing them as peer) are now stale
+    invalidate_insights([username] + updated)
+
+    print(f"✅ User '{username}' updated in group '{groupname}' and group totals updated.")
 
 
 # --- Example usage ---
@@ -1,106 +1,252 @@
+"""
+2D plot of the user clusters, headless and cached.
+
+The 171D feature rows come straight from the feature store (no regeneration). PCA
+is fitted with a randomized solver on at most FIT_SAMPLE rows and applied to every
+row as one chunked projection; 'tsne' embeds TSNE_LANDMARKS sampled rows and places
+everyone else at the distance-weighted mean of their nearest landmarks. The fitted
+reducer and the 2D coordinates are cached per method in projection_<method>.npz, keyed by the feature
+matrix fingerprint, so re-plotting an unchanged population skips the projection.
+Rendering uses the Agg backend; above SCATTER_MAX points the plot switches from a
+scatter to density bins coloured by their majority cluster.
+
+    python visualization/plot_clusters.py [--method pca|tsne] [--out plot.png] [--refit] [--show]
+"""
 import os
 import sys
-import json
+import time
+import hashlib
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
-from sklearn.manifold import TSNE
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from clustering.generate_features import generate_user_feature_vectors
-from clustering.kmeans_clustering import DEFAULT_NUM_CLUSTERS
-from utils.load_all_users import load_all_users
+from clustering.feature_store import get_feature_store
+from clustering.cluster_assignments import load_cluster_assignments, parse_cluster_key
+from clustering.model_selection import matrix_fingerprint
+from utils.metrics import timer
 
-CLUSTERS_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'clustering', 'clusters.json'))
+# --- Config ---
 OUTPUT_PNG = os.path.abspath(os.path.join(os.path.dirname(__file__), 'cluster_plot.png'))
-
-def load_cluster_assignments():
-    with open(CLUSTERS_FILE, 'r') as f:
-        return json.load(f)
-
-def build_180d_vectors():
-    full_feature_map = generate_user_feature_vectors()
-    user_set = set()
-
-    for key in full_feature_map:
-        if "::" in key:
-            user_set.add(key.split("::")[0])
-
-    vectors = {}
-    for username in user_set:
-        agg = full_feature_map.get(f"{username}::aggregated", [0]*60)
-        lc = full_feature_map.get(f"{username}::leetcode", [0]*60)
-        cf = full_feature_map.get(f"{username}::codeforces", [0]*60)
-        vectors[username] = agg + lc + cf
-
-    return vectors
-
-def reduce_dimensions(vectors, method='pca'):
-    X = np.array(list(vectors.values()))
-    if method == 'tsne':
-        reducer = TSNE(n_components=2, random_state=42, perplexity=30)
+PROJECTION_CACHE = os.path.join(os.path.dirname(__file__), 'projection_{method}.npz')
+METHODS = ["pca", "tsne"]
+FIT_SAMPLE = 20000          # rows the PCA is fitted on
+REFIT_DRIFT = 0.2           # refit the cached PCA once the user count moved by more than this fraction
+TSNE_LANDMARKS = 1000       # rows t-SNE actually embeds
+LANDMARK_DIMS = 30          # PCA dims used to embed landmarks and find each row's nearest ones
+LANDMARK_NEIGHBORS = 5
+PROJECT_CHUNK = 8192
+SCATTER_MAX = 20000         # more points than this are drawn as density bins
+DENSITY_BINS = 300
+DENSITY_SPAN = (0.5, 99.5)   # percentiles covered by the density bins
+SEED = 42
+
+
+# --- Projection ---
+def population_key(store, method):
+    """Cache key: projection method + feature matrix content + row order."""
+    names = hashlib.blake2b("\n".join(store.usernames).encode(), digest_size=8).hexdigest()
+    return f"{method}:{matrix_fingerprint(store.matrix)}:{names}"
+
+def load_projection_cache(method):
+    path = PROJECTION_CACHE.format(method=method)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError):
+        return None
+
+def save_projection_cache(method, cache):
+    path = PROJECTION_CACHE.format(method=method)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **cache)
+    os.replace(tmp, path)
+
+def sample_rows(n_rows, size, seed=SEED):
+    if n_rows <= size:
+        return np.arange(n_rows)
+    return np.sort(np.random.default_rng(seed).choice(n_rows, size, replace=False))
+
+def fit_pca(matrix, n_components):
+    """(mean, components) of a randomized PCA fitted on a row sample."""
+    from sklearn.decomposition import PCA
+
+    sample = np.asarray(matrix[sample_rows(len(matrix), FIT_SAMPLE)], dtype=np.float32)
+    n_components = min(n_components, *sample.shape)
+    pca = PCA(n_components=n_components, svd_solver="randomized", random_state=SEED).fit(sample)
+    return pca.mean_.astype(np.float32), pca.components_.astype(np.float32)
+
+def project(matrix, mean, components):
+    """(matrix - mean) @ components.T, chunk by chunk over the memory-mapped rows."""
+    out = np.empty((len(matrix), len(components)), dtype=np.float32)
+    for start in range(0, len(matrix), PROJECT_CHUNK):
+        block = np.asarray(matrix[start:start + PROJECT_CHUNK], dtype=np.float32)
+        out[start:start + len(block)] = (block - mean) @ components.T
+    return out
+
+def landmark_embedding(reduced):
+    """t-SNE on sampled landmarks; every other row is placed from its nearest landmarks."""
+    from sklearn.manifold import TSNE
+
+    landmarks = sample_rows(len(reduced), TSNE_LANDMARKS)
+    anchor = reduced[landmarks]
+    perplexity = min(30.0, max(2.0, (len(landmarks) - 1) / 3))
+    anchor_2d = TSNE(n_components=2, perplexity=perplexity, init="pca", random_state=SEED).fit_transform(anchor)
+    anchor_2d = anchor_2d.astype(np.float32)
+
+    coords = np.empty((len(reduced), 2), dtype=np.float32)
+    anchor_sq = (anchor ** 2).sum(axis=1)
+    k = min(LANDMARK_NEIGHBORS, len(landmarks))
+    for start in range(0, len(reduced), PROJECT_CHUNK):
+        block = reduced[start:start + PROJECT_CHUNK]
+        dist = np.maximum((block ** 2).sum(axis=1)[:, None] - 2 * block @ anchor.T + anchor_sq, 0)
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        weights = 1.0 / (np.sqrt(np.take_along_axis(dist, nearest, axis=1)) + 1e-6)
+        weights /= weights.sum(axis=1, keepdims=True)
+        coords[start:start + len(block)] = (anchor_2d[nearest] * weights[:, :, None]).sum(axis=1)
+    coords[landmarks] = anchor_2d
+    return coords
+
+def project_2d(store, method="pca", refit=False):
+    """
+    2D coordinates for every feature-store row (store order). Served from the cache
+    when the matrix is unchanged; otherwise the cached PCA is reused for the new rows
+    unless the population drifted by more than REFIT_DRIFT (or refit=True).
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, got '{method}'")
+    key = population_key(store, method)
+    cache = load_projection_cache(method)
+    if cache is not None and not refit and str(cache["key"]) == key:
+        print(f"📦 Reusing cached {method} projection of {len(store)} users.")
+        return cache["coords"]
+
+    dims = 2 if method == "pca" else LANDMARK_DIMS
+    reusable = (
+        cache is not None and not refit
+        and int(cache["fit_rows"]) > 0 and cache["components"].shape == (dims, store.matrix.shape[1])
+        and abs(len(store) - int(cache["fit_rows"])) <= REFIT_DRIFT * int(cache["fit_rows"])
+    )
+    if reusable:
+        mean, components, fit_rows = cache["mean"], cache["components"], int(cache["fit_rows"])
     else:
-        reducer = PCA(n_components=2)
-    return reducer.fit_transform(X)
-
-def plot_clusters():
-    cluster_map = load_cluster_assignments()
-    vectors_180d = build_180d_vectors()
-    full_feature_map = generate_user_feature_vectors()
-
-    usernames = []
-    labels = []
-    cluster_scores = {}
-
-    for cluster_id, users in cluster_map.items():
-        cluster_scores[cluster_id] = []
-        for uname in users:
-            uname = uname.strip().lower()
-            if uname in vectors_180d:
-                usernames.append(uname)
-                labels.append(cluster_id)
-                score = full_feature_map.get(f"{uname}::aggregated", [0])[0]
-                cluster_scores[cluster_id].append((uname, score))
-
-    vectors_filtered = {u: vectors_180d[u] for u in usernames}
-    reduced = reduce_dimensions(vectors_filtered, method='pca')
-
-    cluster_ids = sorted(set(labels))
-    label_map = {cid: idx for idx, cid in enumerate(cluster_ids)}
-    numeric_labels = [label_map[l] for l in labels]
-
-    # Prepare data for centroids
-    X = np.array(list(vectors_filtered.values()))
-    reduced_dict = dict(zip(usernames, reduced))
-    cluster_points = {cid: [] for cid in cluster_ids}
-    for uname, label in zip(usernames, labels):
-        cluster_points[label].append(reduced_dict[uname])
-    centroids = {cid: np.mean(cluster_points[cid], axis=0) for cid in cluster_ids}
-
-    # Start plotting
-    plt.figure(figsize=(10, 6))
-    scatter = plt.scatter(reduced[:, 0], reduced[:, 1], c=numeric_labels, cmap='tab10', s=40, alpha=0.8)
-
-    # Plot centroids
-    for cid, coord in centroids.items():
-        plt.scatter(coord[0], coord[1], marker='*', s=200, c='black', edgecolors='white', label=f"{cid} center")
-
-    # Label top performer in each cluster
-    for cluster_id in cluster_ids:
-        top_users = sorted(cluster_scores[cluster_id], key=lambda x: -x[1])[:1]
-        for uname, score in top_users:
-            x, y = reduced_dict[uname]
-            plt.annotate(uname, (x, y), fontsize=8, weight='bold', xytext=(5, 5), textcoords='offset points')
-
-    plt.title("User Clusters (180D Feature Vector Reduced to 2D)")
-    plt.xlabel("Component 1")
-    plt.ylabel("Component 2")
-    plt.colorbar(scatter, ticks=range(len(cluster_ids)), label='Cluster ID')
-    plt.tight_layout()
-    plt.savefig(OUTPUT_PNG)
-    plt.show()
-    print(f"✅ Cluster plot saved as: {OUTPUT_PNG}")
+        mean, components = fit_pca(store.matrix, dims)
+        fit_rows = len(store)
+
+    reduced = project(store.matrix, mean, components)
+    coords = reduced[:, :2] if method == "pca" else landmark_embedding(reduced)
+    save_projection_cache(method, {"key": np.array(key), "coords": coords, "mean": mean,
+                           "components": components, "fit_rows": np.int64(fit_rows)})
+    print(f"✅ Projected {len(store)} users with {method} ({'cached' if reusable else 'fresh'} reducer).")
+    return coords
+
+
+# --- Rendering ---
+def cluster_labels(store, assignments):
+    """Cluster index per store row (-1 when unassigned) and the cluster ids in index order."""
+    cluster_ids = assignments.cluster_ids()
+    label_of = {parse_cluster_key(cid): i for i, cid in enumerate(cluster_ids)}
+    labels = np.full(len(store), -1, dtype=np.int64)
+    for row, username in enumerate(store.usernames):
+        label = assignments.label_of(username)
+        if label is not None:
+            labels[row] = label_of[label]
+    return labels, cluster_ids
+
+def draw_density(ax, coords, labels, colors):
+    """
+    Bins shaded by point count (log) and coloured by the cluster most of their points
+    belong to. The bins cover the central DENSITY_SPAN percentiles; the few outliers
+    beyond them are drawn as individual points.
+    """
+    k = len(colors)
+    low, high = np.percentile(coords, DENSITY_SPAN, axis=0)
+    inside = np.all((coords >= low) & (coords <= high), axis=1)
+    x_edges = np.linspace(low[0], high[0] + 1e-9, DENSITY_BINS + 1)
+    y_edges = np.linspace(low[1], high[1] + 1e-9, DENSITY_BINS + 1)
+    bx = np.clip(np.searchsorted(x_edges, coords[inside, 0], side="right") - 1, 0, DENSITY_BINS - 1)
+    by = np.clip(np.searchsorted(y_edges, coords[inside, 1], side="right") - 1, 0, DENSITY_BINS - 1)
+    per_cluster = np.bincount((by * DENSITY_BINS + bx) * k + labels[inside], minlength=DENSITY_BINS * DENSITY_BINS * k)
+    per_cluster = per_cluster.reshape(DENSITY_BINS, DENSITY_BINS, k)
+
+    counts = per_cluster.sum(axis=2)
+    palette = np.asarray(colors, dtype=np.float32)
+    image = np.zeros((DENSITY_BINS, DENSITY_BINS, 4), dtype=np.float32)
+    image[..., :3] = palette[per_cluster.argmax(axis=2), :3]
+    image[..., 3] = np.where(counts > 0, 0.3 + 0.7 * np.log1p(counts) / np.log1p(counts.max()), 0)
+    ax.imshow(image, origin="lower", aspect="auto", interpolation="nearest",
+              extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]))
+    ax.scatter(coords[~inside, 0], coords[~inside, 1], c=palette[labels[~inside]], s=4, alpha=0.8)
+
+def plot_clusters(method="pca", out=OUTPUT_PNG, refit=False, show=False):
+    """Render the cluster plot to out (PNG). Returns the path, or None without clusters."""
+    import matplotlib
+    if not show:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Patch
+
+    assignments = load_cluster_assignments()
+    if assignments is None:
+        print("❌ No cluster assignments found. Run the clustering first.")
+        return None
+    store = get_feature_store()
+
+    start = time.perf_counter()
+    with timer("plot.project"):
+        coords = project_2d(store, method, refit)
+        labels, cluster_ids = cluster_labels(store, assignments)
+        keep = labels >= 0
+        coords, labels = coords[keep], labels[keep]
+        scores = np.asarray(store.source_matrix('aggregated')[:, 0])[keep]
+        usernames = np.asarray(store.usernames, dtype=object)[keep]
+    projected = time.perf_counter()
+
+    with timer("plot.render"):
+        k = len(cluster_ids)
+        cmap = plt.get_cmap('tab10' if k <= 10 else 'tab20', max(k, 1))
+        colors = [cmap(i) for i in range(k)]
+        fig, ax = plt.subplots(figsize=(10, 6))
+
+        if len(coords) <= SCATTER_MAX:
+            scatter = ax.scatter(coords[:, 0], coords[:, 1], c=labels, cmap=cmap, vmin=-0.5, vmax=k - 0.5,
+                                 s=40 if len(coords) < 2000 else 6, alpha=0.8)
+            fig.colorbar(scatter, ax=ax, ticks=range(k), label='Cluster ID')
+        else:
+            draw_density(ax, coords, labels, colors)
+            ax.legend(handles=[Patch(color=colors[i], label=cid) for i, cid in enumerate(cluster_ids)],
+                      fontsize=7, loc="best", title="Cluster")
+
+        # Centroids in the plane and the top performer of each cluster
+        sizes = np.maximum(np.bincount(labels, minlength=k), 1)
+        centroids = np.stack([np.bincount(labels, weights=coords[:, d], minlength=k) / sizes for d in (0, 1)], axis=1)
+        ax.scatter(centroids[:, 0], centroids[:, 1], marker='*', s=200, c='black', edgecolors='white')
+        order = np.lexsort((-scores, labels))
+        firsts = order[np.r_[0, np.flatnonzero(np.diff(labels[order])) + 1]] if len(order) else []
+        for row in firsts:
+            ax.annotate(usernames[row], coords[row], fontsize=8, weight='bold', xytext=(5, 5), textcoords='offset points')
+
+        ax.set_title(f"User Clusters ({len(coords)} users, {store.matrix.shape[1]}D features reduced to 2D by {method.upper()})")
+        ax.set_xlabel("Component 1")
+        ax.set_ylabel("Component 2")
+        fig.tight_layout()
+        fig.savefig(out, dpi=100)
+        if show:
+            plt.show()
+        plt.close(fig)
+
+    print(f"✅ Cluster plot saved as: {out} "
+          f"(projection {projected - start:.2f}s, render {time.perf_counter() - projected:.2f}s)")
+    return out
 
 if __name__ == "__main__":
-    plot_clusters()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Plot the user clusters in 2D (headless by default).")
+    parser.add_argument("--method", choices=METHODS, default="pca")
+    parser.add_argument("--out", default=OUTPUT_PNG, help="PNG path")
+    parser.add_argument("--refit", action="store_true", help="ignore the cached reducer and coordinates")
+    parser.add_argument("--show", action="store_true", help="also open an interactive window")
+    args = parser.parse_args()
+    plot_clusters(args.method, args.out, args.refit, args.show)